@@ -0,0 +1,181 @@
+"""
+Порівняння шляхів читання DBManager: ORM-об'єкти проти легких кортежів (src/core/dto.py).
+
+Запуск:
+    python src/benchmarks/read_paths.py --subscriptions 20000 --history 100000 --output result.json
+
+Для кожного набору (підписки з категоріями, історія платежів з назвами підписок,
+чернетки) вимірюється:
+  - час завантаження (перцентилі за --repeats повторами);
+  - пам'ять, яку утримує завантажений список (tracemalloc), загалом і на рядок.
+
+"orm" - запити, якими DBManager читав дані раніше (joinedload, detached-об'єкти),
+"dto" - поточні методи DBManager (Core select -> NamedTuple).
+
+Результат - JSON (stdout або --output).
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Callable, List
+
+# --- Path Setup ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
+sys.path.insert(0, project_root)
+
+from src.benchmarks.sync_load import percentiles
+
+class ReadPathsBenchmark:
+    """Один прогін на тимчасовій базі."""
+
+    def __init__(self, args: argparse.Namespace, db_path: str):
+        self.args = args
+        self.db_path = db_path
+
+    def populate(self, db):
+        from src.core.models import Category, Draft, PaymentHistory, Subscription
+
+        with db.get_session() as session:
+            category_ids = [category.id for category in session.query(Category).filter_by(tenant_id=db.tenant_id).all()]
+        today = date.today()
+        now = datetime.utcnow()
+        subscriptions = [
+            dict(id=index + 1, tenant_id=db.tenant_id, name=f"Підписка {index}", cost_uah=50.0 + index % 500,
+                 category_id=category_ids[index % len(category_ids)], period="Місяць",
+                 last_payment=today - timedelta(days=index % 30), next_payment=today + timedelta(days=index % 30))
+            for index in range(self.args.subscriptions)
+        ]
+        history = [
+            dict(sub_id=index % self.args.subscriptions + 1, tenant_id=db.tenant_id, final_sum=50.0 + index % 500,
+                 pay_date=now - timedelta(minutes=index))
+            for index in range(self.args.history)
+        ]
+        drafts = [
+            dict(raw_name=f"Чернетка {index}", amount=9.99, currency="USD", chat_id=42, tenant_id=db.tenant_id)
+            for index in range(self.args.drafts)
+        ]
+        with db.get_session() as session:
+            session.bulk_insert_mappings(Subscription, subscriptions)
+            session.bulk_insert_mappings(PaymentHistory, history)
+            session.bulk_insert_mappings(Draft, drafts)
+            session.commit()
+
+    def orm_loaders(self, db) -> dict:
+        from sqlalchemy.orm import joinedload
+        from src.core.models import Draft, DraftStatus, PaymentHistory, Subscription
+
+        def subscriptions():
+            with db.get_session() as session:
+                return (session.query(Subscription).options(joinedload(Subscription.category))
+                        .filter_by(tenant_id=db.tenant_id).all())
+
+        def history():
+            with db.get_session() as session:
+                return (session.query(PaymentHistory).options(joinedload(PaymentHistory.subscription))
+                        .filter_by(tenant_id=db.tenant_id).order_by(PaymentHistory.pay_date.desc()).all())
+
+        def drafts():
+            with db.get_session() as session:
+                return session.query(Draft).filter_by(status=DraftStatus.NEW, tenant_id=db.tenant_id).all()
+
+        return {"subscriptions": subscriptions, "payment_history": history, "drafts": drafts}
+
+    def dto_loaders(self, db) -> dict:
+        return {"subscriptions": db.get_all_subscriptions, "payment_history": db.get_payment_history,
+                "drafts": db.get_pending_drafts}
+
+    def measure(self, loader: Callable[[], List]) -> dict:
+        loader() # Прогрів (кеш сторінок SQLite, компіляція запитів)
+        times = []
+        for _ in range(self.args.repeats):
+            gc.collect()
+            started = time.perf_counter()
+            rows = loader()
+            times.append(time.perf_counter() - started)
+            del rows
+
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        rows = loader()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        count = len(rows)
+        del rows
+        return {
+            "rows": count,
+            "load_ms": percentiles(times),
+            "retained_mb": round(retained / 1024 / 1024, 2),
+            "bytes_per_row": round(retained / count) if count else None,
+        }
+
+    def run(self) -> dict:
+        from src.database.db_manager import DBManager
+
+        db = DBManager(db_path=self.db_path)
+        self.populate(db)
+
+        results = {}
+        orm, dto = self.orm_loaders(db), self.dto_loaders(db)
+        for name in orm:
+            orm_result, dto_result = self.measure(orm[name]), self.measure(dto[name])
+            orm_p50, dto_p50 = orm_result["load_ms"]["p50"], dto_result["load_ms"]["p50"]
+            results[name] = {
+                "orm": orm_result,
+                "dto": dto_result,
+                "speedup_p50": round(orm_p50 / dto_p50, 2) if dto_p50 else None,
+                "memory_ratio": round(orm_result["retained_mb"] / dto_result["retained_mb"], 2)
+                                if dto_result["retained_mb"] else None,
+            }
+
+        return {
+            "benchmark": "read_paths",
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "environment": {"python": platform.python_version(), "platform": platform.platform()},
+            "params": {
+                "subscriptions": self.args.subscriptions,
+                "history": self.args.history,
+                "drafts": self.args.drafts,
+                "repeats": self.args.repeats,
+            },
+            "results": results,
+        }
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ORM проти легких кортежів на шляхах читання DBManager.")
+    parser.add_argument("--subscriptions", type=int, default=20000)
+    parser.add_argument("--history", type=int, default=100000)
+    parser.add_argument("--drafts", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=5, help="Повторів вимірювання часу на кожен набір")
+    parser.add_argument("--output", default=None, help="Файл для JSON-результату (інакше stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="read_paths_"), "bench.sqlite")
+    # Глобальний `db` створюється при імпорті db_manager - теж на тимчасовій базі
+    os.environ["DB_NAME"] = db_path
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    with contextlib.redirect_stdout(sys.stderr):
+        result = ReadPathsBenchmark(args, db_path).run()
+    result["db_path"] = db_path
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Навантажувальний тест конвеєра синхронізації бот -> десктоп -> бот.
+
+Запуск (без GUI і без Telegram):
+    python src/benchmarks/sync_load.py --rate 200 --count 2000 --output result.json
+
+Що відбувається:
+  1. Продюсер (як хендлери бота) додає FROM_BOT події - чернетки та запити
+     на спарювання - з заданою частотою в тимчасову базу.
+  2. "Десктоп" у окремому потоці обробляє чергу через SyncWorker.process_queue.
+  3. "Бот" у циклі asyncio доставляє TO_BOT відповіді через FeedbackConsumer
+     і OutboundSender, але замість Telegram використовується фейковий відправник.
+
+Результат - JSON (stdout або --output): пропускна здатність та перцентилі
+p50/p95/p99 затримок "постановка в чергу -> Draft" і "постановка -> сповіщення".
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# --- Path Setup ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
+sys.path.insert(0, project_root)
+
+LINKED_CHAT_ID = 42
+PAIRING_CHAT_BASE = 10_000_000  # Кожен запит на спарювання - з окремого чату
+BENCH_PREFIX = "bench-"
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    """Повертає p50/p95/p99/max (мілісекунди) для вибірки в секундах."""
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+class LoadTest:
+    """Один прогін навантажувального тесту на тимчасовій базі."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.enqueued_at: Dict[int, float] = {}  # seq -> час постановки в чергу
+        self.draft_at: Dict[int, float] = {}     # seq -> час фіксації Draft
+        self.notified_at: Dict[int, float] = {}  # seq -> час "доставки" в Telegram
+        self.expected_notifications = 0
+        self._done = None  # asyncio.Event, створюється в циклі подій
+        self._name_re = re.compile(re.escape(BENCH_PREFIX) + r"(\d+)")
+
+    # --- Десктоп ---
+
+    def _desktop_loop(self, worker, stop: threading.Event):
+        """Повторює SyncWorker.run, фіксуючи час появи кожної чернетки після COMMIT пакета."""
+        from src.database.db_manager import db
+        from src.core.models import Draft
+
+        last_draft_id = 0
+        worker.watcher.start()
+        try:
+            while not stop.is_set():
+                generation = worker.watcher.generation
+                if worker.process_queue():
+                    now = time.perf_counter()
+                    with db.get_session() as session:
+                        rows = (
+                            session.query(Draft.id, Draft.raw_name)
+                            .filter(Draft.id > last_draft_id)
+                            .all()
+                        )
+                    for draft_id, raw_name in rows:
+                        last_draft_id = max(last_draft_id, draft_id)
+                        match = self._name_re.fullmatch(raw_name or "")
+                        if match:
+                            self.draft_at.setdefault(int(match.group(1)), now)
+                worker.watcher.wait(generation, 0.5)
+        finally:
+            worker.watcher.stop()
+
+    # --- Бот ---
+
+    async def _fake_send(self, chat_id: int, text: str):
+        """Замість Telegram: фіксує час доставки (за бажанням з імітацією затримки мережі)."""
+        if self.args.send_latency_ms:
+            await asyncio.sleep(self.args.send_latency_ms / 1000)
+        now = time.perf_counter()
+
+        match = self._name_re.search(text)
+        if match:
+            seq = int(match.group(1))
+        elif chat_id >= PAIRING_CHAT_BASE:
+            seq = chat_id - PAIRING_CHAT_BASE
+        else:
+            return
+        if seq in self.enqueued_at and seq not in self.notified_at:
+            self.notified_at[seq] = now
+            if len(self.notified_at) >= self.expected_notifications:
+                self._done.set()
+
+    async def _produce(self, adb):
+        """Додає FROM_BOT події з частотою --rate (рівномірно, без пакетування)."""
+        interval = 1 / self.args.rate
+        pairing_every = round(1 / self.args.pairing_ratio) if self.args.pairing_ratio > 0 else 0
+        start = time.perf_counter()
+
+        for seq in range(self.args.count):
+            delay = start + seq * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if pairing_every and seq % pairing_every == 0:
+                # Невірний код: десктоп відповідає pairing_failed у чат запиту, прив'язка не змінюється
+                payload = {"event": "pairing_request", "code": "000000", "chat_id": PAIRING_CHAT_BASE + seq}
+            else:
+                payload = {
+                    "raw_name": f"{BENCH_PREFIX}{seq}",
+                    "amount": 9.99,
+                    "currency": "USD",
+                    "chat_id": LINKED_CHAT_ID
+                }
+            self.enqueued_at[seq] = time.perf_counter()
+            await adb.enqueue_from_bot(payload)
+
+    async def _bot_side(self, db_path: str) -> float:
+        from src.core.config import Config
+        from src.core.sync_notifier import DataVersionWatcher
+        from src.database.db_manager import DBManager
+        from src.bot.async_db import AsyncDB
+        from src.bot.outbound import OutboundSender
+        from src.bot.feedback import FeedbackConsumer
+
+        self._done = asyncio.Event()
+        adb = AsyncDB(DBManager(db_path=db_path))
+        watcher = DataVersionWatcher(db_path, interval=Config.SYNC_WATCH_INTERVAL_MS / 1000)
+        sender = OutboundSender(
+            send=self._fake_send,
+            on_delivered=adb.ack,
+            on_failed=adb.fail,
+            workers=self.args.workers,
+            global_rate=self.args.global_rate,
+            per_chat_rate=self.args.per_chat_rate,
+            per_chat_burst=self.args.per_chat_burst
+        )
+
+        watcher.start()
+        sender.start()
+        consumer = asyncio.create_task(FeedbackConsumer(adb, sender, watcher).run())
+        start = time.perf_counter()
+        try:
+            await self._produce(adb)
+            await asyncio.wait_for(self._done.wait(), self.args.timeout)
+        except asyncio.TimeoutError:
+            pass  # Неповний результат теж записується (delivered < expected)
+        finally:
+            elapsed = time.perf_counter() - start
+            consumer.cancel()
+            await sender.stop()
+            watcher.stop()
+            adb.shutdown()
+        return elapsed
+
+    # --- Запуск ---
+
+    def run(self) -> dict:
+        from src.database.db_manager import db
+        from src.core.models import SystemSettings
+        from src.core.sync_worker import SyncWorker
+
+        with db.get_session() as session:
+            session.merge(SystemSettings(setting_key=db.setting_key("linked_chat_id"), setting_value=str(LINKED_CHAT_ID)))
+            session.commit()
+
+        # Кожна подія дає рівно одне сповіщення: draft_received або pairing_failed
+        self.expected_notifications = self.args.count
+
+        worker = SyncWorker()
+        stop = threading.Event()
+        desktop = threading.Thread(target=self._desktop_loop, args=(worker, stop), name="desktop", daemon=True)
+        desktop.start()
+        try:
+            elapsed = asyncio.run(self._bot_side(db.db_path))
+        finally:
+            stop.set()
+            worker.running = False
+            desktop.join(timeout=10)
+
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        from src.core.config import Config
+
+        to_draft = [self.draft_at[s] - t for s, t in self.enqueued_at.items() if s in self.draft_at]
+        to_notify = [self.notified_at[s] - t for s, t in self.enqueued_at.items() if s in self.notified_at]
+        return {
+            "benchmark": "sync_pipeline",
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "sqlite_pragmas": {key: str(value) for key, value in Config.SQLITE_PRAGMAS.items()},
+                "payload_format": Config.SYNC_PAYLOAD_FORMAT,
+            },
+            "params": {
+                "count": self.args.count,
+                "rate": self.args.rate,
+                "pairing_ratio": self.args.pairing_ratio,
+                "workers": self.args.workers,
+                "global_rate": self.args.global_rate,
+                "per_chat_rate": self.args.per_chat_rate,
+                "per_chat_burst": self.args.per_chat_burst,
+                "send_latency_ms": self.args.send_latency_ms,
+                "batch_size": Config.SYNC_BATCH_SIZE,
+            },
+            "results": {
+                "enqueued": len(self.enqueued_at),
+                "drafts": len(self.draft_at),
+                "delivered": len(self.notified_at),
+                "expected": self.expected_notifications,
+                "elapsed_sec": round(elapsed, 3),
+                "throughput_msg_per_sec": round(len(self.notified_at) / elapsed, 2) if elapsed else None,
+                "latency_ms": {
+                    "enqueue_to_draft": percentiles(to_draft),
+                    "enqueue_to_notification": percentiles(to_notify),
+                },
+            },
+        }
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Навантажувальний тест синхронізації бот <-> десктоп.")
+    parser.add_argument("--count", type=int, default=1000, help="Кількість подій від бота")
+    parser.add_argument("--rate", type=float, default=200, help="Подій за секунду")
+    parser.add_argument("--pairing-ratio", type=float, default=0.1, help="Частка запитів на спарювання (0..1)")
+    parser.add_argument("--workers", type=int, default=8, help="Воркери OutboundSender")
+    # Ліміти Telegram за замовчуванням вимкнені: вимірюється сам конвеєр, а не 1 повідомлення/с на чат
+    parser.add_argument("--global-rate", type=float, default=1_000_000)
+    parser.add_argument("--per-chat-rate", type=float, default=1_000_000)
+    parser.add_argument("--per-chat-burst", type=float, default=1_000_000)
+    parser.add_argument("--send-latency-ms", type=float, default=0, help="Імітація затримки Bot API")
+    parser.add_argument("--timeout", type=float, default=120, help="Максимальний час очікування доставки (с)")
+    parser.add_argument("--db", default=None, help="Шлях до тимчасової бази (за замовчуванням - у tmp)")
+    parser.add_argument("--output", default=None, help="Файл для JSON-результату (інакше stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Тимчасова база задається до імпорту db_manager: глобальний `db` створюється при імпорті
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="sync_load_"), "bench.sqlite")
+    if os.path.exists(db_path):
+        sys.exit(f"База {db_path} вже існує - потрібна порожня тимчасова база.")
+    os.environ["DB_NAME"] = os.path.abspath(db_path)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    # Службовий вивід (міграції, попередження воркерів) - у stderr, щоб stdout містив лише JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        result = LoadTest(args).run()
+    result["db_path"] = os.environ["DB_NAME"]
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
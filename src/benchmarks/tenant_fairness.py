@@ -0,0 +1,214 @@
+"""
+Масштабування бота на багато тенантів (домогосподарств) в одному процесі.
+
+Запуск:
+    python src/benchmarks/tenant_fairness.py --tenants 2000 --hot-backlog 1000 --output result.json
+
+Сценарій найгіршого випадку для FIFO-черги: один "гарячий" тенант має великий
+накопичений backlog TO_BOT, а кожен з решти тенантів додає по одній події вже
+після нього. Бот (FeedbackConsumer + OutboundSender з фейковим відправником)
+розбирає чергу; вимірюється, скільки чекають "тихі" тенанти, поки гарячий
+розбирає свій backlog, а також час вибірки пакета з черги.
+
+Результат - JSON (stdout або --output).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+# --- Path Setup ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
+sys.path.insert(0, project_root)
+
+from src.benchmarks.sync_load import percentiles
+
+CHAT_BASE = 1_000_000  # Чат тенанта i = CHAT_BASE + i
+HOT_TENANT = "t0"
+
+class TenantFairnessTest:
+    """Один прогін на тимчасовій базі з `--tenants` тенантами."""
+
+    def __init__(self, args: argparse.Namespace, db_path: str):
+        self.args = args
+        self.db_path = db_path
+        self.delivered_at: Dict[str, List[float]] = {}  # tenant -> часи доставки
+        self.claim_times: List[float] = []
+        self.expected = 0
+        self._done = None
+        self._tenant_re = re.compile(r"bench-(t\d+)-")
+
+    def tenant_ids(self) -> List[str]:
+        return [f"t{i}" for i in range(self.args.tenants)]
+
+    def populate(self, db) -> int:
+        """Створює тенантів (ключ + прив'язаний чат) і наповнює чергу. Повертає кількість подій."""
+        from cryptography.fernet import Fernet
+        from src.core.models import SystemSettings, SyncQueue, SyncDirection
+        from src.core.tenants import tenant_setting_key
+
+        tenants = self.tenant_ids()
+        with db.get_session() as session:
+            for index, tenant_id in enumerate(tenants):
+                session.add(SystemSettings(setting_key=tenant_setting_key("enc_key", tenant_id),
+                                           setting_value=Fernet.generate_key().decode()))
+                session.add(SystemSettings(setting_key=tenant_setting_key("linked_chat_id", tenant_id),
+                                           setting_value=str(CHAT_BASE + index)))
+            session.commit()
+
+        def event(tenant_id: str, index: int, seq: int, timestamp: datetime) -> dict:
+            data = {"event": "draft_received",
+                    "data": {"chat_id": CHAT_BASE + index, "draft_id": seq, "name": f"bench-{tenant_id}-{seq}"}}
+            return dict(uuid=str(uuid.uuid4()), tenant_id=tenant_id, direction=SyncDirection.TO_BOT,
+                        timestamp=timestamp, **db.keys_for(tenant_id).encrypt_message(data))
+
+        # Гарячий тенант накопичив backlog раніше за всіх, тихі тенанти - по одній події після нього
+        start = datetime.utcnow() - timedelta(hours=1)
+        rows = [event(HOT_TENANT, 0, seq, start + timedelta(milliseconds=seq)) for seq in range(self.args.hot_backlog)]
+        later = start + timedelta(milliseconds=self.args.hot_backlog + 1)
+        rows += [event(tenant_id, index, 0, later + timedelta(microseconds=index))
+                 for index, tenant_id in enumerate(tenants) if tenant_id != HOT_TENANT]
+
+        with db.get_session() as session:
+            session.bulk_insert_mappings(SyncQueue, rows)
+            session.commit()
+        return len(rows)
+
+    async def _fake_send(self, chat_id: int, text: str):
+        if self.args.send_latency_ms:
+            await asyncio.sleep(self.args.send_latency_ms / 1000)
+        match = self._tenant_re.search(text)
+        if match:
+            self.delivered_at.setdefault(match.group(1), []).append(time.perf_counter())
+            if sum(len(times) for times in self.delivered_at.values()) >= self.expected:
+                self._done.set()
+
+    async def _run_bot(self, adb, watcher) -> float:
+        from src.bot.outbound import OutboundSender
+        from src.bot.feedback import FeedbackConsumer
+
+        self._done = asyncio.Event()
+        claim = adb.claim_feedback_batch
+
+        async def timed_claim(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await claim(*args, **kwargs)
+            finally:
+                self.claim_times.append(time.perf_counter() - started)
+
+        adb.claim_feedback_batch = timed_claim
+
+        sender = OutboundSender(
+            send=self._fake_send,
+            on_delivered=adb.ack,
+            on_failed=adb.fail,
+            workers=self.args.workers,
+            global_rate=self.args.global_rate,
+            per_chat_rate=self.args.per_chat_rate,
+            per_chat_burst=self.args.per_chat_burst
+        )
+        watcher.start()
+        sender.start()
+        self.started = time.perf_counter()
+        consumer = asyncio.create_task(FeedbackConsumer(adb, sender, watcher).run())
+        try:
+            await asyncio.wait_for(self._done.wait(), self.args.timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            elapsed = time.perf_counter() - self.started
+            consumer.cancel()
+            await sender.stop()
+            watcher.stop()
+        return elapsed
+
+    def run(self) -> dict:
+        from src.core.config import Config
+        from src.core.sync_notifier import DataVersionWatcher
+        from src.database.db_manager import DBManager
+        from src.bot.async_db import AsyncDB
+
+        db = DBManager(db_path=self.db_path)
+        setup_started = time.perf_counter()
+        self.expected = self.populate(db)
+        setup_sec = time.perf_counter() - setup_started
+
+        adb = AsyncDB(db)
+        watcher = DataVersionWatcher(self.db_path, interval=Config.SYNC_WATCH_INTERVAL_MS / 1000)
+        try:
+            elapsed = asyncio.run(self._run_bot(adb, watcher))
+        finally:
+            adb.shutdown()
+
+        quiet = [times[0] - self.started for tenant, times in self.delivered_at.items() if tenant != HOT_TENANT]
+        hot = self.delivered_at.get(HOT_TENANT, [])
+        delivered = sum(len(times) for times in self.delivered_at.values())
+        return {
+            "benchmark": "tenant_fairness",
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "environment": {"python": platform.python_version(), "platform": platform.platform()},
+            "params": {
+                "tenants": self.args.tenants,
+                "hot_backlog": self.args.hot_backlog,
+                "workers": self.args.workers,
+                "global_rate": self.args.global_rate,
+                "per_chat_rate": self.args.per_chat_rate,
+                "send_latency_ms": self.args.send_latency_ms,
+                "batch_size": Config.SYNC_BATCH_SIZE,
+            },
+            "results": {
+                "setup_sec": round(setup_sec, 3),
+                "expected": self.expected,
+                "delivered": delivered,
+                "elapsed_sec": round(elapsed, 3),
+                "throughput_msg_per_sec": round(delivered / elapsed, 2) if elapsed else None,
+                # Від старту бота до доставки єдиної події тихого тенанта
+                "quiet_tenant_latency_ms": percentiles(quiet),
+                "hot_tenant_drain_sec": round(max(hot) - self.started, 3) if hot else None,
+                "claim_batch_ms": percentiles(self.claim_times),
+            },
+        }
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Справедливість черги бота між тенантами.")
+    parser.add_argument("--tenants", type=int, default=2000, help="Кількість тенантів (включно з гарячим)")
+    parser.add_argument("--hot-backlog", type=int, default=1000, help="Накопичені події гарячого тенанта")
+    parser.add_argument("--workers", type=int, default=8, help="Воркери OutboundSender")
+    parser.add_argument("--global-rate", type=float, default=1_000_000)
+    parser.add_argument("--per-chat-rate", type=float, default=1_000_000)
+    parser.add_argument("--per-chat-burst", type=float, default=1_000_000)
+    parser.add_argument("--send-latency-ms", type=float, default=2, help="Імітація затримки Bot API")
+    parser.add_argument("--timeout", type=float, default=300, help="Максимальний час очікування доставки (с)")
+    parser.add_argument("--output", default=None, help="Файл для JSON-результату (інакше stdout)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="tenant_fairness_"), "bench.sqlite")
+    # Глобальний `db` створюється при імпорті db_manager - теж на тимчасовій базі
+    os.environ["DB_NAME"] = db_path
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    with contextlib.redirect_stdout(sys.stderr):
+        result = TenantFairnessTest(args, db_path).run()
+    result["db_path"] = db_path
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
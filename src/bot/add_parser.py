@@ -0,0 +1,92 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+SUPPORTED_CURRENCIES = ("UAH", "USD", "EUR")
+MAX_NAME_LENGTH = 255  # Draft.raw_name
+
+# Lowercased spellings users actually type -> ISO code
+CURRENCY_ALIASES = {
+    "uah": "UAH", "₴": "UAH", "грн": "UAH", "грн.": "UAH", "гривня": "UAH", "гривні": "UAH", "гривень": "UAH",
+    "hrn": "UAH", "grn": "UAH",
+    "usd": "USD", "$": "USD", "дол": "USD", "дол.": "USD", "долар": "USD", "долари": "USD", "доларів": "USD",
+    "dollar": "USD", "dollars": "USD",
+    "eur": "EUR", "€": "EUR", "євро": "EUR", "euro": "EUR", "euros": "EUR",
+}
+
+# An amount with an optional currency glued to either side: "12.99", "12,99$", "$12.99", "99грн"
+_AMOUNT_RE = re.compile(r"^(?P<pre>[^\d\s.,+-]*)(?P<number>\d+(?:[.,]\d+)?)(?P<post>[^\d\s]*)$")
+
+@dataclass
+class ParsedAdd:
+    """Fields recognized in `/add` arguments; None means the user still has to be asked."""
+    name: Optional[str] = None
+    amount: Optional[float] = None
+    currency: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.name is not None and self.amount is not None and self.currency is not None
+
+def validate_name(value: Optional[str]) -> str:
+    """Stripped subscription name. Raises ValueError with a user-facing reason (also for non-text messages)."""
+    name = (value or "").strip()
+    if not name:
+        raise ValueError("не вказано назву")
+    if len(name) > MAX_NAME_LENGTH:
+        raise ValueError(f"назва довша за {MAX_NAME_LENGTH} символів")
+    return name
+
+def normalize_currency(value: str) -> Optional[str]:
+    """ISO code for a currency code, symbol or word, or None if it is not supported."""
+    return CURRENCY_ALIASES.get(value.strip().lower())
+
+def parse_amount(value: str) -> Optional[float]:
+    """Positive amount with a decimal point or comma, or None."""
+    try:
+        amount = float(value.strip().replace(" ", "").replace(",", "."))
+    except ValueError:
+        return None
+    return round(amount, 2) if math.isfinite(amount) and amount > 0 else None
+
+def _split_amount(token: str):
+    """(amount, currency) from a token like "12,99$"; currency is None if absent, amount is None if not an amount."""
+    match = _AMOUNT_RE.match(token)
+    if not match:
+        return None, None
+    affix = match.group("pre") or match.group("post")
+    if match.group("pre") and match.group("post"):
+        return None, None
+    currency = normalize_currency(affix) if affix else None
+    if affix and currency is None:
+        return None, None
+    return parse_amount(match.group("number")), currency
+
+def parse_add_command(args: Optional[str]) -> ParsedAdd:
+    """
+    Parses `/add <name> <amount> [currency]`, e.g. "Netflix 12.99 USD",
+    "YouTube Premium 99,00 грн", "Spotify $4.99" or just "Netflix".
+
+    The name is everything before the last amount; the currency may follow
+    the amount as a separate word or be glued to it.
+    """
+    tokens = (args or "").split()
+    result = ParsedAdd()
+    if not tokens:
+        return result
+
+    # Trailing currency word: "... 12.99 USD"
+    if len(tokens) > 1 and normalize_currency(tokens[-1]):
+        result.currency = normalize_currency(tokens[-1])
+        tokens = tokens[:-1]
+
+    if len(tokens) > 1:
+        amount, currency = _split_amount(tokens[-1])
+        if amount is not None and (currency is None or result.currency in (None, currency)):
+            result.amount = amount
+            result.currency = result.currency or currency
+            tokens = tokens[:-1]
+
+    result.name = " ".join(tokens)
+    return result
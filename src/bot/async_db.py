@@ -0,0 +1,241 @@
+import asyncio
+import functools
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.core.models import SyncQueue, SyncDirection, SystemSettings, SettingsRevision, BotFSMState, SubscriptionSnapshot
+from src.core.tenants import DEFAULT_TENANT, tenant_setting_key
+from src.database.db_manager import DBManager
+from src.database.sqlite_tuning import run_with_busy_retry
+
+logger = logging.getLogger(__name__)
+
+class AsyncDB:
+    """
+    Non-blocking data access for the bot.
+
+    All SQLAlchemy work runs on a dedicated executor thread, so a slow or
+    locked SQLite write never stalls the asyncio event loop (and with it
+    every other chat's updates). Handlers only await the results.
+    """
+
+    def __init__(self, db_manager: DBManager, max_workers: int = 1):
+        self.db = db_manager
+        self.Session = db_manager.get_session
+        # A single worker serializes writes from this process and keeps SQLite lock contention low
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bot-db")
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Runs a blocking DB callable on the DB thread (with SQLITE_BUSY retries) and awaits it."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(run_with_busy_retry, func, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    # --- Settings ---
+
+    def _get_linked_chat_id(self, tenant_id: str = DEFAULT_TENANT) -> Optional[int]:
+        with self.Session() as session:
+            setting = session.query(SystemSettings).filter_by(setting_key=tenant_setting_key("linked_chat_id", tenant_id)).first()
+            if setting and setting.setting_value:
+                try:
+                    return int(setting.setting_value)
+                except ValueError:
+                    return None
+        return None
+
+    async def get_linked_chat_id(self, tenant_id: str = DEFAULT_TENANT) -> Optional[int]:
+        """Returns the tenant's linked chat ID from the database as int or None."""
+        return await self.run(self._get_linked_chat_id, tenant_id)
+
+    def _get_settings_revision(self) -> int:
+        with self.Session() as session:
+            return session.execute(select(SettingsRevision.revision).where(SettingsRevision.id == 1)).scalar() or 0
+
+    async def get_settings_revision(self) -> int:
+        """Returns the system_settings change counter (bumped by DB triggers)."""
+        return await self.run(self._get_settings_revision)
+
+    def _load_settings(self) -> Tuple[int, Dict[str, str]]:
+        with self.Session() as session:
+            # Revision and values are read in one transaction, so they always match
+            revision = session.execute(select(SettingsRevision.revision).where(SettingsRevision.id == 1)).scalar() or 0
+            rows = session.execute(select(SystemSettings.setting_key, SystemSettings.setting_value)).all()
+            return revision, {key: value for key, value in rows}
+
+    async def load_settings(self) -> Tuple[int, Dict[str, str]]:
+        """Returns (revision, {setting_key: setting_value}) for all system settings."""
+        return await self.run(self._load_settings)
+
+    # --- Subscription snapshots ---
+
+    def _load_snapshots(self, since_revision: int) -> List[Tuple[str, int, str]]:
+        with self.Session() as session:
+            rows = session.execute(
+                select(SubscriptionSnapshot.tenant_id, SubscriptionSnapshot.revision, SubscriptionSnapshot.payload)
+                .where(SubscriptionSnapshot.revision > since_revision)
+            ).all()
+            return [tuple(row) for row in rows]
+
+    async def load_snapshots(self, since_revision: int = 0) -> List[Tuple[str, int, str]]:
+        """Returns (tenant_id, revision, payload JSON) of snapshots published after `since_revision`."""
+        return await self.run(self._load_snapshots, since_revision)
+
+    # --- FSM storage ---
+
+    def _fsm_load(self, storage_key: str) -> Optional[Tuple[Optional[str], str, datetime]]:
+        with self.Session() as session:
+            row = session.execute(
+                select(BotFSMState.state, BotFSMState.data, BotFSMState.updated_at)
+                .where(BotFSMState.storage_key == storage_key)
+            ).first()
+            return tuple(row) if row else None
+
+    async def fsm_load(self, storage_key: str) -> Optional[Tuple[Optional[str], str, datetime]]:
+        """Returns (state, data JSON, updated_at) for a conversation or None."""
+        return await self.run(self._fsm_load, storage_key)
+
+    def _fsm_save(self, storage_key: str, state: Optional[str], data: str):
+        with self.Session() as session:
+            if state is None and data == "{}":
+                # Finished conversation: nothing to keep
+                session.execute(delete(BotFSMState).where(BotFSMState.storage_key == storage_key))
+            else:
+                stmt = sqlite_insert(BotFSMState).values(
+                    storage_key=storage_key, state=state, data=data, updated_at=datetime.utcnow()
+                )
+                session.execute(stmt.on_conflict_do_update(
+                    index_elements=[BotFSMState.storage_key],
+                    set_={"state": stmt.excluded.state, "data": stmt.excluded.data, "updated_at": stmt.excluded.updated_at}
+                ))
+            session.commit()
+
+    async def fsm_save(self, storage_key: str, state: Optional[str], data: str):
+        """Upserts one conversation (deletes it when both state and data are empty)."""
+        await self.run(self._fsm_save, storage_key, state, data)
+
+    def _fsm_purge(self, older_than: datetime) -> int:
+        with self.Session() as session:
+            result = session.execute(delete(BotFSMState).where(BotFSMState.updated_at < older_than))
+            session.commit()
+            return result.rowcount
+
+    async def fsm_purge(self, older_than: datetime) -> int:
+        """Deletes conversations not touched since `older_than`."""
+        return await self.run(self._fsm_purge, older_than)
+
+    # --- FROM_BOT producers ---
+
+    def _enqueue_from_bot(self, payloads: List[Dict[str, Any]], tenant_id: str = DEFAULT_TENANT) -> bool:
+        keys = self.db.keys_for(tenant_id)
+        if not keys.get():
+            return False
+
+        timestamp = datetime.utcnow()
+        with self.Session() as session:
+            session.add_all([
+                SyncQueue(
+                    uuid=str(uuid.uuid4()),
+                    tenant_id=tenant_id,
+                    direction=SyncDirection.FROM_BOT,
+                    timestamp=timestamp,
+                    **keys.encrypt_message(payload)
+                )
+                for payload in payloads
+            ])
+            session.commit()
+        return True
+
+    async def enqueue_from_bot(self, payload: Dict[str, Any], tenant_id: str = DEFAULT_TENANT) -> bool:
+        """Encrypts (with the tenant's key) and queues a message for that tenant's Desktop. Returns False if no key exists."""
+        return await self.run(self._enqueue_from_bot, [payload], tenant_id)
+
+    async def enqueue_many_from_bot(self, payloads: List[Dict[str, Any]], tenant_id: str = DEFAULT_TENANT) -> bool:
+        """Like `enqueue_from_bot`, but queues all payloads in one transaction."""
+        return await self.run(self._enqueue_from_bot, payloads, tenant_id)
+
+    # --- TO_BOT consumer ---
+
+    def _claim_feedback_batch(self, limit: int, exclude: Collection[str] = ()) -> Tuple[int, List[Tuple[str, Dict[str, Any]]]]:
+        with self.Session() as session:
+            # Round-robin across tenants: the oldest row of every tenant comes before the second-oldest
+            # of any tenant, so one tenant's large backlog never delays the others' notifications
+            ready = (
+                select(
+                    SyncQueue.uuid,
+                    func.row_number().over(partition_by=SyncQueue.tenant_id, order_by=SyncQueue.timestamp).label("turn")
+                )
+                .where(SyncQueue.direction == SyncDirection.TO_BOT)
+                .where(self.db.sync_ready_condition(datetime.utcnow()))
+            )
+            if exclude:
+                ready = ready.where(SyncQueue.uuid.not_in(list(exclude)))
+            ready = ready.subquery()
+            stmt = (
+                select(SyncQueue)
+                .join(ready, ready.c.uuid == SyncQueue.uuid)
+                .order_by(ready.c.turn, SyncQueue.timestamp)
+                .limit(limit)
+            )
+            messages = session.execute(stmt).scalars().all()
+            events = []
+            failed = 0
+
+            for msg in messages:
+                try:
+                    keys = self.db.keys_for(msg.tenant_id)
+                    if not keys.get():
+                        raise ValueError("Encryption key not found")
+                    events.append((msg.uuid, keys.decrypt_message(msg)))
+                except Exception as e:
+                    logger.error(f"Failed to decrypt or parse payload for msg {msg.uuid}: {e}")
+                    # Postpone with backoff (dead letter after SYNC_MAX_ATTEMPTS) so healthy rows keep flowing
+                    self.db.apply_sync_failure(session, msg, f"decrypt: {e!r}")
+                    failed += 1
+
+            if failed:
+                session.commit()
+
+            return len(messages), events
+
+    async def claim_feedback_batch(self, limit: int, exclude: Collection[str] = ()) -> Tuple[int, List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Reads up to `limit` ready TO_BOT messages (FIFO per tenant, tenants
+        interleaved) and decrypts each with its tenant's key,
+        skipping `exclude` (rows that are already being delivered) and rows
+        waiting for their next retry. Undecryptable rows are postponed.
+        Returns (claimed, [(uuid, data), ...]).
+        No transaction is held open while the caller delivers the events.
+        """
+        return await self.run(self._claim_feedback_batch, limit, tuple(exclude))
+
+    def _ack(self, uuids: List[str]) -> int:
+        if not uuids:
+            return 0
+        with self.Session() as session:
+            result = session.execute(delete(SyncQueue).where(SyncQueue.uuid.in_(uuids)))
+            session.commit()
+            return result.rowcount
+
+    async def ack(self, uuids: List[str]) -> int:
+        """Removes handled messages with one set-based DELETE and one COMMIT."""
+        return await self.run(self._ack, uuids)
+
+    async def fail(self, failures: List[Tuple[str, str, bool]]) -> int:
+        """Records failed deliveries: (uuid, error, permanent). Returns how many went to the dead letter table."""
+        return await self.run(self.db.record_sync_failures, failures)
+
+    # --- Maintenance ---
+
+    async def purge_expired(self) -> int:
+        """Deletes TO_BOT events whose TTL has passed."""
+        return await self.run(self.db.purge_expired_sync_events)
+
+    async def maybe_checkpoint(self):
+        await self.run(self.db.maybe_checkpoint)
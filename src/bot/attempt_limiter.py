@@ -0,0 +1,47 @@
+import time
+from collections import deque
+from typing import Callable, Deque, Dict
+
+
+class AttemptLimiter:
+    """
+    Sliding-window limit on attempts per chat (e.g. /pair codes).
+
+    A chat may make at most `max_attempts` attempts within `window_sec`; older attempts
+    fall out of the window. Chats whose window has emptied are dropped, so memory stays
+    proportional to the chats that tried recently.
+    """
+
+    def __init__(self, max_attempts: int, window_sec: float, clock: Callable[[], float] = time.monotonic):
+        self.max_attempts = max_attempts
+        self.window_sec = window_sec
+        self._clock = clock
+        self._attempts: Dict[int, Deque[float]] = {}
+
+    def _prune(self, now: float):
+        expired = [chat_id for chat_id, attempts in self._attempts.items()
+                   if attempts[-1] <= now - self.window_sec]
+        for chat_id in expired:
+            del self._attempts[chat_id]
+
+    def allow(self, chat_id: int) -> bool:
+        """Record an attempt for the chat; False if it is over the limit (the attempt is not counted)."""
+        now = self._clock()
+        self._prune(now)
+        attempts = self._attempts.setdefault(chat_id, deque())
+        while attempts and attempts[0] <= now - self.window_sec:
+            attempts.popleft()
+        if len(attempts) >= self.max_attempts:
+            return False
+        attempts.append(now)
+        return True
+
+    def retry_after(self, chat_id: int) -> float:
+        """Seconds until the chat may try again (0 if it may try now)."""
+        attempts = self._attempts.get(chat_id)
+        if not attempts or len(attempts) < self.max_attempts:
+            return 0.0
+        return max(0.0, attempts[0] + self.window_sec - self._clock())
+
+    def __len__(self) -> int:
+        return len(self._attempts)
@@ -0,0 +1,154 @@
+import codecs
+import csv
+import io
+import itertools
+import json
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from src.bot.add_parser import normalize_currency, parse_amount, validate_name
+
+MAX_REPORTED_ERRORS = 10
+
+# Accepted column / key names (case-insensitive)
+NAME_FIELDS = ("name", "raw_name", "назва")
+AMOUNT_FIELDS = ("amount", "cost", "price", "вартість", "сума")
+CURRENCY_FIELDS = ("currency", "валюта")
+
+class ImportFileError(ValueError):
+    """The file as a whole cannot be read (wrong format, broken JSON, no header)."""
+
+@dataclass
+class ImportResult:
+    rows: List[Dict[str, Any]] = field(default_factory=list)  # Valid drafts: raw_name, amount, currency
+    errors: List[Tuple[int, str]] = field(default_factory=list)  # First MAX_REPORTED_ERRORS (row number, reason)
+    error_count: int = 0
+    truncated: bool = False  # Stopped at max_rows, the rest of the file was not read
+
+def detect_format(file_name: Optional[str], mime_type: Optional[str]) -> Optional[str]:
+    """Returns "csv" or "json" for a Telegram document, or None if it is neither."""
+    name = (file_name or "").lower()
+    if name.endswith(".csv") or mime_type in ("text/csv", "application/csv"):
+        return "csv"
+    if name.endswith((".json", ".jsonl", ".ndjson")) or mime_type == "application/json":
+        return "json"
+    return None
+
+def _pick(record: Dict[str, Any], names: Tuple[str, ...]) -> Any:
+    for name in names:
+        if name in record and record[name] not in (None, ""):
+            return record[name]
+    return None
+
+def validate_record(record: Any) -> Dict[str, Any]:
+    """Normalizes one row to a draft dict. Raises ValueError with a user-facing reason."""
+    if not isinstance(record, dict):
+        raise ValueError("очікується об'єкт")
+    record = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+
+    name = validate_name(str(_pick(record, NAME_FIELDS) or ""))
+
+    raw_amount = _pick(record, AMOUNT_FIELDS)
+    if raw_amount is None:
+        raise ValueError("не вказано вартість")
+    amount = parse_amount(str(raw_amount))
+    if amount is None:
+        raise ValueError(f"некоректна вартість: {raw_amount!r}")
+
+    raw_currency = str(_pick(record, CURRENCY_FIELDS) or "UAH")
+    currency = normalize_currency(raw_currency)
+    if currency is None:
+        raise ValueError(f"непідтримувана валюта: {raw_currency.strip()}")
+
+    return {"raw_name": name, "amount": amount, "currency": currency}
+
+def iter_csv_records(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yields (line number, row) from a CSV file with a header, one row at a time."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    header = text.readline()
+    if not header.strip():
+        raise ImportFileError("файл порожній або не має рядка заголовків")
+    # Spreadsheet exports use ";" in locales where "," is the decimal separator
+    delimiter = max(",;\t", key=header.count)
+    reader = csv.DictReader(itertools.chain([header], text), delimiter=delimiter)
+    try:
+        for row in reader:
+            if any(value for value in row.values() if isinstance(value, str) and value.strip()):
+                yield reader.line_num, row
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ImportFileError(f"помилка читання CSV (рядок {reader.line_num}): {e}") from None
+
+def iter_json_records(stream: BinaryIO, chunk_size: int = 64 * 1024) -> Iterator[Tuple[int, Any]]:
+    """
+    Yields (item number, object) from a JSON array of objects or from JSON Lines,
+    decoding incrementally: only the current object has to fit in memory.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, pos, eof = "", 0, False
+    in_array, started, number = False, False, 0
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+        pos = 0
+        return not eof
+
+    try:
+        fill()
+        while True:
+            # Skip whitespace (and commas between array items)
+            while True:
+                while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ",")):
+                    pos += 1
+                if pos < len(buffer) or not fill():
+                    break
+            if pos >= len(buffer):
+                if in_array:
+                    raise ImportFileError("JSON-масив не закрито")
+                return
+
+            char = buffer[pos]
+            if not started:
+                started = True
+                if char == "[":
+                    in_array = True
+                    pos += 1
+                    continue
+            if in_array and char == "]":
+                return
+            if char != "{":
+                raise ImportFileError("очікується масив об'єктів або JSON Lines")
+
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                    break
+                except json.JSONDecodeError as e:
+                    if not fill():
+                        raise ImportFileError(f"некоректний JSON: {e.msg}") from None
+            pos = end
+            number += 1
+            yield number, item
+    except UnicodeDecodeError:
+        raise ImportFileError("файл має бути в кодуванні UTF-8") from None
+
+def parse_import(stream: BinaryIO, file_format: str, max_rows: int) -> ImportResult:
+    """Streams the file, validating row by row; stops reading once `max_rows` valid rows are collected."""
+    records = iter_csv_records(stream) if file_format == "csv" else iter_json_records(stream)
+    result = ImportResult()
+    for number, record in records:
+        if len(result.rows) >= max_rows:
+            result.truncated = True
+            break
+        try:
+            result.rows.append(validate_record(record))
+        except ValueError as e:
+            result.error_count += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append((number, str(e)))
+    return result
+
+def chunked(rows: List[Dict[str, Any]], size: int) -> List[List[Dict[str, Any]]]:
+    return [rows[start:start + size] for start in range(0, len(rows), size)]
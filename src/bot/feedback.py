@@ -0,0 +1,127 @@
+import asyncio
+import html
+import logging
+import time
+from typing import Any, Dict, Optional
+from src.core.config import Config
+from src.core.sync_notifier import DataVersionWatcher, AdaptiveBackoff
+from src.bot.async_db import AsyncDB
+from src.bot.outbound import OutboundSender
+
+logger = logging.getLogger(__name__)
+
+def _escaped(details: Dict[str, Any], key: str) -> str:
+    """Names come from users and the desktop: escape them so they cannot break the HTML parse mode."""
+    return html.escape(str(details.get(key)), quote=False)
+
+def render_feedback(event: str, details: Dict[str, Any]) -> Optional[str]:
+    """Returns the Telegram text for one Desktop feedback event, or None if nothing should be sent."""
+    if event == "subscription_approved":
+        return (
+            f"✅ Вашу заявку <b>{_escaped(details, 'original_draft')}</b> схвалено!\n"
+            f"Додано як: <b>{_escaped(details, 'new_name')}</b> ({details.get('cost_uah')} UAH)"
+        )
+    elif event == "pairing_success":
+        return "✅ <b>Успішно підключено!</b>\nТепер ви можете додавати підписки через /add."
+    elif event == "pairing_failed":
+        return "❌ <b>Помилка підключення.</b>\nПеревірте код та спробуйте ще раз."
+    elif event == "error_not_paired":
+        return "⛔️ <b>Ваша заявка відхилена.</b>\nВикористайте <code>/pair КОД</code> для підключення до десктопа."
+    elif event == "draft_rejected":
+        return f"❌ Вашу заявку (ID: {details.get('draft_id')}) відхилено."
+    elif event == "draft_received":
+        return (
+            f"📥 Сервер отримав заявку: <b>{_escaped(details, 'name')}</b>\n"
+            f"Присвоєно ID: <b>{details.get('draft_id')}</b>"
+        )
+    elif event == "payment_reminder":
+        return (
+            f"🗓️ <b>Нагадування про платіж</b>\n\n"
+            f"Скоро потрібно сплатити за підписку: <b>{_escaped(details, 'name')}</b>\n"
+            f"<b>Сума:</b> {details.get('cost_uah')} UAH\n"
+            f"<b>Дата списання:</b> {details.get('next_payment')}"
+        )
+    return None
+
+class FeedbackConsumer:
+    """
+    Drains TO_BOT SyncQueue events (Desktop -> Bot) and hands them to the
+    outbound sender. Rows are acknowledged (deleted) by the sender only
+    after Telegram accepted the message.
+    """
+
+    def __init__(self, adb: AsyncDB, sender: OutboundSender, watcher: DataVersionWatcher,
+                 batch_size: int = None, max_inflight: int = None):
+        self.adb = adb
+        self.sender = sender
+        self.watcher = watcher
+        self.batch_size = batch_size or Config.SYNC_BATCH_SIZE
+        self.max_inflight = max_inflight or Config.BOT_MAX_INFLIGHT
+        self.backoff = AdaptiveBackoff(Config.SYNC_FALLBACK_MIN_SEC, Config.SYNC_FALLBACK_MAX_SEC)
+        self._next_purge = 0.0 # First pass right after startup clears what expired while offline
+
+    async def drain_batch(self) -> int:
+        """
+        Claims up to `batch_size` events that are not already in flight and
+        submits them for delivery. Returns the number of claimed rows.
+        """
+        claimed, events = await self.adb.claim_feedback_batch(
+            self.batch_size, exclude=self.sender.inflight
+        )
+        handled_uuids = []
+
+        for msg_uuid, data in events:
+            event = data.get("event")
+            details = data.get("data", {})
+            logger.info(f"📨 Feedback received: {event} - {details}")
+
+            chat_id = details.get("chat_id")
+            text = render_feedback(event, details) if chat_id else None
+            if text:
+                self.sender.submit(chat_id, text, ack_id=msg_uuid)
+            else:
+                handled_uuids.append(msg_uuid) # Nothing to deliver, just remove from queue
+
+        await self.adb.ack(handled_uuids)
+        return claimed
+
+    async def drain(self) -> int:
+        """Drains full batches until the queue is empty or the sender is saturated."""
+        total = 0
+        while len(self.sender.inflight) < self.max_inflight:
+            claimed = await self.drain_batch()
+            total += claimed
+            if claimed < self.batch_size:
+                break
+        return total
+
+    async def purge_expired(self):
+        """Drops expired events at most once per SYNC_PURGE_INTERVAL_SEC (claims already skip them)."""
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + Config.SYNC_PURGE_INTERVAL_SEC
+        try:
+            purged = await self.adb.purge_expired()
+            if purged:
+                logger.info(f"🗑️ Dropped {purged} expired feedback events")
+        except Exception as e:
+            logger.error(f"Failed to purge expired feedback events: {e}")
+
+    async def run(self):
+        """Background task that drains the queue whenever the DB file changes."""
+        while True:
+            generation = self.watcher.generation
+            try:
+                if await self.drain():
+                    self.backoff.reset()
+            except Exception as e:
+                logger.error(f"Database error in feedback loop: {e}")
+
+            await self.purge_expired()
+            await self.adb.maybe_checkpoint()
+
+            # Wait for a change in the DB file (new rows or our own acks); the backoff timeout is only a fallback
+            if await self.watcher.wait_async(generation, self.backoff.next()) and Config.SYNC_BATCH_LINGER_MS:
+                # Let a burst accumulate so it is handled as one batch
+                await asyncio.sleep(Config.SYNC_BATCH_LINGER_MS / 1000)
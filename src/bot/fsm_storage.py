@@ -0,0 +1,105 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Optional, Tuple
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from src.core.config import Config
+from src.bot.async_db import AsyncDB
+
+logger = logging.getLogger(__name__)
+
+class SQLiteStorage(BaseStorage):
+    """
+    aiogram FSM storage on the shared SQLite file (table bot_fsm_state).
+
+    - Every change is written through, so a half-finished /add survives the
+      bot process being killed and restarted.
+    - A bounded LRU in front of the table answers the state lookup that
+      aiogram performs for every update, including "no state" results, so
+      idle chats cost no I/O and memory stays flat.
+    - Conversations untouched for `ttl` seconds are treated as empty and are
+      periodically deleted from the table.
+    """
+
+    def __init__(self, adb: AsyncDB, ttl: float = None, cache_size: int = None, purge_interval: float = None):
+        self.adb = adb
+        self.ttl = ttl if ttl is not None else Config.BOT_FSM_TTL_SEC
+        self.cache_size = cache_size if cache_size is not None else Config.BOT_FSM_CACHE_SIZE
+        self.purge_interval = purge_interval if purge_interval is not None else Config.BOT_FSM_PURGE_INTERVAL_SEC
+        # storage_key -> (state, data, monotonic time of the last write)
+        self._cache: "OrderedDict[str, Tuple[Optional[str], Dict[str, Any], float]]" = OrderedDict()
+        self._next_purge = 0.0
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(str(part) if part is not None else "" for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny
+        ))
+
+    def _expired(self, written_at: float) -> bool:
+        return bool(self.ttl) and time.monotonic() - written_at > self.ttl
+
+    def _remember(self, storage_key: str, state: Optional[str], data: Dict[str, Any], written_at: float):
+        self._cache[storage_key] = (state, data, written_at)
+        self._cache.move_to_end(storage_key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _load(self, key: StorageKey) -> Tuple[Optional[str], Dict[str, Any]]:
+        storage_key = self._key(key)
+        cached = self._cache.get(storage_key)
+        if cached is not None and not self._expired(cached[2]):
+            self._cache.move_to_end(storage_key)
+            return cached[0], cached[1]
+
+        row = await self.adb.fsm_load(storage_key)
+        state, data, written_at = None, {}, time.monotonic()
+        if row:
+            age = (datetime.utcnow() - row[2]).total_seconds()
+            if not self.ttl or age <= self.ttl:
+                state, data = row[0], json.loads(row[1] or "{}")
+                written_at -= age # Keep the TTL clock of the stored conversation
+        self._remember(storage_key, state, data, written_at)
+        return state, data
+
+    async def _save(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]):
+        storage_key = self._key(key)
+        await self.adb.fsm_save(storage_key, state, json.dumps(data, ensure_ascii=False))
+        self._remember(storage_key, state, data, time.monotonic())
+        await self._maybe_purge()
+
+    async def _maybe_purge(self):
+        now = time.monotonic()
+        if not self.ttl or now < self._next_purge:
+            return
+        self._next_purge = now + self.purge_interval
+        try:
+            purged = await self.adb.fsm_purge(datetime.utcnow() - timedelta(seconds=self.ttl))
+            if purged:
+                logger.info(f"🗑️ Dropped {purged} stale FSM conversations")
+        except Exception as e:
+            logger.error(f"Failed to purge stale FSM conversations: {e}")
+
+    # --- BaseStorage ---
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, data = await self._load(key)
+        await self._save(key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        state, _ = await self._load(key)
+        await self._save(key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(key)
+        return dict(data)
+
+    async def close(self) -> None:
+        self._cache.clear()
@@ -1,26 +1,39 @@
 import asyncio
+import html
 import logging
 import sys
 import os
-import json
+import tempfile
+import uuid
 from aiogram import Bot, Dispatcher, Router, types, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import (InlineKeyboardMarkup, InlineKeyboardButton, InlineQueryResultArticle,
+                           InlineQueryResultsButton, InputTextMessageContent)
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
-from sqlalchemy import create_engine, select, delete
-from sqlalchemy.orm import sessionmaker
-from cryptography.fernet import Fernet
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
 # --- Path Setup ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
 sys.path.insert(0, project_root)
 
-from src.core.models import SyncQueue, SyncDirection, Draft, SystemSettings
+from src.core.config import Config
+from src.core.sync_notifier import DataVersionWatcher
 from src.database.db_manager import DBManager
+from src.bot.async_db import AsyncDB
+from src.bot.outbound import OutboundSender
+from src.bot.feedback import FeedbackConsumer
+from src.bot.settings_cache import SettingsCache
+from src.bot.snapshot_cache import SnapshotCache, format_date, format_item
+from src.bot.attempt_limiter import AttemptLimiter
+from src.bot.add_parser import parse_add_command, parse_amount, validate_name
+from src.bot.bulk_import import ImportFileError, chunked, detect_format, parse_import
+from src.bot.fsm_storage import SQLiteStorage
+from src.bot.webhook import run_webhook
 
 # --- Logging ---
 logging.basicConfig(level=logging.INFO)
@@ -30,18 +43,39 @@ logger = logging.getLogger(__name__)
 TOKEN = os.getenv("BOT_TOKEN")
 DB_PATH = os.path.abspath(os.path.join(project_root, "src", "server", "sub_manager.sqlite"))
 
+INLINE_PAGE_SIZE = 50  # Telegram's maximum results per inline answer
+INLINE_CACHE_TIME = 5  # Seconds Telegram may reuse an answer; short, so edits on the desktop show up quickly
+
 if not TOKEN:
     logger.error("BOT_TOKEN not found in environment variables!")
     sys.exit(1)
+try:
+    Config.validate_bot()
+except ValueError as e:
+    logger.error(str(e))
+    sys.exit(1)
 
 # --- Database ---
 db_manager = DBManager(db_path=DB_PATH)
-Session = db_manager.get_session
+# Handlers and background tasks access SQLite only through this (dedicated DB thread)
+adb = AsyncDB(db_manager)
+
+# Watches the shared SQLite file so the feedback loop wakes up as soon as the desktop commits
+db_watcher = DataVersionWatcher(DB_PATH, interval=Config.SYNC_WATCH_INTERVAL_MS / 1000)
+# Authorization data and other settings live in memory and are reloaded when the desktop changes them
+settings = SettingsCache(adb, db_watcher)
+# Read model of subscriptions published by the desktop, serves /list, /next and /total from memory
+snapshots = SnapshotCache(adb, db_watcher)
+# Pairing codes are only 6 digits, so wrong guesses are limited per chat
+pair_attempts = AttemptLimiter(Config.BOT_PAIR_MAX_ATTEMPTS, Config.BOT_PAIR_WINDOW_SEC)
 
 # --- Bot Setup ---
-# Initialize Bot with DefaultBotProperties for parse_mode
-bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher()
+# Initialize Bot with DefaultBotProperties for parse_mode.
+# BOT_API_URL points the bot to a different Bot API server (local server or a fake one for tests).
+api_session = AiohttpSession(api=TelegramAPIServer.from_base(Config.BOT_API_URL)) if Config.BOT_API_URL else None
+bot = Bot(token=TOKEN, session=api_session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+# FSM conversations (/add) are persisted in SQLite with TTL eviction and a bounded LRU in front
+dp = Dispatcher(storage=SQLiteStorage(adb))
 router = Router()
 dp.include_router(router)
 
@@ -51,34 +85,23 @@ class AddSub(StatesGroup):
     waiting_for_amount = State()
     waiting_for_currency = State()
 
-# --- Helper Functions ---
-def get_linked_chat_id():
-    """Returns the linked chat ID from the database as int or None."""
-    with Session() as session:
-        setting = session.query(SystemSettings).filter_by(setting_key="linked_chat_id").first()
-        if setting and setting.setting_value:
-            try:
-                return int(setting.setting_value)
-            except ValueError:
-                return None
-    return None
-
 # --- Handlers ---
 
 @router.message(Command("start"))
 async def cmd_start(message: types.Message):
-    linked_id = get_linked_chat_id()
+    tenant_id = settings.tenant_for_chat(message.chat.id)
     user_name = message.from_user.first_name or "Користувач"
     
-    if linked_id == message.chat.id:
+    if tenant_id is not None:
         # Scenario: Connected and Authorized
         await message.answer(
             f"👋 <b>Вітаю, {user_name}!</b>\n\n"
             "✅ Бот успішно підключено до вашого ПК.\n"
-            "Ви можете додавати нові підписки за допомогою команди /add."
+            "Ви можете додавати нові підписки за допомогою команди /add.\n"
+            "Перегляд: /list - усі підписки, /next - найближчий платіж, /total - витрати."
         )
-    elif linked_id is None:
-        # Scenario: Not Connected to ANY PC
+    else:
+        # Scenario: Not Connected to ANY PC (every household pairs its own chat)
         await message.answer(
             f"👋 <b>Вітаю, {user_name}!</b>\n\n"
             "⛔️ <b>Бот наразі не підключено до жодного ПК.</b>\n\n"
@@ -87,27 +110,13 @@ async def cmd_start(message: types.Message):
             "2. Натисніть 'Згенерувати код'.\n"
             "3. Надішліть сюди команду: <code>/pair КОД</code>"
         )
-    else:
-        # Scenario: Connected to SOMEONE ELSE
-        await message.answer(
-            f"👋 <b>Вітаю, {user_name}!</b>\n\n"
-            "⚠️ <b>Доступ обмежено.</b>\n"
-            "Цей бот вже прив'язаний до іншого користувача.\n"
-            "Якщо це ваша копія бота, будь ласка, відв'яжіть старий акаунт у налаштуваннях десктопного додатка."
-        )
 
 @router.message(Command("pair"))
 async def cmd_pair(message: types.Message):
     """Pair the bot with the Desktop application using a code."""
-    linked_id = get_linked_chat_id()
-    
-    if linked_id == message.chat.id:
+    if settings.tenant_for_chat(message.chat.id) is not None:
         await message.answer("✅ Ви вже підключені! Використовуйте /add.")
         return
-    
-    if linked_id is not None:
-        await message.answer("⛔️ Бот вже прив'язаний до іншого пристрою. Спочатку відв'яжіть його в налаштуваннях десктопа.")
-        return
 
     try:
         parts = message.text.split(maxsplit=1)
@@ -120,218 +129,292 @@ async def cmd_pair(message: types.Message):
         await message.answer("❌ <b>Помилка формату.</b>\nВикористання: <code>/pair 123456</code>")
         return
 
+    if not pair_attempts.allow(message.chat.id):
+        minutes = max(1, round(pair_attempts.retry_after(message.chat.id) / 60))
+        await message.answer(f"⛔️ Забагато спроб підключення. Спробуйте знову через {minutes} хв.")
+        return
+
+    # The code identifies the desktop (tenant) that generated it
+    tenant_id = settings.tenant_for_code(code)
+    if tenant_id is None:
+        await message.answer("❌ <b>Помилка підключення.</b>\nПеревірте код та спробуйте ще раз.")
+        return
+
+    if settings.linked_chat_id(tenant_id) is not None:
+        await message.answer("⛔️ Цей ПК вже прив'язаний до іншого чату. Спочатку відв'яжіть його в налаштуваннях десктопа.")
+        return
+
     payload = {
         "event": "pairing_request",
         "code": code,
         "chat_id": message.chat.id
     }
     
-    with Session() as session:
-        import uuid
-        from datetime import datetime
+    if not await adb.enqueue_from_bot(payload, tenant_id):
+        await message.answer("❌ Помилка безпеки: ключ шифрування не знайдено на сервері.")
+        return
 
-        enc_key_setting = session.query(SystemSettings).filter_by(setting_key="enc_key").first()
-        if not enc_key_setting:
-            await message.answer("❌ Помилка безпеки: ключ шифрування не знайдено на сервері.")
-            return
-        
-        fernet = Fernet(enc_key_setting.setting_value.encode('utf-8'))
-        encrypted_payload = fernet.encrypt(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
-
-        sync_item = SyncQueue(
-            uuid=str(uuid.uuid4()),
-            payload=encrypted_payload.decode('utf-8'),
-            direction=SyncDirection.FROM_BOT,
-            timestamp=datetime.utcnow()
-        )
-        session.add(sync_item)
-        session.commit()
-    
     await message.answer("🔄 Запит на підключення надіслано...")
 
 @router.message(Command("add"))
-async def cmd_add(message: types.Message, state: FSMContext):
-    linked_id = get_linked_chat_id()
-    
-    # Strict Authorization Check
-    if linked_id != message.chat.id:
-        if linked_id is None:
-             await message.answer("⛔️ <b>Помилка доступу.</b>\nСпочатку виконайте спарювання через <code>/pair КОД</code>.")
-        else:
-             await message.answer("⛔️ <b>Доступ заборонено.</b>\nБот прив'язаний до іншого користувача.")
+async def cmd_add(message: types.Message, state: FSMContext, command: CommandObject):
+    # Strict Authorization Check: the chat must be paired with some desktop (tenant)
+    if settings.tenant_for_chat(message.chat.id) is None:
+        await message.answer("⛔️ <b>Помилка доступу.</b>\nСпочатку виконайте спарювання через <code>/pair КОД</code>.")
         return
 
-    await message.answer("📝 Введіть назву підписки (наприклад, Netflix):")
-    await state.set_state(AddSub.waiting_for_name)
+    # One-shot form: /add Netflix 12.99 USD; the conversation only asks for what is missing
+    parsed = parse_add_command(command.args)
+    await state.clear()
+    if parsed.name is not None:
+        try:
+            parsed.name = validate_name(parsed.name)
+        except ValueError as e:
+            await message.answer(f"❌ Некоректна назва: {e}.")
+            return
+    if parsed.complete:
+        await message.answer(await submit_draft(message.chat.id, parsed.name, parsed.amount, parsed.currency))
+        return
+
+    if parsed.currency:
+        await state.update_data(currency=parsed.currency)
+    if parsed.name is None:
+        await message.answer(
+            "📝 Введіть назву підписки (наприклад, Netflix):\n"
+            "<i>Порада: можна одним повідомленням - <code>/add Netflix 12.99 USD</code></i>"
+        )
+        await state.set_state(AddSub.waiting_for_name)
+    elif parsed.amount is None:
+        await state.update_data(name=parsed.name)
+        await message.answer("💰 Введіть вартість (тільки число, наприклад 12.99):")
+        await state.set_state(AddSub.waiting_for_amount)
+    else:
+        await state.update_data(name=parsed.name, amount=parsed.amount)
+        await ask_currency(message, state)
+
+@router.message(Command("list", "next", "total"))
+async def cmd_read_only(message: types.Message):
+    """Read-only views of the subscriptions, answered from the in-memory snapshot."""
+    tenant_id = settings.tenant_for_chat(message.chat.id)
+    if tenant_id is None:
+        await message.answer("⛔️ <b>Помилка доступу.</b>\nСпочатку виконайте спарювання через <code>/pair КОД</code>.")
+        return
+
+    command = message.text.split(maxsplit=1)[0].lstrip("/").split("@", 1)[0].lower()
+    text = snapshots.reply(tenant_id, command)
+    if text is None:
+        text = "⏳ Дані ще не синхронізовані. Відкрийте програму на комп'ютері та спробуйте пізніше."
+    await message.answer(text)
+
+@router.inline_query()
+async def inline_search(inline_query: types.InlineQuery):
+    """`@bot <name>` in any chat: matching subscriptions from the in-memory name index."""
+    # Pairing is done in the private chat with the bot, whose chat ID is the user's ID
+    tenant_id = settings.tenant_for_chat(inline_query.from_user.id)
+    if tenant_id is None:
+        await inline_query.answer(
+            [], is_personal=True, cache_time=INLINE_CACHE_TIME,
+            button=InlineQueryResultsButton(text="Підключіть бота до ПК", start_parameter="pair")
+        )
+        return
+
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    matches = snapshots.search(tenant_id, inline_query.query, limit=offset + INLINE_PAGE_SIZE + 1)
+    page = matches[offset:offset + INLINE_PAGE_SIZE]
+    results = [
+        InlineQueryResultArticle(
+            id=str(item["id"]),
+            title=item["name"],
+            description=f"{item['cost_uah']:.2f} UAH ({item['period']}) · наступний платіж {format_date(item['next_payment'])}",
+            input_message_content=InputTextMessageContent(message_text=format_item(item))
+        )
+        for item in page
+    ]
+    next_offset = str(offset + INLINE_PAGE_SIZE) if len(matches) > offset + INLINE_PAGE_SIZE else ""
+    await inline_query.answer(results, is_personal=True, cache_time=INLINE_CACHE_TIME, next_offset=next_offset)
+
+@router.message(F.document)
+async def import_document(message: types.Message, state: FSMContext):
+    """Bulk import: a CSV or JSON file becomes a batch of drafts, answered with one summary."""
+    tenant_id = settings.tenant_for_chat(message.chat.id)
+    if tenant_id is None:
+        await message.answer("⛔️ <b>Помилка доступу.</b>\nСпочатку виконайте спарювання через <code>/pair КОД</code>.")
+        return
+
+    document = message.document
+    file_format = detect_format(document.file_name, document.mime_type)
+    if file_format is None:
+        await message.answer(
+            "❌ Підтримуються файли <b>.csv</b> та <b>.json</b>.\n"
+            "Колонки: <code>name</code>, <code>amount</code>, <code>currency</code> (UAH/USD/EUR)."
+        )
+        return
+    if document.file_size is None:
+        # Without a declared size the limit cannot be checked before downloading
+        await message.answer("❌ Не вдалося визначити розмір файлу. Надішліть його ще раз.")
+        return
+    if document.file_size > Config.BOT_IMPORT_MAX_BYTES:
+        await message.answer(f"❌ Файл завеликий (максимум {Config.BOT_IMPORT_MAX_BYTES // 1024} КБ).")
+        return
+
+    await state.clear() # A file interrupts an unfinished /add
+    # Downloaded in chunks to a temp file and parsed row by row off the event loop
+    with tempfile.TemporaryFile() as tmp:
+        await bot.download(document, destination=tmp)
+        tmp.seek(0)
+        try:
+            result = await asyncio.to_thread(parse_import, tmp, file_format, Config.BOT_IMPORT_MAX_ROWS)
+        except ImportFileError as e:
+            await message.answer(f"❌ <b>Не вдалося прочитати файл:</b> {html.escape(str(e), quote=False)}")
+            return
+
+    if result.rows:
+        batch_id = uuid.uuid4().hex
+        chunks = chunked(result.rows, Config.BOT_IMPORT_CHUNK_SIZE)
+        payloads = [
+            {
+                "event": "draft_batch",
+                "batch_id": batch_id,
+                "chunk": index,
+                "chunks": len(chunks),
+                "items": items,
+                "chat_id": message.chat.id
+            }
+            for index, items in enumerate(chunks)
+        ]
+        if not await adb.enqueue_many_from_bot(payloads, tenant_id):
+            await message.answer("❌ Помилка безпеки: ключ шифрування не знайдено на сервері.")
+            return
+
+    lines = [f"📥 <b>Імпорт файлу</b>\n\nНадіслано на ПК: <b>{len(result.rows)}</b>"]
+    if result.error_count:
+        lines.append(f"\n⚠️ Пропущено рядків: {result.error_count}")
+        lines.extend(f"• рядок {number}: {html.escape(reason, quote=False)}" for number, reason in result.errors)
+        if result.error_count > len(result.errors):
+            lines.append("• …")
+    if result.truncated:
+        lines.append(f"\n✂️ Оброблено лише перші {Config.BOT_IMPORT_MAX_ROWS} підписок, решту файлу пропущено.")
+    if result.rows:
+        lines.append("\nЧернетки з'являться в програмі на ПК для підтвердження.")
+    await message.answer("\n".join(lines))
 
 @router.message(AddSub.waiting_for_name)
 async def process_name(message: types.Message, state: FSMContext):
-    await state.update_data(name=message.text)
+    # Stickers, photos etc. have no text; the conversation keeps waiting for a name
+    try:
+        name = validate_name(message.text)
+    except ValueError as e:
+        await message.answer(f"❌ Надішліть назву підписки текстом ({e}).")
+        return
+
+    await state.update_data(name=name)
     await message.answer("💰 Введіть вартість (тільки число, наприклад 12.99):")
     await state.set_state(AddSub.waiting_for_amount)
 
 @router.message(AddSub.waiting_for_amount)
 async def process_amount(message: types.Message, state: FSMContext):
-    try:
-        amount = float(message.text.replace(",", "."))
-        if amount <= 0: raise ValueError
-        
-        await state.update_data(amount=amount)
-        
-        # Inline Keyboard for Currency
-        builder = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🇺🇦 UAH", callback_data="currency_UAH")],
-            [InlineKeyboardButton(text="🇺🇸 USD", callback_data="currency_USD"), 
-             InlineKeyboardButton(text="🇪🇺 EUR", callback_data="currency_EUR")]
-        ])
-        
-        await message.answer("💱 Оберіть валюту:", reply_markup=builder)
-        await state.set_state(AddSub.waiting_for_currency)
-        
-    except ValueError:
+    amount = parse_amount(message.text or "")
+    if amount is None:
         await message.answer("❌ Будь ласка, введіть коректне позитивне число.")
+        return
+
+    data = await state.update_data(amount=amount)
+    if data.get("currency"):
+        # Currency was already given in the /add command
+        await state.clear()
+        await message.answer(await submit_draft(message.chat.id, data["name"], amount, data["currency"]))
+        return
+    await ask_currency(message, state)
+
+async def ask_currency(message: types.Message, state: FSMContext):
+    # Inline Keyboard for Currency
+    builder = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🇺🇦 UAH", callback_data="currency_UAH")],
+        [InlineKeyboardButton(text="🇺🇸 USD", callback_data="currency_USD"), 
+         InlineKeyboardButton(text="🇪🇺 EUR", callback_data="currency_EUR")]
+    ])
+    
+    await message.answer("💱 Оберіть валюту:", reply_markup=builder)
+    await state.set_state(AddSub.waiting_for_currency)
 
 @router.callback_query(AddSub.waiting_for_currency, F.data.startswith("currency_"))
 async def process_currency(callback: types.CallbackQuery, state: FSMContext):
     currency = callback.data.split("_")[1]
     data = await state.get_data()
-    
-    payload = {
-        "raw_name": data['name'],
-        "amount": data['amount'],
-        "currency": currency,
-        "chat_id": callback.message.chat.id
-    }
-    
-    with Session() as session:
-        import uuid
-        from datetime import datetime
-
-        enc_key_setting = session.query(SystemSettings).filter_by(setting_key="enc_key").first()
-        if not enc_key_setting:
-            await callback.message.edit_text("❌ Помилка безпеки: ключ шифрування не знайдено на сервері.")
-            await state.clear()
-            return
+    await state.clear()
+    await callback.message.edit_text(await submit_draft(callback.message.chat.id, data['name'], data['amount'], currency))
 
-        fernet = Fernet(enc_key_setting.setting_value.encode('utf-8'))
-        encrypted_payload = fernet.encrypt(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+async def submit_draft(chat_id: int, name: str, amount: float, currency: str) -> str:
+    """Queues a draft for the chat's desktop and returns the reply text."""
+    tenant_id = settings.tenant_for_chat(chat_id)
+    if tenant_id is None:
+        # Unlinked on the desktop while the conversation was open
+        return "⛔️ <b>Помилка доступу.</b>\nСпочатку виконайте спарювання через <code>/pair КОД</code>."
 
-        sync_item = SyncQueue(
-            uuid=str(uuid.uuid4()),
-            payload=encrypted_payload.decode('utf-8'),
-            direction=SyncDirection.FROM_BOT,
-            timestamp=datetime.utcnow()
-        )
-        session.add(sync_item)
-        session.commit()
-        
-    await callback.message.edit_text(
+    # Reply is built first: nothing is queued if the data cannot even be formatted
+    reply = (
         f"✅ Заявку створено!\n"
-        f"<b>{data['name']}</b>: {data['amount']} {currency}\n"
+        f"<b>{html.escape(name, quote=False)}</b>: {amount} {currency}\n"
         f"Очікуйте підтвердження на ПК."
     )
-    await state.clear()
+    payload = {
+        "raw_name": name,
+        "amount": amount,
+        "currency": currency,
+        "chat_id": chat_id
+    }
+    if not await adb.enqueue_from_bot(payload, tenant_id):
+        return "❌ Помилка безпеки: ключ шифрування не знайдено на сервері."
+    return reply
 
-# --- Background Task: Check for Feedback (TO_BOT) ---
+# --- Outbound Delivery (TO_BOT feedback via OutboundSender) ---
 
-async def check_feedback_queue():
-    """Background task to poll SyncQueue for messages from Desktop."""
-    while True:
-        try:
-            with Session() as session:
-                # Find messages for bot
-                stmt = select(SyncQueue).where(SyncQueue.direction == SyncDirection.TO_BOT).limit(5)
-                messages = session.execute(stmt).scalars().all()
-                
-                for msg in messages:
-                    try:
-                        enc_key_setting = session.query(SystemSettings).filter_by(setting_key="enc_key").first()
-                        if not enc_key_setting:
-                            logger.error("Encryption key not found. Cannot decrypt sync event.")
-                            session.delete(msg) # Remove problematic message
-                            continue
-                        
-                        fernet = Fernet(enc_key_setting.setting_value.encode('utf-8'))
-                        
-                        try:
-                            decrypted_payload = fernet.decrypt(msg.payload.encode('utf-8')).decode('utf-8')
-                            data = json.loads(decrypted_payload)
-                        except Exception as e:
-                            logger.error(f"Failed to decrypt or parse payload for msg {msg.uuid}: {e}")
-                            session.delete(msg) # Remove problematic message
-                            continue
-                        
-                        event = data.get("event")
-                        details = data.get("data", {})
-                        
-                        logger.info(f"📨 Feedback received: {event} - {details}")
-                        
-                        chat_id = details.get("chat_id")
-                        if chat_id:
-                            try:
-                                if event == "subscription_approved":
-                                    await bot.send_message(
-                                        chat_id,
-                                        f"✅ Вашу заявку <b>{details.get('original_draft')}</b> схвалено!\n"
-                                        f"Додано як: <b>{details.get('new_name')}</b> ({details.get('cost_uah')} UAH)"
-                                    )
-                                elif event == "pairing_success":
-                                    await bot.send_message(
-                                        chat_id,
-                                        "✅ <b>Успішно підключено!</b>\nТепер ви можете додавати підписки через /add."
-                                    )
-                                elif event == "pairing_failed":
-                                    await bot.send_message(
-                                        chat_id,
-                                        "❌ <b>Помилка підключення.</b>\nПеревірте код та спробуйте ще раз."
-                                    )
-                                elif event == "error_not_paired":
-                                    await bot.send_message(
-                                        chat_id,
-                                        "⛔️ <b>Ваша заявка відхилена.</b>\nВикористайте <code>/pair КОД</code> для підключення до десктопа."
-                                    )
-                                elif event == "draft_rejected":
-                                    await bot.send_message(
-                                        chat_id,
-                                        f"❌ Вашу заявку (ID: {details.get('draft_id')}) відхилено."
-                                    )
-                                elif event == "draft_received":
-                                    await bot.send_message(
-                                        chat_id,
-                                        f"📥 Сервер отримав заявку: <b>{details.get('name')}</b>\n"
-                                        f"Присвоєно ID: <b>{details.get('draft_id')}</b>"
-                                    )
-                                elif event == "payment_reminder":
-                                    await bot.send_message(
-                                        chat_id,
-                                        f"🗓️ <b>Нагадування про платіж</b>\n\n"
-                                        f"Скоро потрібно сплатити за підписку: <b>{details.get('name')}</b>\n"
-                                        f"<b>Сума:</b> {details.get('cost_uah')} UAH\n"
-                                        f"<b>Дата списання:</b> {details.get('next_payment')}"
-                                    )
-                            except Exception as e:
-                                logger.error(f"Failed to send notification to {chat_id}: {e}")
-                        
-                        # Remove from queue
-                        session.delete(msg)
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing sync message {msg.uuid}: {e}")
-                
-                if messages:
-                    session.commit()
-                    
-        except Exception as e:
-            logger.error(f"Database error in feedback loop: {e}")
-            
-        await asyncio.sleep(5)
+async def send_notification(chat_id: int, text: str):
+    await bot.send_message(chat_id, text)
 
 # --- Main Entry ---
 
 async def main():
     logger.info("🤖 Starting Bot...")
-    asyncio.create_task(check_feedback_queue())
-    await dp.start_polling(bot)
+    await settings.load()
+    settings.start()
+    await snapshots.load()
+    snapshots.start()
+    db_watcher.start()
+
+    # Outbound pipeline: concurrent, rate-limited, acks SyncQueue rows only after delivery
+    sender = OutboundSender(
+        send=send_notification,
+        on_delivered=adb.ack,
+        on_failed=adb.fail,
+        workers=Config.BOT_SEND_WORKERS,
+        global_rate=Config.BOT_GLOBAL_RATE,
+        per_chat_rate=Config.BOT_PER_CHAT_RATE,
+        per_chat_burst=Config.BOT_PER_CHAT_BURST
+    )
+    sender.start()
+    feedback = FeedbackConsumer(adb, sender, db_watcher)
+    asyncio.create_task(feedback.run())
+
+    try:
+        if Config.BOT_MODE == "webhook":
+            await run_webhook(
+                dp, bot,
+                host=Config.BOT_WEBHOOK_HOST,
+                port=Config.BOT_WEBHOOK_PORT,
+                path=Config.BOT_WEBHOOK_PATH,
+                secret=Config.BOT_WEBHOOK_SECRET,
+                max_pending=Config.BOT_WEBHOOK_MAX_PENDING,
+                public_url=Config.BOT_WEBHOOK_URL,
+                ssl_cert=Config.BOT_WEBHOOK_SSL_CERT,
+                ssl_key=Config.BOT_WEBHOOK_SSL_KEY
+            )
+        else:
+            # getUpdates is rejected while a webhook is registered (e.g. after switching modes)
+            await bot.delete_webhook(drop_pending_updates=False)
+            await dp.start_polling(bot)
+    finally:
+        await sender.stop()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest, TelegramNotFound
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `capacity` stored."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until one token is available (0 if available now)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def full(self) -> bool:
+        """True once the bucket has refilled completely (a fresh bucket would behave the same)."""
+        self._refill()
+        return self.tokens >= self.capacity
+
+class OutboundMessage:
+    __slots__ = ("chat_id", "text", "ack_id", "attempts", "error")
+
+    def __init__(self, chat_id: int, text: str, ack_id: Optional[str]):
+        self.chat_id = chat_id
+        self.text = text
+        self.ack_id = ack_id
+        self.attempts = 0
+        self.error = None
+
+class OutboundSender:
+    """
+    Concurrent, rate-limited delivery pipeline for bot notifications.
+
+    - A pool of worker tasks sends messages in parallel, so one slow Telegram
+      call does not serialize all notifications.
+    - A global token bucket and one bucket per chat keep traffic within
+      Telegram limits (about 30 msg/s overall, about 1 msg/s per chat).
+    - Messages of one chat are delivered strictly in submission order:
+      a chat is handed to at most one worker at a time.
+    - RetryAfter (HTTP 429) pauses the whole pipeline for the requested time.
+    - `ack_id`s are passed to `on_delivered` (in batches) only after the
+      message was actually delivered. If `on_delivered` fails, the batch is
+      kept (and stays in `inflight`) until a later flush succeeds.
+    - Failures are reported to `on_failed` as (ack_id, error, permanent):
+      permanent for messages Telegram rejected, transient once the local
+      retries are exhausted. The row is then retried later or dead-lettered
+      by the queue instead of blocking the chat.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[int, str], Awaitable],
+        on_delivered: Callable[[List[str]], Awaitable],
+        on_failed: Optional[Callable[[List[Tuple[str, str, bool]]], Awaitable]] = None,
+        workers: int = 8,
+        global_rate: float = 30,
+        per_chat_rate: float = 1,
+        per_chat_burst: float = 3,
+        max_attempts: int = 5,
+        ack_interval: float = 0.1,
+        ack_retry_delay: float = 1.0
+    ):
+        self._send = send
+        self._on_delivered = on_delivered
+        self._on_failed = on_failed
+        self._workers_count = workers
+        self._per_chat_rate = per_chat_rate
+        self._per_chat_burst = per_chat_burst
+        self._max_attempts = max_attempts
+        self._ack_interval = ack_interval
+        self._ack_retry_delay = ack_retry_delay
+
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._pending: Dict[int, deque] = {}   # chat_id -> messages waiting, in order
+        self._ready: asyncio.Queue = asyncio.Queue()  # chats that have work and no active worker
+        self._active_chats: Set[int] = set()
+        self._paused_until = 0.0
+
+        self.inflight: Set[str] = set()  # ack_ids submitted but not yet acknowledged/released
+        self._acks: List[str] = []
+        self._ack_event = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    # --- Lifecycle ---
+
+    def start(self):
+        for i in range(self._workers_count):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"outbound-{i}"))
+        self._tasks.append(asyncio.create_task(self._ack_flusher(), name="outbound-ack"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        await self._flush_acks()
+
+    # --- Producer API ---
+
+    def submit(self, chat_id: int, text: str, ack_id: Optional[str] = None):
+        """Queues a message for delivery. Never blocks."""
+        if ack_id:
+            self.inflight.add(ack_id)
+        self._pending.setdefault(chat_id, deque()).append(OutboundMessage(chat_id, text, ack_id))
+        if chat_id not in self._active_chats:
+            self._active_chats.add(chat_id)
+            self._ready.put_nowait(chat_id)
+
+    def ack(self, ack_id: str):
+        """Acknowledges an item that needs no delivery (e.g. an undecryptable row)."""
+        self._acks.append(ack_id)
+        self._ack_event.set()
+
+    # --- Internals ---
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self._per_chat_rate, self._per_chat_burst)
+        return bucket
+
+    async def _wait_for_tokens(self, chat_id: int):
+        chat_bucket = self._chat_bucket(chat_id)
+        while True:
+            pause = self._paused_until - time.monotonic()
+            delay = max(pause, chat_bucket.delay(), self._global_bucket.delay())
+            if delay <= 0:
+                chat_bucket.take()
+                self._global_bucket.take()
+                return
+            await asyncio.sleep(delay)
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._pending.get(chat_id)
+            message = queue[0]
+
+            delivered = await self._deliver(message)
+            if delivered is None:
+                # Transient failure: keep the message (and everything behind it) for a later retry
+                message.attempts += 1
+                if message.attempts < self._max_attempts:
+                    # Retry later without occupying this worker; the chat stays "active" so order is kept
+                    delay = min(2 ** message.attempts, 30)
+                    asyncio.get_running_loop().call_later(delay, self._ready.put_nowait, chat_id)
+                    continue
+                logger.error(f"Giving up on message to {chat_id} after {message.attempts} attempts")
+                queue.popleft()
+                await self._report_failure(message, permanent=False)
+            elif delivered is False:
+                queue.popleft()
+                await self._report_failure(message, permanent=True)
+            else:
+                queue.popleft()
+                if message.ack_id:
+                    self._acks.append(message.ack_id)
+                    self._ack_event.set()
+
+            if queue:
+                self._ready.put_nowait(chat_id)
+            else:
+                del self._pending[chat_id]
+                self._active_chats.discard(chat_id)
+                self._prune_chat_buckets()
+
+    def _prune_chat_buckets(self):
+        """Drops buckets of idle chats that have refilled, so the dict only holds recently active chats."""
+        idle = [
+            chat_id for chat_id, bucket in self._chat_buckets.items()
+            if chat_id not in self._active_chats and bucket.full()
+        ]
+        for chat_id in idle:
+            del self._chat_buckets[chat_id]
+
+    async def _deliver(self, message: OutboundMessage) -> Optional[bool]:
+        """Returns True if sent, False if permanently rejected, None on a transient error."""
+        while True:
+            await self._wait_for_tokens(message.chat_id)
+            try:
+                await self._send(message.chat_id, message.text)
+                return True
+            except TelegramRetryAfter as e:
+                logger.warning(f"Flood control, retry after {e.retry_after}s")
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            except (TelegramForbiddenError, TelegramBadRequest, TelegramNotFound) as e:
+                logger.error(f"Notification to {message.chat_id} rejected: {e}")
+                message.error = repr(e)
+                return False
+            except Exception as e:
+                logger.error(f"Failed to send notification to {message.chat_id}: {e}")
+                message.error = repr(e)
+                return None
+
+    async def _report_failure(self, message: OutboundMessage, permanent: bool):
+        if not message.ack_id:
+            return
+        try:
+            if self._on_failed:
+                await self._on_failed([(message.ack_id, message.error or "unknown error", permanent)])
+        except Exception as e:
+            logger.error(f"Failed to record delivery failure: {e}")
+        finally:
+            self.inflight.discard(message.ack_id)  # Released: the queue decides when to retry
+
+    async def _ack_flusher(self):
+        while True:
+            await self._ack_event.wait()
+            await asyncio.sleep(self._ack_interval)  # Collect acks into one DELETE
+            if not await self._flush_acks():
+                await asyncio.sleep(self._ack_retry_delay)
+
+    async def _flush_acks(self) -> bool:
+        """Passes collected acks to `on_delivered`. On failure they are put back for the next flush."""
+        self._ack_event.clear()
+        if not self._acks:
+            return True
+        acks, self._acks = self._acks, []
+        try:
+            await self._on_delivered(acks)
+        except Exception as e:
+            logger.error(f"Failed to acknowledge delivered messages, will retry: {e}")
+            # Still inflight, so the next poll does not hand these rows out again
+            self._acks[:0] = acks
+            self._ack_event.set()
+            return False
+        self.inflight.difference_update(acks)
+        return True
@@ -0,0 +1,101 @@
+import re
+from typing import Any, Dict, List, Set
+from src.core.search_text import fold
+
+_WORD_RE = re.compile(r"\w+")
+MAX_PREFIX = 12  # Longer query words are matched by their first MAX_PREFIX characters, then verified
+MIN_TRIGRAM_SCORE = 0.5
+
+def words(text: str) -> List[str]:
+    return _WORD_RE.findall(fold(text))  # Same folding as the desktop FTS index
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {' '.join(words(text))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SubscriptionIndex:
+    """
+    In-memory search over one tenant's snapshot items, by name.
+
+    - Word prefixes: "net" finds "Netflix", "you prem" finds "YouTube Premium"
+      (every query word must be a prefix of some word of the name).
+    - Trigrams: typos and infixes ("netflx", "flix") when prefixes find too little.
+
+    `update()` takes the new snapshot items and re-indexes only the ones that
+    were added, removed or changed since the previous snapshot.
+    """
+
+    def __init__(self):
+        self.items: Dict[int, Dict[str, Any]] = {}
+        self._prefixes: Dict[str, Set[int]] = {}
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._item_trigrams: Dict[int, Set[str]] = {}
+
+    def update(self, items: List[Dict[str, Any]]):
+        new_items = {item["id"]: item for item in items}
+        for item_id, item in list(self.items.items()):
+            if new_items.get(item_id) != item:
+                self._remove(item_id)
+        for item_id, item in new_items.items():
+            if item_id not in self.items:
+                self._add(item)
+        # Keep the snapshot order (by next payment) for results
+        self.items = {item_id: self.items[item_id] for item_id in new_items}
+
+    def _add(self, item: Dict[str, Any]):
+        item_id = item["id"]
+        self.items[item_id] = item
+        for word in words(item["name"]):
+            for length in range(1, min(len(word), MAX_PREFIX) + 1):
+                self._prefixes.setdefault(word[:length], set()).add(item_id)
+        grams = trigrams(item["name"])
+        self._item_trigrams[item_id] = grams
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(item_id)
+
+    def _remove(self, item_id: int):
+        item = self.items.pop(item_id)
+        for word in words(item["name"]):
+            for length in range(1, min(len(word), MAX_PREFIX) + 1):
+                self._discard(self._prefixes, word[:length], item_id)
+        for gram in self._item_trigrams.pop(item_id):
+            self._discard(self._trigrams, gram, item_id)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[int]], key: str, item_id: int):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(item_id)
+            if not ids:
+                del index[key]
+
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Matching items: prefix matches in snapshot order first, then trigram matches by similarity."""
+        query_words = words(query)
+        if not query_words:
+            return list(self.items.values())[:limit]
+
+        matched = None
+        for word in query_words:
+            ids = self._prefixes.get(word[:MAX_PREFIX], set())
+            if len(word) > MAX_PREFIX:
+                ids = {item_id for item_id in ids if any(w.startswith(word) for w in words(self.items[item_id]["name"]))}
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                break
+        results = [item for item_id, item in self.items.items() if item_id in matched]
+
+        if len(results) < limit:
+            grams = trigrams(query)
+            counts: Dict[int, int] = {}
+            for gram in grams:
+                for item_id in self._trigrams.get(gram, ()):
+                    if item_id not in matched:
+                        counts[item_id] = counts.get(item_id, 0) + 1
+            scored = sorted(
+                ((count / len(grams), item_id) for item_id, count in counts.items()),
+                key=lambda pair: -pair[0]
+            )
+            results += [self.items[item_id] for score, item_id in scored if score >= MIN_TRIGRAM_SCORE]
+
+        return results[:limit]
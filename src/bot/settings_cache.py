@@ -0,0 +1,149 @@
+import abc
+import asyncio
+import logging
+from typing import Dict, Optional
+from src.core.sync_notifier import DataVersionWatcher
+from src.core.tenants import DEFAULT_TENANT, split_setting_key, tenant_setting_key
+from src.bot.async_db import AsyncDB
+
+logger = logging.getLogger(__name__)
+
+def _parse_chat_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+class WatchedCache(abc.ABC):
+    """
+    Base for in-memory read models of the shared DB file.
+
+    Subscribes to the data_version watcher; every change of the file
+    schedules `refresh_if_changed()`, which should do one cheap revision
+    check and reload only when the data moved.
+    """
+
+    name = "cache"
+
+    def __init__(self, adb: AsyncDB, watcher: DataVersionWatcher):
+        self.adb = adb
+        self.watcher = watcher
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._dirty = False
+
+    @abc.abstractmethod
+    async def refresh_if_changed(self) -> bool:
+        """Reloads the cache if its revision moved; True if it did."""
+
+    # --- Change notifications ---
+
+    def start(self):
+        """Subscribes to DB change notifications (call from the running event loop)."""
+        self._loop = asyncio.get_running_loop()
+        self.watcher.add_listener(self._on_db_changed)
+
+    def stop(self):
+        self.watcher.remove_listener(self._on_db_changed)
+
+    def _on_db_changed(self):
+        # Called on the watcher thread
+        self._loop.call_soon_threadsafe(self._schedule_refresh)
+
+    def _schedule_refresh(self):
+        # Bursts of notifications collapse into at most one running and one pending refresh
+        if self._refresh_task and not self._refresh_task.done():
+            self._dirty = True
+            return
+        self._refresh_task = self._loop.create_task(self._refresh())
+
+    async def _refresh(self):
+        while True:
+            self._dirty = False
+            try:
+                await self.refresh_if_changed()
+            except Exception as e:
+                logger.error(f"Failed to refresh {self.name}: {e}")
+            if not self._dirty:
+                break
+
+class SettingsCache(WatchedCache):
+    """
+    In-memory copy of SystemSettings for the bot.
+
+    Handlers resolve the chat's tenant (and any other setting) from memory,
+    so the authorization check on each update costs no I/O. Settings of
+    all tenants are kept: `linked_chat_id@<tenant>` and
+    `pairing_code@<tenant>` are indexed by chat ID and by code. The cache is
+    refreshed when the DB file changes: every watcher notification triggers
+    one cheap read of the settings revision (bumped by DB triggers on any
+    system_settings change), and the settings are reloaded only if it moved.
+    """
+
+    name = "settings cache"
+
+    def __init__(self, adb: AsyncDB, watcher: DataVersionWatcher):
+        super().__init__(adb, watcher)
+        self.revision: Optional[int] = None
+        self._values: Dict[str, str] = {}
+        self._chat_tenants: Dict[int, str] = {}     # linked chat ID -> tenant
+        self._pairing_tenants: Dict[str, str] = {}  # pending pairing code -> tenant
+
+    # --- Reads (no I/O) ---
+
+    def tenant_for_chat(self, chat_id: int) -> Optional[str]:
+        """Tenant the chat is paired with, or None (the default tenant is "")."""
+        return self._chat_tenants.get(chat_id)
+
+    def tenant_for_code(self, code: str) -> Optional[str]:
+        """Tenant that generated this pairing code, or None."""
+        return self._pairing_tenants.get(code)
+
+    def linked_chat_id(self, tenant_id: str = DEFAULT_TENANT) -> Optional[int]:
+        return _parse_chat_id(self._values.get(tenant_setting_key("linked_chat_id", tenant_id)))
+
+    def get(self, key: str, tenant_id: str = DEFAULT_TENANT, default: Optional[str] = None) -> Optional[str]:
+        return self._values.get(tenant_setting_key(key, tenant_id), default)
+
+    # --- Loading ---
+
+    async def load(self):
+        """Loads all settings unconditionally (call once before polling starts)."""
+        revision, values = await self.adb.load_settings()
+        self._apply(revision, values)
+
+    async def refresh_if_changed(self) -> bool:
+        """Reloads the settings if the revision differs from the cached one. Returns True if reloaded."""
+        if await self.adb.get_settings_revision() == self.revision:
+            return False
+        await self.load()
+        logger.info(f"🔄 Settings reloaded (revision {self.revision})")
+        return True
+
+    def _apply(self, revision: int, values: Dict[str, str]):
+        chat_tenants, pairing_tenants = {}, {}
+        for setting_key, value in values.items():
+            key, tenant_id = split_setting_key(setting_key)
+            if key == "linked_chat_id":
+                chat_id = _parse_chat_id(value)
+                if chat_id is not None:
+                    chat_tenants[chat_id] = tenant_id
+            elif key == "pairing_code" and value:
+                pairing_tenants[value] = tenant_id
+
+        # A rotated key must not keep encrypting new events: drop the cached ciphers of those tenants
+        rotated = set()
+        if self.revision is not None:
+            for setting_key in values.keys() | self._values.keys():
+                key, tenant_id = split_setting_key(setting_key)
+                if key == "enc_key" and values.get(setting_key) != self._values.get(setting_key):
+                    rotated.add(tenant_id)
+
+        # Swapped in one go, handlers never see a half-built index
+        self._values = values
+        self._chat_tenants = chat_tenants
+        self._pairing_tenants = pairing_tenants
+        self.revision = revision
+        if rotated:
+            self.adb.db.invalidate_keys(rotated)
+            logger.info(f"🔑 Encryption key changed for {len(rotated)} tenant(s)")
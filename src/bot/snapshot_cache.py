@@ -0,0 +1,118 @@
+import html
+import json
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from src.bot.settings_cache import WatchedCache
+from src.bot.search_index import SubscriptionIndex
+
+logger = logging.getLogger(__name__)
+
+LIST_LIMIT = 30  # Keeps /list well below Telegram's 4096 character limit
+
+def format_date(iso: str) -> str:
+    return date.fromisoformat(iso).strftime("%d.%m.%Y")
+
+def format_item(item: Dict[str, Any]) -> str:
+    return f"• <b>{html.escape(item['name'])}</b> - {item['cost_uah']:.2f} UAH ({item['period']}), {format_date(item['next_payment'])}"
+
+def render_list(snapshot: Dict[str, Any]) -> str:
+    items = snapshot["items"]
+    if not items:
+        return "📭 Підписок поки немає."
+    lines = [format_item(item) for item in items[:LIST_LIMIT]]
+    if len(items) > LIST_LIMIT:
+        lines.append(f"… та ще {len(items) - LIST_LIMIT}")
+    return "📋 <b>Ваші підписки</b> (за датою платежу):\n\n" + "\n".join(lines)
+
+def render_next(snapshot: Dict[str, Any], today: date) -> str:
+    today_iso = today.isoformat()
+    # Items are sorted by next_payment, so the first upcoming date is the nearest one
+    upcoming = [item for item in snapshot["items"] if item["next_payment"] >= today_iso]
+    if not upcoming:
+        return "✅ Найближчих платежів немає."
+    nearest = upcoming[0]["next_payment"]
+    due = [item for item in upcoming if item["next_payment"] == nearest]
+    total = sum(item["cost_uah"] for item in due)
+    return (
+        f"🗓️ <b>Наступний платіж: {format_date(nearest)}</b>\n\n"
+        + "\n".join(format_item(item) for item in due)
+        + (f"\n\n<b>Разом:</b> {total:.2f} UAH" if len(due) > 1 else "")
+    )
+
+def render_total(snapshot: Dict[str, Any]) -> str:
+    totals = snapshot["totals"]
+    return (
+        f"💰 <b>Витрати на підписки</b>\n\n"
+        f"Активних підписок: <b>{totals['active_count']}</b> з {totals['count']}\n"
+        f"На місяць: <b>{totals['monthly_uah']:.2f} UAH</b>\n"
+        f"На рік: <b>{totals['yearly_uah']:.2f} UAH</b>"
+    )
+
+class SnapshotCache(WatchedCache):
+    """
+    Subscription read model for /list, /next and /total.
+
+    The desktop republishes a tenant's snapshot in the same transaction as
+    every subscription change. The bot keeps the parsed snapshots in memory
+    and, on each DB file change, fetches only snapshots with a revision
+    newer than the last one seen. Replies are rendered once per revision
+    (and per day for /next), so a command costs a dict lookup. A name
+    index per tenant serves inline queries and is updated item by item.
+    """
+
+    name = "snapshot cache"
+
+    def __init__(self, adb, watcher):
+        super().__init__(adb, watcher)
+        self.revision = 0
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._rendered: Dict[Tuple[str, str], Tuple[int, Any, str]] = {}  # (tenant, command) -> (revision, day, text)
+        self._revisions: Dict[str, int] = {}
+        self._indexes: Dict[str, SubscriptionIndex] = {}  # Name search for inline queries
+
+    async def load(self):
+        self.revision = 0
+        await self.refresh_if_changed()
+
+    async def refresh_if_changed(self) -> bool:
+        rows = await self.adb.load_snapshots(self.revision)
+        for tenant_id, revision, payload in rows:
+            try:
+                snapshot = json.loads(payload)
+                self._indexes.setdefault(tenant_id, SubscriptionIndex()).update(snapshot["items"])
+                self._snapshots[tenant_id] = snapshot
+                self._revisions[tenant_id] = revision
+            except (ValueError, KeyError) as e:
+                logger.error(f"Invalid snapshot for tenant {tenant_id!r}: {e}")
+            self.revision = max(self.revision, revision)
+        return bool(rows)
+
+    def get(self, tenant_id: str) -> Optional[Dict[str, Any]]:
+        return self._snapshots.get(tenant_id)
+
+    def search(self, tenant_id: str, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Subscriptions of the tenant whose names match `query` (all of them for an empty query)."""
+        index = self._indexes.get(tenant_id)
+        return index.search(query, limit) if index else []
+
+    def reply(self, tenant_id: str, command: str) -> Optional[str]:
+        """Rendered reply for "list", "next" or "total", or None if the tenant has no snapshot yet."""
+        snapshot = self._snapshots.get(tenant_id)
+        if snapshot is None:
+            return None
+
+        revision = self._revisions[tenant_id]
+        day = date.today() if command == "next" else None
+        cached = self._rendered.get((tenant_id, command))
+        if cached and cached[0] == revision and cached[1] == day:
+            return cached[2]
+
+        if command == "list":
+            text = render_list(snapshot)
+        elif command == "next":
+            text = render_next(snapshot, day)
+        else:
+            text = render_total(snapshot)
+        self._rendered[(tenant_id, command)] = (revision, day, text)
+        return text
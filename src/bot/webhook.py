@@ -0,0 +1,176 @@
+import asyncio
+import hmac
+import logging
+import ssl
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def chat_key(raw: Dict[str, Any]) -> Optional[int]:
+    """Returns the chat (or user) an update belongs to, used to keep per-chat ordering."""
+    for field, obj in raw.items():
+        if field == "update_id" or not isinstance(obj, dict):
+            continue
+        chat = obj.get("chat") or (obj.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+        sender = obj.get("from") or obj.get("user")
+        if sender and "id" in sender:
+            return sender["id"]
+    return None
+
+class WebhookOverloaded(Exception):
+    """More updates are pending than the feeder accepts; the request is answered with 503."""
+
+class UpdateFeeder:
+    """
+    Feeds webhook updates to the dispatcher, one task per chat.
+
+    Updates of one chat are handled strictly in arrival order (FSM steps of
+    /add depend on it) by that chat's task; different chats never wait for
+    each other, so a slow handler (e.g. a file import) only delays the
+    later updates of its own chat.
+
+    At most `max_pending` updates (queued or being handled) are held; beyond
+    that `submit_many` raises WebhookOverloaded and Telegram redelivers later.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, max_pending: int = 1000):
+        self.dp = dp
+        self.bot = bot
+        self.max_pending = max_pending
+        self.pending = 0
+        self._chats: Dict[Any, deque] = {}  # chat -> (raw, future) waiting for that chat's task
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._chats.clear()
+
+    def submit_many(self, updates: List[Dict[str, Any]]) -> List[asyncio.Future]:
+        """
+        Queues raw updates (all or none). The returned futures resolve once each
+        update has been handled.
+        """
+        if self.pending + len(updates) > self.max_pending:
+            raise WebhookOverloaded()
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for raw in updates:
+            done = loop.create_future()
+            futures.append(done)
+            key = chat_key(raw)
+            # Updates without a chat do not need ordering, each gets its own task
+            key = key if key is not None else object()
+            self.pending += 1
+            queue = self._chats.get(key)
+            if queue is None:
+                queue = self._chats[key] = deque()
+                task = asyncio.create_task(self._drain(key, queue))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            queue.append((raw, done))
+        return futures
+
+    async def _drain(self, key: Any, queue: deque):
+        try:
+            while queue:
+                raw, done = queue.popleft()
+                try:
+                    update = Update.model_validate(raw, context={"bot": self.bot})
+                    await self.dp.feed_update(self.bot, update)
+                except Exception as e:
+                    logger.error(f"Failed to handle webhook update {raw.get('update_id')}: {e}")
+                finally:
+                    self.pending -= 1
+                    if not done.done():
+                        done.set_result(None)
+        finally:
+            # No await between the last check of `queue` and this: a new update either
+            # landed in the queue above or will start a new task
+            del self._chats[key]
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret: str,
+                       feeder: Optional[UpdateFeeder] = None) -> web.Application:
+    """
+    aiohttp application that accepts Telegram updates on `path`.
+
+    - The secret token header is required and compared in constant time (401 on mismatch).
+    - The body may be one update (as Telegram sends it) or a JSON array of
+      updates (replaying recorded traffic in one request).
+    - The request is answered as soon as the updates are queued (503 if the
+      feeder is full); `?wait=1` answers only after they were handled (for tests).
+    """
+    if not secret:
+        raise ValueError("webhook secret is required")
+    feeder = feeder or UpdateFeeder(dp, bot)
+
+    async def handle(request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+            return web.Response(status=401)
+
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.Response(status=400, text="invalid JSON")
+        updates = body if isinstance(body, list) else [body]
+        if not all(isinstance(raw, dict) for raw in updates):
+            return web.Response(status=400, text="update must be a JSON object")
+
+        try:
+            pending = feeder.submit_many(updates)
+        except WebhookOverloaded:
+            logger.warning(f"Webhook overloaded ({feeder.pending} pending), rejecting {len(updates)} update(s)")
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        if request.query.get("wait"):
+            await asyncio.gather(*pending)
+        return web.json_response({"ok": True, "accepted": len(updates)})
+
+    async def on_cleanup(app: web.Application):
+        await feeder.stop()
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+async def run_webhook(dp: Dispatcher, bot: Bot, host: str, port: int, path: str, secret: str,
+                      max_pending: int = 1000, public_url: str = "", ssl_cert: str = "", ssl_key: str = ""):
+    """
+    Serves the webhook until cancelled. If `public_url` is set, registers it
+    with Telegram; otherwise only the local listener runs (local Bot API
+    server, reverse proxy configured separately, or tests).
+    """
+    app = create_webhook_app(dp, bot, path, secret, UpdateFeeder(dp, bot, max_pending))
+    ssl_context = None
+    if ssl_cert:
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(ssl_cert, ssl_key or None)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port, ssl_context=ssl_context)
+    await site.start()
+    logger.info(f"🌐 Webhook listening on {'https' if ssl_context else 'http'}://{host}:{port}{path}")
+
+    try:
+        if public_url:
+            await bot.set_webhook(
+                public_url.rstrip("/") + path,
+                secret_token=secret,
+                allowed_updates=dp.resolve_used_update_types()
+            )
+            logger.info(f"Webhook registered: {public_url.rstrip('/')}{path}")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -13,8 +13,8 @@ class AnalyticsService:
         data = defaultdict(float)
         
         for sub in subscriptions:
-            if sub.state == SubscriptionState.ACTIVE and sub.category:
-                data[sub.category.name] += sub.cost_uah
+            if sub.state == SubscriptionState.ACTIVE and sub.category_name:
+                data[sub.category_name] += sub.cost_uah
                 
         return dict(data)
 
@@ -0,0 +1,22 @@
+from typing import Iterable, Optional
+
+class ChangeTracker:
+    """
+    Ревізія, на якій споживач (вкладка, воркер) востаннє читав свої таблиці.
+
+    `poll()` питає журнал змін, що змінилось після неї, і відповідає, чи
+    зачеплено хоча б одну з таблиць споживача. Зміни з будь-якого процесу
+    (десктоп чи бот) видно однаково, бо журнал ведуть тригери БД.
+    """
+
+    def __init__(self, db, tables: Iterable[str]):
+        self.db = db
+        self.tables = frozenset(tables)
+        # Ревізія береться до першого читання даних: зміни між ними не загубляться
+        self.revision: Optional[int] = db.get_revision()
+
+    def poll(self) -> bool:
+        """True, якщо таблиці споживача змінились з попереднього виклику (або журнал обрізано)."""
+        changes = self.db.get_changes(self.revision)
+        self.revision = changes.revision
+        return changes.truncated or not self.tables.isdisjoint(changes.tables)
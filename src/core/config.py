@@ -16,10 +16,92 @@ class Config:
     DB_NAME = os.getenv("DB_NAME", "sub_manager.sqlite")
     DB_PATH = SRC_DIR / "server" / DB_NAME
     SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
+
+    # Тенант (домогосподарство) цього десктопа. Порожній - тенант за замовчуванням,
+    # його налаштування зберігаються без суфікса, як у однокористувацькій версії.
+    TENANT_ID = os.getenv("TENANT_ID", "")
+
+    # Профіль SQLite: застосовується до кожного з'єднання пулу (десктоп і бот працюють з одним файлом)
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_PRAGMAS = {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),   # Читачі не блокують записувача
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # Безпечно для WAL, без fsync на кожен COMMIT
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "8192")),       # Від'ємне значення = KiB
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024))),
+        "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+        # Схема не має ON DELETE для payment_history, тому примусове ввімкнення
+        # зробило б неможливим видалення підписки з історією платежів.
+        "foreign_keys": os.getenv("SQLITE_FOREIGN_KEYS", "OFF"),
+    }
+    SQLITE_BUSY_RETRIES = int(os.getenv("SQLITE_BUSY_RETRIES", "5"))
+    SQLITE_BUSY_BASE_DELAY_MS = int(os.getenv("SQLITE_BUSY_BASE_DELAY_MS", "50"))
+    SQLITE_CHECKPOINT_INTERVAL_SEC = int(os.getenv("SQLITE_CHECKPOINT_INTERVAL_SEC", "300"))
+    CHANGE_LOG_KEEP_ROWS = int(os.getenv("CHANGE_LOG_KEEP_ROWS", "10000"))  # Журнал змін обрізається до N останніх записів
     
     # Telegram Bot
     BOT_TOKEN = os.getenv("BOT_TOKEN", "")
-    
+    BOT_API_URL = os.getenv("BOT_API_URL", "")  # Інший Bot API сервер (локальний або тестовий)
+
+    # Режим отримання оновлень: "polling" (long polling) або "webhook" (локальний aiohttp-сервер)
+    BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+    # Лише локальний інтерфейс: назовні - через reverse proxy або явно BOT_WEBHOOK_HOST=0.0.0.0 (з SSL)
+    BOT_WEBHOOK_HOST = os.getenv("BOT_WEBHOOK_HOST", "127.0.0.1")
+    BOT_WEBHOOK_PORT = int(os.getenv("BOT_WEBHOOK_PORT", "8080"))
+    BOT_WEBHOOK_PATH = os.getenv("BOT_WEBHOOK_PATH", "/webhook")
+    BOT_WEBHOOK_SECRET = os.getenv("BOT_WEBHOOK_SECRET", "")  # Заголовок X-Telegram-Bot-Api-Secret-Token (обов'язковий)
+    BOT_WEBHOOK_URL = os.getenv("BOT_WEBHOOK_URL", "")  # Публічна адреса; порожня - webhook не реєструється
+    BOT_WEBHOOK_SSL_CERT = os.getenv("BOT_WEBHOOK_SSL_CERT", "")  # HTTPS без зовнішнього проксі
+    BOT_WEBHOOK_SSL_KEY = os.getenv("BOT_WEBHOOK_SSL_KEY", "")
+    BOT_WEBHOOK_MAX_PENDING = int(os.getenv("BOT_WEBHOOK_MAX_PENDING", "1000"))  # Понад ліміт - 503, Telegram повторить пізніше
+
+    # Вихідні сповіщення бота (ліміти Telegram: ~30 повідомлень/с загалом, ~1/с на чат)
+    BOT_SEND_WORKERS = int(os.getenv("BOT_SEND_WORKERS", "8"))
+    BOT_GLOBAL_RATE = float(os.getenv("BOT_GLOBAL_RATE", "30"))
+    BOT_PER_CHAT_RATE = float(os.getenv("BOT_PER_CHAT_RATE", "1"))
+    BOT_PER_CHAT_BURST = float(os.getenv("BOT_PER_CHAT_BURST", "3"))
+    BOT_MAX_INFLIGHT = int(os.getenv("BOT_MAX_INFLIGHT", "500"))  # Зворотний тиск на читання черги
+
+    # Підбір коду /pair: не більше N спроб з одного чату за вікно (у секундах)
+    BOT_PAIR_MAX_ATTEMPTS = int(os.getenv("BOT_PAIR_MAX_ATTEMPTS", "5"))
+    BOT_PAIR_WINDOW_SEC = int(os.getenv("BOT_PAIR_WINDOW_SEC", "600"))
+
+    # Стан діалогів бота (FSM): зберігається в SQLite, перед ним - обмежений LRU-кеш
+    BOT_FSM_TTL_SEC = int(os.getenv("BOT_FSM_TTL_SEC", str(6 * 3600)))  # Покинуті діалоги видаляються
+    BOT_FSM_CACHE_SIZE = int(os.getenv("BOT_FSM_CACHE_SIZE", "1000"))
+    BOT_FSM_PURGE_INTERVAL_SEC = int(os.getenv("BOT_FSM_PURGE_INTERVAL_SEC", "600"))
+
+    # Масовий імпорт підписок файлом (CSV / JSON) через бота
+    BOT_IMPORT_MAX_BYTES = int(os.getenv("BOT_IMPORT_MAX_BYTES", str(1024 * 1024)))
+    BOT_IMPORT_MAX_ROWS = int(os.getenv("BOT_IMPORT_MAX_ROWS", "1000"))
+    BOT_IMPORT_CHUNK_SIZE = int(os.getenv("BOT_IMPORT_CHUNK_SIZE", "100"))  # Рядків в одній події черги
+
+    # Синхронізація (SyncQueue)
+    SYNC_WATCH_INTERVAL_MS = int(os.getenv("SYNC_WATCH_INTERVAL_MS", "50"))  # Перевірка PRAGMA data_version
+    SYNC_FALLBACK_MIN_SEC = float(os.getenv("SYNC_FALLBACK_MIN_SEC", "1"))    # Резервне опитування (мінімум)
+    SYNC_FALLBACK_MAX_SEC = float(os.getenv("SYNC_FALLBACK_MAX_SEC", "30"))   # Резервне опитування (максимум)
+    SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "100"))                # Записів на одну транзакцію
+    SYNC_BATCH_LINGER_MS = int(os.getenv("SYNC_BATCH_LINGER_MS", "0"))        # Очікування накопичення пакета
+    SYNC_MAX_ATTEMPTS = int(os.getenv("SYNC_MAX_ATTEMPTS", "5"))              # Після цього запис йде в sync_dead_letter
+    SYNC_RETRY_BASE_SEC = float(os.getenv("SYNC_RETRY_BASE_SEC", "2"))        # Експоненційна затримка між спробами
+    SYNC_RETRY_MAX_SEC = float(os.getenv("SYNC_RETRY_MAX_SEC", "600"))
+    # Формат payload: "v2" - бінарний конверт (msgpack + zlib) у BLOB, "legacy" - JSON-токен у тексті.
+    # Читаються обидва формати, тому перемикач потрібен лише на час оновлення бота і десктопа.
+    SYNC_PAYLOAD_FORMAT = os.getenv("SYNC_PAYLOAD_FORMAT", "v2").lower()
+    SYNC_COMPRESS_THRESHOLD = int(os.getenv("SYNC_COMPRESS_THRESHOLD", "256"))  # Байт; менші тіла не стискаються
+
+    # Черга TO_BOT, поки бот офлайн: час життя подій (секунди, 0 = без обмеження) та максимальний розмір
+    SYNC_EVENT_TTL_SEC = {
+        "payment_reminder": int(os.getenv("SYNC_TTL_PAYMENT_REMINDER_SEC", str(3 * 24 * 3600))),
+        "subscription_deleted": int(os.getenv("SYNC_TTL_SUBSCRIPTION_DELETED_SEC", str(24 * 3600))),
+        "pairing_success": int(os.getenv("SYNC_TTL_PAIRING_SEC", "600")),
+        "pairing_failed": int(os.getenv("SYNC_TTL_PAIRING_SEC", "600")),
+        "error_not_paired": int(os.getenv("SYNC_TTL_ERROR_NOT_PAIRED_SEC", "3600")),
+        "draft_received": int(os.getenv("SYNC_TTL_DRAFT_RECEIVED_SEC", str(24 * 3600))),
+    }
+    SYNC_TO_BOT_MAX_PENDING = int(os.getenv("SYNC_TO_BOT_MAX_PENDING", "1000"))  # Найстаріші понад ліміт видаляються
+    SYNC_PURGE_INTERVAL_SEC = int(os.getenv("SYNC_PURGE_INTERVAL_SEC", "60"))      # Видалення прострочених подій ботом
+
     # Налаштування додатка
     DEBUG = os.getenv("DEBUG", "True").lower() in ("true", "1", "t")
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -29,3 +111,13 @@ class Config:
         """Перевірка критично важливих налаштувань."""
         if not cls.BOT_TOKEN and not cls.DEBUG:
             print("ПОПЕРЕДЖЕННЯ: BOT_TOKEN не встановлено. Бот не зможе запуститися.")
+
+    @classmethod
+    def validate_bot(cls):
+        """Перевірка перед запуском бота. ValueError - бот не повинен стартувати."""
+        cls.validate()
+        if cls.BOT_MODE == "webhook" and not cls.BOT_WEBHOOK_SECRET:
+            raise ValueError(
+                "BOT_WEBHOOK_SECRET не встановлено: у режимі webhook без нього будь-хто, "
+                "хто може дістатися порту, надсилатиме боту підроблені оновлення."
+            )
@@ -0,0 +1,45 @@
+from datetime import date, datetime
+from typing import Dict, NamedTuple, Optional, Set
+from src.core.models import PaymentType, SubscriptionState
+
+# Легкі незмінні рядки для читання (таблиці UI, аналітика, знімок для бота).
+# Будуються з Core select() без identity map та інструментування ORM;
+# для запису і далі використовуються ORM-моделі з src/core/models.py.
+# Порядок полів збігається з порядком колонок у запитах DBManager.
+
+class SubscriptionRow(NamedTuple):
+    """Підписка для відображення (замість Subscription + category)."""
+    id: int
+    name: str
+    cost_uah: float
+    category_id: Optional[int]
+    category_name: Optional[str]
+    period: str
+    last_payment: date
+    next_payment: date
+    payment_type: PaymentType
+    state: SubscriptionState
+    is_reminder_sent: bool
+
+class PaymentHistoryRow(NamedTuple):
+    """Запис історії платежів з назвою підписки (None, якщо підписку видалено)."""
+    id: int
+    sub_id: int
+    subscription_name: Optional[str]
+    final_sum: float
+    pay_date: datetime
+
+class DraftRow(NamedTuple):
+    """Нова чернетка з бота."""
+    id: int
+    raw_name: str
+    amount: float
+    currency: str
+    created_at: datetime
+    chat_id: Optional[int]
+
+class ChangeSet(NamedTuple):
+    """Зміни після заданої ревізії: таблиця -> rowid змінених рядків."""
+    revision: int  # Поточна ревізія (передається в наступний get_changes)
+    tables: Dict[str, Set[int]]
+    truncated: bool  # Частину журналу вже обрізано - вважати зміненим усе
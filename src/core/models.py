@@ -1,8 +1,9 @@
 from datetime import datetime, date
 from typing import Optional
-from sqlalchemy import String, Integer, Float, DateTime, Date, ForeignKey, Boolean, Enum, Text
+from sqlalchemy import func, String, Integer, Float, DateTime, Date, ForeignKey, Boolean, Enum, Text, Index, LargeBinary
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 import enum
+from src.core.search_text import fold_optional
 
 # --- Переліки (Enums) ---
 
@@ -23,6 +24,15 @@ class DraftStatus(enum.Enum):
     NEW = "New"
     PROCESSED = "Processed"
 
+def _folded(column: str):
+    """
+    Значення за замовчуванням для search_name: згорнута (src/core/search_text.py) назва з колонки `column`
+    того ж INSERT. Працює і для ORM, і для пакетних insert(); зміну назви DBManager записує явно.
+    """
+    def default(context):
+        return fold_optional(context.get_current_parameters().get(column))
+    return default
+
 # --- Базовий клас ---
 
 class Base(DeclarativeBase):
@@ -38,14 +48,91 @@ class SystemSettings(Base):
     setting_key: Mapped[str] = mapped_column(String(100), primary_key=True)
     setting_value: Mapped[str] = mapped_column(Text)
 
+class SettingsRevision(Base):
+    """
+    Лічильник змін system_settings (один рядок, id = 1).
+    Збільшується тригерами БД при будь-якій зміні налаштувань, тож бот
+    може тримати налаштування в пам'яті й перечитувати їх лише після зміни.
+    """
+    __tablename__ = "settings_revision"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    revision: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+class ChangeLog(Base):
+    """
+    Журнал змін основних таблиць, який ведуть тригери БД (міграція v7).
+    id - глобальна монотонна ревізія (AUTOINCREMENT: номери не повторюються
+    навіть після обрізання журналу), тож споживач може спитати "що змінилось
+    після ревізії N" і пропустити перечитування, якщо нічого.
+    """
+    __tablename__ = "change_log"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    table_name: Mapped[str] = mapped_column(String(32))
+    row_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # rowid зміненого рядка
+    operation: Mapped[str] = mapped_column(String(6))  # INSERT / UPDATE / DELETE
+    changed_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.current_timestamp())
+
 class SyncQueue(Base):
     """Буфер обміну з ботом (Черга синхронізації)."""
     __tablename__ = "sync_queue"
-    
+    __table_args__ = (
+        Index("ix_sync_queue_direction_timestamp", "direction", "timestamp"), # Опитування черги у FIFO-порядку
+        Index("ix_sync_queue_direction_tenant_timestamp", "direction", "tenant_id", "timestamp"), # Черга окремого тенанта
+        Index("ix_sync_queue_coalesce_key", "coalesce_key"), # Заміна очікуючої події тим самим ключем
+    )
+
     uuid: Mapped[str] = mapped_column(String(36), primary_key=True)
-    payload: Mapped[str] = mapped_column(Text)  # Зашифрований AES-256 JSON
+    tenant_id: Mapped[str] = mapped_column(String(64), default="", server_default="")  # Домогосподарство (десктоп)
+    payload: Mapped[str] = mapped_column(Text)  # Зашифрований AES-256 JSON (старий формат; "" для v2)
+    payload_blob: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)  # Зашифрований конверт v2
     direction: Mapped[SyncDirection] = mapped_column(Enum(SyncDirection))
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")  # Невдалі спроби обробки
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # Не раніше (backoff)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    coalesce_key: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)  # Одна очікуюча подія на ключ
+    expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # Після цього не доставляється
+
+class SyncDeadLetter(Base):
+    """Записи черги, які не вдалося обробити після всіх спроб (для перегляду та повтору)."""
+    __tablename__ = "sync_dead_letter"
+
+    uuid: Mapped[str] = mapped_column(String(36), primary_key=True)
+    tenant_id: Mapped[str] = mapped_column(String(64), default="", server_default="")
+    payload: Mapped[str] = mapped_column(Text)
+    payload_blob: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    direction: Mapped[SyncDirection] = mapped_column(Enum(SyncDirection))
+    timestamp: Mapped[datetime] = mapped_column(DateTime)  # Час створення вихідного запису
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    failed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class BotFSMState(Base):
+    """Стан діалогів бота (aiogram FSM), щоб незавершені /add переживали перезапуск."""
+    __tablename__ = "bot_fsm_state"
+    __table_args__ = (
+        Index("ix_bot_fsm_state_updated_at", "updated_at"), # Видалення застарілих станів за TTL
+    )
+
+    storage_key: Mapped[str] = mapped_column(String(255), primary_key=True)  # bot:chat:user:thread:business:destiny
+    state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    data: Mapped[str] = mapped_column(Text, default="{}")  # JSON
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class SubscriptionSnapshot(Base):
+    """Знімок підписок тенанта для команд бота (/list, /next, /total)."""
+    __tablename__ = "subscription_snapshot"
+    __table_args__ = (
+        Index("ix_subscription_snapshot_revision", "revision"), # Бот читає лише знімки, новіші за відомі
+    )
+
+    tenant_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    revision: Mapped[int] = mapped_column(Integer)  # Зростає глобально з кожною публікацією
+    payload: Mapped[str] = mapped_column(Text)  # JSON (src/core/snapshot.py)
+    published_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 # --- 2. Довідковий блок ---
 
@@ -56,6 +143,8 @@ class Category(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(100))
     icon_id: Mapped[str] = mapped_column(String(50))  # ID іконки для PySide6
+    search_name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True, default=_folded("name")) # Для FTS-індексу
+    tenant_id: Mapped[str] = mapped_column(String(64), default="", server_default="") # Кожен тенант має власний довідник
     
     subscriptions: Mapped[list["Subscription"]] = relationship(back_populates="category")
 
@@ -73,9 +162,14 @@ class Currency(Base):
 class Subscription(Base):
     """Основний реєстр підписок."""
     __tablename__ = "subscriptions"
-    
+    __table_args__ = (
+        Index("ix_subscriptions_next_payment", "next_payment"), # Діапазонний пошук ReminderWorker
+        Index("ix_subscriptions_tenant_next_payment", "tenant_id", "next_payment"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(100))
+    search_name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True, default=_folded("name")) # Для FTS-індексу
     cost_uah: Mapped[float] = mapped_column(Float)
     category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"))
     period: Mapped[str] = mapped_column(String(50))  # Місяць/Квартал/Рік
@@ -84,6 +178,7 @@ class Subscription(Base):
     payment_type: Mapped[PaymentType] = mapped_column(Enum(PaymentType), default=PaymentType.AUTO)
     state: Mapped[SubscriptionState] = mapped_column(Enum(SubscriptionState), default=SubscriptionState.ACTIVE)
     is_reminder_sent: Mapped[bool] = mapped_column(Boolean, default=False) # Нагадування відправлено, очікується оплата
+    tenant_id: Mapped[str] = mapped_column(String(64), default="", server_default="") # Домогосподарство-власник
     
     category: Mapped["Category"] = relationship(back_populates="subscriptions")
     history: Mapped[list["PaymentHistory"]] = relationship(back_populates="subscription")
@@ -91,22 +186,33 @@ class Subscription(Base):
 class Draft(Base):
     """Карантин заявок з Telegram."""
     __tablename__ = "drafts"
-    
+    __table_args__ = (
+        Index("ix_drafts_status_created_at", "status", "created_at"), # Вибірка нових чернеток
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     raw_name: Mapped[str] = mapped_column(String(255))
+    search_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, default=_folded("raw_name")) # Для FTS-індексу
     amount: Mapped[float] = mapped_column(Float)
     currency: Mapped[str] = mapped_column(String(3))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     status: Mapped[DraftStatus] = mapped_column(Enum(DraftStatus), default=DraftStatus.NEW)
     chat_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True) # Telegram Chat ID
+    tenant_id: Mapped[str] = mapped_column(String(64), default="", server_default="") # Тенант, від якого прийшла заявка
 
 class PaymentHistory(Base):
     """Архів транзакцій (для статистики)."""
     __tablename__ = "payment_history"
-    
+    __table_args__ = (
+        Index("ix_payment_history_pay_date_id", "pay_date", "id"), # Сортування історії
+        Index("ix_payment_history_sub_id", "sub_id"),
+        Index("ix_payment_history_tenant_pay_date_id", "tenant_id", "pay_date", "id"), # Історія одного тенанта
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     sub_id: Mapped[int] = mapped_column(ForeignKey("subscriptions.id"))
     final_sum: Mapped[float] = mapped_column(Float)
     pay_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    tenant_id: Mapped[str] = mapped_column(String(64), default="", server_default="") # Лишається і після видалення підписки
     
     subscription: Mapped["Subscription"] = relationship(back_populates="history")
@@ -36,7 +36,7 @@ class ReminderWorker(QThread):
         """Finds subscriptions that need payment soon and queues a reminder."""
         with db.get_session() as session:
             # 1. Get linked chat_id. If not linked, do nothing.
-            linked_chat_setting = session.query(SystemSettings).filter_by(setting_key="linked_chat_id").first()
+            linked_chat_setting = session.query(SystemSettings).filter_by(setting_key=db.setting_key("linked_chat_id")).first()
             if not (linked_chat_setting and linked_chat_setting.setting_value):
                 # print("[ReminderWorker] System not paired. Skipping check.")
                 return
@@ -48,6 +48,7 @@ class ReminderWorker(QThread):
             reminder_date_limit = today + timedelta(days=self.days_before)
             
             upcoming_subs = session.query(Subscription).filter(
+                Subscription.tenant_id == db.tenant_id,
                 Subscription.next_payment >= today,
                 Subscription.next_payment <= reminder_date_limit
             ).all()
@@ -65,7 +66,7 @@ class ReminderWorker(QThread):
                         "name": sub.name,
                         "cost_uah": sub.cost_uah,
                         "next_payment": sub.next_payment.strftime("%d.%m.%Y")
-                    })
+                    }, coalesce_key=f"payment_reminder:{sub.id}:{chat_id}")
                     
                     # Mark reminder as sent
                     with db.get_session() as s:
@@ -0,0 +1,18 @@
+import unicodedata
+from typing import Optional
+
+# Єдине правило згортання тексту для пошуку: ним користуються і FTS-індекси десктопа
+# (DBManager пише згорнуті назви в колонки search_name), і пошук бота (src/bot/search_index.py).
+
+def fold(text: str) -> str:
+    """
+    Текст без регістру й діакритики: "Мої" -> "моі", "Café" -> "cafe".
+    На відміну від remove_diacritics токенізатора unicode61 (лише латиниця),
+    прибирає й кириличні знаки: ї -> і, й -> и, ё -> е.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def fold_optional(value: Optional[str]) -> Optional[str]:
+    """fold для значень колонок, що можуть бути порожніми (None лишається None)."""
+    return fold(value) if isinstance(value, str) else None
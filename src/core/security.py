@@ -1,6 +1,81 @@
+import base64
 import json
-from cryptography.fernet import Fernet
-from typing import Any, Dict
+import os
+import threading
+import time
+import zlib
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from typing import Any, Callable, Dict, Optional, Union
+from src.core.config import Config
+from src.core.models import SystemSettings
+
+try:
+    import msgpack
+except ImportError:  # Необов'язкова залежність: без неї конверт кодується в JSON
+    msgpack = None
+
+# --- Компактний бінарний конверт (формат v2) ---
+#
+# [версія: 1 байт][прапорці: 1 байт][тіло]
+#   прапорці & 0x03 - кодек тіла (0 = JSON UTF-8, 1 = msgpack)
+#   прапорці & 0x04 - тіло стиснуте zlib
+# Конверт шифрується AES-GCM (див. BLOB_AESGCM нижче) і зберігається в BLOB як сирі байти.
+
+ENVELOPE_VERSION = 2
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+FLAG_ZLIB = 0x04
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# Шифрування BLOB: [0x01][nonce: 12 байт][шифротекст + тег AES-GCM] - без base64 на жодному кроці.
+# Ключ AES-GCM виводиться (HKDF) з того ж ключа enc_key. BLOB-и, записані раніше
+# як сирий Fernet-токен, починаються з байта версії Fernet 0x80 і читаються як і раніше.
+BLOB_AESGCM = 0x01
+BLOB_FERNET = 0x80
+NONCE_SIZE = 12
+
+def encode_envelope(data: Dict[str, Any]) -> bytes:
+    """Кодує словник у версіонований бінарний конверт (msgpack, якщо доступний; zlib для великих тіл)."""
+    if msgpack is not None:
+        codec = CODEC_MSGPACK
+        body = msgpack.packb(data, use_bin_type=True)
+    else:
+        codec = CODEC_JSON
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+    flags = codec
+    if len(body) > Config.SYNC_COMPRESS_THRESHOLD:
+        compressed = zlib.compress(body, 6)
+        if len(compressed) < len(body):
+            body = compressed
+            flags |= FLAG_ZLIB
+
+    return bytes((ENVELOPE_VERSION, flags)) + body
+
+def decode_envelope(raw: BytesLike) -> Dict[str, Any]:
+    """Декодує конверт v2. Тіло читається через memoryview без проміжних копій рядків."""
+    view = memoryview(raw)
+    if len(view) < 2 or view[0] != ENVELOPE_VERSION:
+        raise ValueError(f"Невідомий формат конверта: {view[0] if len(view) else None}")
+
+    flags = view[1]
+    body = view[2:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+
+    codec = flags & 0x03
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Повідомлення закодоване msgpack, але пакет msgpack не встановлено.")
+        return msgpack.unpackb(body, raw=False)
+    if codec == CODEC_JSON:
+        return json.loads(bytes(body) if isinstance(body, memoryview) else body)
+    raise ValueError(f"Невідомий кодек конверта: {codec}")
 
 class SecurityManager:
     """Менеджер безпеки для шифрування даних (AES-256)."""
@@ -11,9 +86,14 @@ class SecurityManager:
         :param key: Ключ у форматі string або bytes.
         """
         try:
-            self.fernet = Fernet(key.encode() if isinstance(key, str) else key)
+            key_bytes = key.encode() if isinstance(key, str) else key
+            self.fernet = Fernet(key_bytes)
         except Exception as e:
             raise ValueError(f"Невалідний ключ шифрування: {e}")
+        # Окремий ключ для BLOB-формату, щоб один і той самий ключ не служив двом шифрам
+        self.aead = AESGCM(HKDF(
+            algorithm=hashes.SHA256(), length=32, salt=None, info=b"sync-payload-blob"
+        ).derive(base64.urlsafe_b64decode(key_bytes)))
 
     def encrypt_data(self, data: Dict[str, Any]) -> str:
         """
@@ -21,7 +101,7 @@ class SecurityManager:
         :param data: Дані для шифрування.
         :return: Зашифрований рядок (token).
         """
-        json_data = json.dumps(data).encode('utf-8')
+        json_data = json.dumps(data, ensure_ascii=False).encode('utf-8')
         encrypted_token = self.fernet.encrypt(json_data)
         return encrypted_token.decode('utf-8')
 
@@ -34,7 +114,137 @@ class SecurityManager:
         decrypted_data = self.fernet.decrypt(token.encode('utf-8'))
         return json.loads(decrypted_data.decode('utf-8'))
 
+    def encrypt_payload(self, data: Dict[str, Any]) -> bytes:
+        """
+        Шифрує словник у формат v2: бінарний конверт -> AES-GCM над сирими байтами (для BLOB).
+        :return: Зашифровані байти без base64.
+        """
+        nonce = os.urandom(NONCE_SIZE)
+        return bytes((BLOB_AESGCM,)) + nonce + self.aead.encrypt(nonce, encode_envelope(data), None)
+
+    def decrypt_payload(self, blob: BytesLike) -> Dict[str, Any]:
+        """
+        Розшифровує байти формату v2 (з BLOB-колонки) у словник.
+        Чужий ключ дає InvalidToken, як і для Fernet, тож KeyProvider перечитає ключ.
+        """
+        view = memoryview(blob)
+        if len(view) and view[0] == BLOB_AESGCM:
+            try:
+                envelope = self.aead.decrypt(view[1:1 + NONCE_SIZE], view[1 + NONCE_SIZE:], None)
+            except InvalidTag:
+                raise InvalidToken from None
+            return decode_envelope(envelope)
+        if len(view) and view[0] == BLOB_FERNET:
+            # BLOB, записаний до переходу на AES-GCM
+            return decode_envelope(self.fernet.decrypt(base64.urlsafe_b64encode(view)))
+        raise ValueError(f"Невідомий формат зашифрованого BLOB: {view[0] if len(view) else None}")
+
     @staticmethod
     def generate_new_key() -> str:
         """Генерує новий випадковий ключ AES-256 (Fernet)."""
         return Fernet.generate_key().decode('utf-8')
+
+class KeyProvider:
+    """
+    Кешований постачальник шифру для всіх продюсерів і споживачів SyncQueue.
+
+    Тримає готовий SecurityManager у пам'яті та перечитує рядок `enc_key`
+    лише коли це справді потрібно: при першому зверненні або коли токен
+    не вдалося розшифрувати поточним ключем (ключ змінився в іншому процесі).
+    Шифр перебудовується тільки якщо значення ключа відрізняється від кешованого.
+    Поки ключа в БД немає (десктоп тенанта ще не запускався), відсутність не
+    кешується назавжди: ключ перечитується не частіше ніж раз на `missing_retry_sec`.
+    """
+
+    def __init__(self, session_factory: Callable, setting_key: str = "enc_key", missing_retry_sec: float = 1.0):
+        """
+        :param session_factory: Фабрика сесій SQLAlchemy (DBManager.Session).
+        :param setting_key: Ключ system_settings з ключем шифрування (свій для кожного тенанта).
+        :param missing_retry_sec: Мінімальний інтервал між перечитуваннями, поки ключа немає.
+        """
+        self._session_factory = session_factory
+        self._setting_key = setting_key
+        self._missing_retry_sec = missing_retry_sec
+        self._lock = threading.Lock()
+        self._key: Optional[str] = None
+        self._manager: Optional[SecurityManager] = None
+        self._loaded = False
+        self._loaded_at = 0.0
+
+    def get(self) -> Optional[SecurityManager]:
+        """Повертає кешований SecurityManager або None, якщо ключа в БД немає."""
+        if not self._loaded or (
+            self._manager is None and time.monotonic() - self._loaded_at >= self._missing_retry_sec
+        ):
+            self.refresh()
+        return self._manager
+
+    def refresh(self) -> bool:
+        """
+        Перечитує ключ з БД. Повертає True, якщо значення ключа змінилося
+        (і шифр було перебудовано).
+        """
+        with self._session_factory() as session:
+            setting = session.query(SystemSettings).filter_by(setting_key=self._setting_key).first()
+            value = setting.setting_value if setting else None
+
+        with self._lock:
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+            if value == self._key:
+                return False
+            self._manager = SecurityManager(value) if value else None
+            self._key = value
+            return True
+
+    def invalidate(self):
+        """Скидає кеш: ключ перечитується при наступному зверненні (бот викликає це, коли enc_key змінився)."""
+        with self._lock:
+            self._loaded = False
+
+    def encrypt(self, data: Dict[str, Any]) -> str:
+        """Шифрує словник кешованим ключем. Кидає ValueError, якщо ключа немає."""
+        manager = self.get()
+        if manager is None:
+            raise ValueError("Ключ шифрування не знайдено.")
+        return manager.encrypt_data(data)
+
+    def decrypt(self, token: str) -> Dict[str, Any]:
+        """
+        Розшифровує токен кешованим ключем. Якщо токен не підходить,
+        один раз перевіряє, чи не змінився ключ у БД, і повторює спробу.
+        """
+        return self._with_refresh(lambda manager: manager.decrypt_data(token))
+
+    def encrypt_message(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Повертає значення колонок SyncQueue для нового запису:
+        формат v2 (payload_blob) або текстовий JSON-токен (payload),
+        залежно від SYNC_PAYLOAD_FORMAT. Кидає ValueError, якщо ключа немає.
+        """
+        manager = self.get()
+        if manager is None:
+            raise ValueError("Ключ шифрування не знайдено.")
+        if Config.SYNC_PAYLOAD_FORMAT == "legacy":
+            return {"payload": manager.encrypt_data(data), "payload_blob": None}
+        return {"payload": "", "payload_blob": manager.encrypt_payload(data)}
+
+    def decrypt_message(self, msg) -> Dict[str, Any]:
+        """
+        Розшифровує запис SyncQueue / SyncDeadLetter у будь-якому форматі:
+        v2 (payload_blob) або старий текстовий токен (payload).
+        """
+        if msg.payload_blob is not None:
+            return self._with_refresh(lambda manager: manager.decrypt_payload(msg.payload_blob))
+        return self.decrypt(msg.payload)
+
+    def _with_refresh(self, operation: Callable[[SecurityManager], Dict[str, Any]]) -> Dict[str, Any]:
+        manager = self.get()
+        if manager is None:
+            raise ValueError("Ключ шифрування не знайдено.")
+        try:
+            return operation(manager)
+        except InvalidToken:
+            if self.refresh() and self._manager is not None:
+                return operation(self._manager)
+            raise
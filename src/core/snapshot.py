@@ -0,0 +1,51 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable
+from src.core.dto import SubscriptionRow
+from src.core.models import SubscriptionState
+
+# Знімок підписок для бота (read-model): компактний JSON, який десктоп
+# перебудовує в тій самій транзакції, що й зміну підписок. Бот читає
+# лише цей знімок і ніколи не звертається до основних таблиць.
+
+SNAPSHOT_VERSION = 1
+MONTHS_IN_PERIOD = {"Місяць": 1, "Квартал": 3, "Рік": 12}
+
+def build_snapshot(subscriptions: Iterable[SubscriptionRow]) -> Dict[str, Any]:
+    """
+    Формує знімок: підписки, відсортовані за датою наступного платежу, та підсумки.
+    Підсумки рахуються лише для активних підписок; вартість приводиться до місяця за періодом.
+    """
+    items = []
+    monthly_total = 0.0
+    active_count = 0
+
+    for sub in sorted(subscriptions, key=lambda s: (s.next_payment, s.name)):
+        state = sub.state.value if isinstance(sub.state, SubscriptionState) else sub.state
+        items.append({
+            "id": sub.id,
+            "name": sub.name,
+            "cost_uah": round(sub.cost_uah, 2),
+            "period": sub.period,
+            "next_payment": sub.next_payment.isoformat(),
+            "state": state,
+            "category": sub.category_name,
+        })
+        if state == SubscriptionState.ACTIVE.value:
+            active_count += 1
+            monthly_total += sub.cost_uah / MONTHS_IN_PERIOD.get(sub.period, 1)
+
+    return {
+        "version": SNAPSHOT_VERSION,
+        "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "items": items,
+        "totals": {
+            "count": len(items),
+            "active_count": active_count,
+            "monthly_uah": round(monthly_total, 2),
+            "yearly_uah": round(monthly_total * 12, 2),
+        },
+    }
+
+def dump_snapshot(snapshot: Dict[str, Any]) -> str:
+    return json.dumps(snapshot, ensure_ascii=False, separators=(",", ":"))
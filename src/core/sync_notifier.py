@@ -0,0 +1,141 @@
+import asyncio
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+
+class DataVersionWatcher:
+    """
+    Спостерігач за змінами файлу SQLite між процесами (бот <-> десктоп).
+
+    Використовує `PRAGMA data_version` на власному виділеному з'єднанні:
+    значення змінюється щоразу, коли будь-яке інше з'єднання (в тому числі
+    з іншого процесу) фіксує транзакцію. Перевірка не читає таблиць, тому
+    її можна виконувати з коротким інтервалом, а споживачі черги
+    прокидаються лише тоді, коли у файлі справді щось змінилося.
+    """
+
+    def __init__(self, db_path: str, interval: float = 0.05):
+        """
+        :param db_path: Шлях до файлу SQLite.
+        :param interval: Інтервал перевірки data_version (секунди).
+        """
+        self.db_path = db_path
+        self.interval = interval
+        self.generation = 0  # Монотонний лічильник виявлених змін
+
+        self._cond = threading.Condition()
+        self._listeners: List[Callable[[], None]] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Запускає фоновий потік спостереження."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="DataVersionWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Зупиняє спостереження та будить усіх, хто очікує."""
+        self._stop_event.set()
+        self.notify()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=1, check_same_thread=False)
+        last_version = None
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    version = conn.execute("PRAGMA data_version").fetchone()[0]
+                except sqlite3.Error:
+                    version = last_version  # Файл тимчасово заблоковано, спробуємо пізніше
+
+                if last_version is not None and version != last_version:
+                    self.notify()
+                last_version = version
+
+                self._stop_event.wait(self.interval)
+        finally:
+            conn.close()
+
+    # --- Сповіщення ---
+
+    def notify(self):
+        """
+        Сигналізує про зміну в БД. Викликається потоком спостереження,
+        а також може бути викликаний напряму продюсером у тому ж процесі.
+        """
+        with self._cond:
+            self.generation += 1
+            listeners = list(self._listeners)
+            self._cond.notify_all()
+
+        for callback in listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[DataVersionWatcher Error] {e}")
+
+    def add_listener(self, callback: Callable[[], None]):
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]):
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    # --- Очікування ---
+
+    def wait(self, generation: int, timeout: float) -> bool:
+        """
+        Блокує потік, доки не з'явиться зміна новіша за `generation`
+        або не мине `timeout`. Повертає True, якщо зміна відбулася.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self.generation != generation, timeout)
+
+    async def wait_async(self, generation: int, timeout: float) -> bool:
+        """Асинхронний аналог `wait` для циклу подій asyncio (бот)."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+
+        def _wake():
+            loop.call_soon_threadsafe(event.set)
+
+        self.add_listener(_wake)
+        try:
+            if self.generation != generation:
+                return True
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.remove_listener(_wake)
+
+
+class AdaptiveBackoff:
+    """
+    Резервний таймаут опитування: подвоюється, поки черга порожня,
+    і скидається до мінімуму, щойно з'являється робота.
+    """
+
+    def __init__(self, minimum: float, maximum: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.current = minimum
+
+    def reset(self):
+        self.current = self.minimum
+
+    def next(self) -> float:
+        """Повертає поточний таймаут і збільшує наступний."""
+        value = self.current
+        self.current = min(self.current * 2, self.maximum)
+        return value
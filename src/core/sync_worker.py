@@ -1,153 +1,217 @@
-import json
-import time
-import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import delete, insert
 from PySide6.QtCore import QThread, Signal
 from src.database.db_manager import db
+from src.core.config import Config
 from src.core.models import SyncQueue, SyncDirection, Draft, SystemSettings
-from cryptography.fernet import Fernet
+from src.core.sync_notifier import DataVersionWatcher, AdaptiveBackoff
+from src.database.sqlite_tuning import begin_immediate, run_with_busy_retry
 
 class SyncWorker(QThread):
     """Фоновий процес для синхронізації даних з ботом (через БД)."""
-    
+
     draft_received = Signal() # Сигнал про отримання нової чернетки
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.running = True
+        self.watcher = DataVersionWatcher(db.db_path, interval=Config.SYNC_WATCH_INTERVAL_MS / 1000)
+        self.backoff = AdaptiveBackoff(Config.SYNC_FALLBACK_MIN_SEC, Config.SYNC_FALLBACK_MAX_SEC)
 
     def run(self):
+        self.watcher.start()
         while self.running:
+            generation = self.watcher.generation
             try:
-                self.process_queue()
+                if self.process_queue():
+                    self.backoff.reset()
             except Exception as e:
                 print(f"[SyncWorker Error] {e}")
-            
-            # Пауза перед наступною перевіркою
-            time.sleep(3)
+
+            db.maybe_checkpoint()
+
+            # Очікуємо зміну в БД (бот додав запис) або резервний таймаут
+            if self.running and self.watcher.wait(generation, self.backoff.next()):
+                if Config.SYNC_BATCH_LINGER_MS:
+                    self.msleep(Config.SYNC_BATCH_LINGER_MS) # Даємо пакету накопичитися
 
     def stop(self):
         self.running = False
+        self.watcher.stop() # Будить потік, що очікує
         self.wait()
 
-    def _add_feedback(self, session, event, data):
+    def _add_feedback(self, session, event, data, coalesce_key=None):
         """Helper to add feedback to SyncQueue within existing session."""
-        payload_json = json.dumps({"event": event, "data": data}, ensure_ascii=False)
-
-        enc_key_setting = session.query(SystemSettings).filter_by(setting_key="enc_key").first()
-        if not enc_key_setting:
-            print("[Security Error] Encryption key not found. Cannot encrypt sync event.")
-            encrypted_payload = payload_json.encode('utf-8')
-        else:
-            fernet = Fernet(enc_key_setting.setting_value.encode('utf-8'))
-            encrypted_payload = fernet.encrypt(payload_json.encode('utf-8'))
-
-        sync_item = SyncQueue(
-            uuid=str(uuid.uuid4()),
-            payload=encrypted_payload.decode('utf-8'),
-            direction=SyncDirection.TO_BOT
-        )
-        session.add(sync_item)
+        db.enqueue_to_bot(session, event, data, coalesce_key)
 
-    def process_queue(self):
+    def process_queue(self) -> int:
+        """
+        Вичерпує чергу від бота пакетами по SYNC_BATCH_SIZE записів.
+        Повертає загальну кількість оброблених записів.
+        """
+        total = 0
+        while self.running:
+            claimed, handled = run_with_busy_retry(self._process_batch)
+            total += handled
+            # Неповний пакет означає, що черга порожня; нуль оброблених - що решта записів застрягла
+            if claimed < Config.SYNC_BATCH_SIZE or handled == 0:
+                break
+        return total
+
+    def _process_batch(self):
+        """
+        Обробляє один пакет у FIFO-порядку в межах однієї транзакції:
+        оброблені записи видаляються одним DELETE, після чого виконується один COMMIT.
+        Кожен запис обробляється у власній точці збереження (SAVEPOINT): збій одного
+        запису відкочує лише його зміни, сам запис відкладається з backoff (або йде
+        в dead letter), а решта пакета обробляється далі.
+        Повертає кортеж (вибрано, оброблено або відкладено).
+        """
         with db.get_session() as session:
-            # Шукаємо повідомлення ВІД бота
-            messages = session.query(SyncQueue).filter_by(direction=SyncDirection.FROM_BOT).limit(5).all()
-            
+            # Шукаємо повідомлення ВІД бота (найстаріші першими)
+            messages = (
+                session.query(SyncQueue)
+                .filter_by(direction=SyncDirection.FROM_BOT, tenant_id=db.tenant_id)
+                .filter(db.sync_ready_condition(datetime.utcnow()))
+                .order_by(SyncQueue.timestamp)
+                .limit(Config.SYNC_BATCH_SIZE)
+                .all()
+            )
+
             if not messages:
-                return
+                return 0, 0
+
+            if not db.keys.get():
+                print("[Security Error] Encryption key not found. Cannot decrypt sync event.")
+                return len(messages), 0 # Записи залишаються в черзі до появи ключа
 
+            begin_immediate(session) # Без цього SAVEPOINT-и нижче не вкладені в транзакцію пакета
+
+            handled_uuids = []
+            failed_count = 0
             new_drafts_count = 0
-            
+
             # Отримати прив'язаний чат ID
-            linked_chat_setting = session.query(SystemSettings).filter_by(setting_key="linked_chat_id").first()
-            linked_chat_id = int(linked_chat_setting.setting_value) if linked_chat_setting else None
-            
+            linked_chat_id = self._linked_chat_id(session)
+
             for msg in messages:
+                # Decrypt payload (кешованим шифром; старий текстовий або бінарний формат v2)
+                try:
+                    data = db.keys.decrypt_message(msg)
+                except Exception as e:
+                    print(f"[Security Error] Failed to decrypt or parse payload for msg {msg.uuid}: {e}")
+                    db.apply_sync_failure(session, msg, f"decrypt: {e!r}") # Повтор пізніше / dead letter
+                    failed_count += 1
+                    continue
+
                 try:
-                    # Decrypt payload
-                    enc_key_setting = session.query(SystemSettings).filter_by(setting_key="enc_key").first()
-                    if not enc_key_setting:
-                        print("[Security Error] Encryption key not found. Cannot decrypt sync event.")
-                        continue # Skip message if no key
-                    
-                    fernet = Fernet(enc_key_setting.setting_value.encode('utf-8'))
-                    
-                    try:
-                        decrypted_payload = fernet.decrypt(msg.payload.encode('utf-8')).decode('utf-8')
-                        data = json.loads(decrypted_payload)
-                    except Exception as e:
-                        print(f"[Security Error] Failed to decrypt or parse payload for msg {msg.uuid}: {e}")
-                        session.delete(msg) # Remove problematic message
-                        continue
-                    
-                    event_type = data.get("event") # e.g., "pairing_request" or None (for legacy drafts)
-                    chat_id = data.get("chat_id")
-                    
-                    # --- Pairing Request ---
-                    if event_type == "pairing_request":
-                        code_input = data.get("code")
-                        code_setting = session.query(SystemSettings).filter_by(setting_key="pairing_code").first()
-                        
-                        if code_setting and code_setting.setting_value == code_input:
-                            # Успішне спарювання
-                            if not linked_chat_setting:
-                                linked_chat_setting = SystemSettings(setting_key="linked_chat_id", setting_value=str(chat_id))
-                                session.add(linked_chat_setting)
-                            else:
-                                linked_chat_setting.setting_value = str(chat_id)
-                                
-                            # Очистити код після використання
-                            session.delete(code_setting)
-                            
-                            # Фідбек боту
-                            self._add_feedback(session, "pairing_success", {"chat_id": chat_id})
-                        else:
-                            # Невдале спарювання
-                            self._add_feedback(session, "pairing_failed", {"chat_id": chat_id})
-                            
-                        session.delete(msg)
-                        session.commit() # Commit immediately for pairing
-                        continue
-
-                    # --- Draft Processing ---
-                    # Если система привязана, проверяем chat_id
-                    if linked_chat_id and chat_id != linked_chat_id:
-                        print(f"[Security] Ignored draft from unauthorized chat_id: {chat_id}")
-                        session.delete(msg) # Silently drop unauthorized messages
-                        continue
-                        
-                    # Если система НЕ привязана, игнорируем все чернетки (или дозволяем лишь pairing)
-                    if not linked_chat_id:
-                        print(f"[Security] System not paired. Ignoring draft from {chat_id}")
-                        self._add_feedback(session, "error_not_paired", {"chat_id": chat_id})
-                        session.delete(msg)
-                        continue
-
-                    # Создать чернетку (только если прошли проверки)
-                    new_draft = Draft(
-                        raw_name=data.get("raw_name", "Unknown"),
-                        amount=float(data.get("amount", 0.0)),
-                        currency=data.get("currency", "UAH"),
-                        chat_id=data.get("chat_id")  # Save chat_id
-                    )
-                    session.add(new_draft)
-                    session.flush() # Чтобы получить ID
-                    
-                    # Фідбек боту об отриманні (Присвоєння ID)
-                    if new_draft.chat_id:
-                        self._add_feedback(session, "draft_received", {
-                            "draft_id": new_draft.id,
-                            "chat_id": new_draft.chat_id,
-                            "name": new_draft.raw_name
-                        })
-                    
-                    # Видалити з черги (оброблено)
-                    session.delete(msg)
-                    new_drafts_count += 1
-                    
+                    with session.begin_nested():
+                        drafts, linked_chat_id = self._handle_message(session, data, linked_chat_id)
                 except Exception as e:
+                    # Точку збереження відкочено; невдачу фіксуємо вже поза нею
                     print(f"[SyncWorker] Failed to process msg {msg.uuid}: {e}")
-            
+                    db.apply_sync_failure(session, msg, repr(e))
+                    failed_count += 1
+                    continue
+
+                handled_uuids.append(msg.uuid)
+                new_drafts_count += drafts
+
+            if handled_uuids:
+                # Один set-based DELETE на весь пакет
+                session.execute(delete(SyncQueue).where(SyncQueue.uuid.in_(handled_uuids)))
+            if handled_uuids or failed_count:
+                session.commit() # Один COMMIT на весь пакет
+
             if new_drafts_count > 0:
-                session.commit()
                 self.draft_received.emit()
+
+            return len(messages), len(handled_uuids) + failed_count
+
+    @staticmethod
+    def _linked_chat_id(session) -> Optional[int]:
+        setting = session.query(SystemSettings).filter_by(setting_key=db.setting_key("linked_chat_id")).first()
+        return int(setting.setting_value) if setting else None
+
+    def _handle_message(self, session, data: dict, linked_chat_id: Optional[int]) -> Tuple[int, Optional[int]]:
+        """
+        Обробляє одне розшифроване повідомлення від бота (в межах точки збереження).
+        Повертає (кількість нових чернеток, прив'язаний чат після повідомлення).
+        """
+        event_type = data.get("event") # e.g., "pairing_request" or None (for legacy drafts)
+        chat_id = data.get("chat_id")
+
+        # --- Pairing Request ---
+        if event_type == "pairing_request":
+            code_input = data.get("code")
+            code_setting = session.query(SystemSettings).filter_by(setting_key=db.setting_key("pairing_code")).first()
+
+            if code_setting and code_setting.setting_value == code_input:
+                # Успішне спарювання
+                linked_chat_setting = session.query(SystemSettings).filter_by(setting_key=db.setting_key("linked_chat_id")).first()
+                if not linked_chat_setting:
+                    session.add(SystemSettings(setting_key=db.setting_key("linked_chat_id"), setting_value=str(chat_id)))
+                else:
+                    linked_chat_setting.setting_value = str(chat_id)
+
+                # Очистити код після використання
+                session.delete(code_setting)
+
+                # Фідбек боту
+                self._add_feedback(session, "pairing_success", {"chat_id": chat_id}, f"pairing:{chat_id}")
+                session.flush()
+                return 0, chat_id # Наступні записи пакета вже бачать нову прив'язку
+
+            # Невдале спарювання
+            self._add_feedback(session, "pairing_failed", {"chat_id": chat_id}, f"pairing:{chat_id}")
+            return 0, linked_chat_id
+
+        # --- Draft Processing ---
+        # Если система привязана, проверяем chat_id
+        if linked_chat_id and chat_id != linked_chat_id:
+            print(f"[Security] Ignored draft from unauthorized chat_id: {chat_id}")
+            return 0, linked_chat_id # Silently drop unauthorized messages
+
+        # Если система НЕ привязана, игнорируем все чернетки (или дозволяем лишь pairing)
+        if not linked_chat_id:
+            print(f"[Security] System not paired. Ignoring draft from {chat_id}")
+            self._add_feedback(session, "error_not_paired", {"chat_id": chat_id}, f"error_not_paired:{chat_id}")
+            return 0, linked_chat_id
+
+        # --- Draft Batch (імпорт файлом) ---
+        if event_type == "draft_batch":
+            rows = [
+                dict(
+                    raw_name=str(item.get("raw_name", "Unknown"))[:255],
+                    amount=float(item.get("amount", 0.0)),
+                    currency=str(item.get("currency", "UAH"))[:3],
+                    chat_id=chat_id,
+                    tenant_id=db.tenant_id
+                )
+                for item in data.get("items", [])
+            ]
+            if rows:
+                # Один INSERT на всю частину пакета; підсумок користувачу вже надіслав бот
+                session.execute(insert(Draft), rows)
+            return len(rows), linked_chat_id
+
+        # Создать чернетку (только если прошли проверки)
+        new_draft = Draft(
+            raw_name=data.get("raw_name", "Unknown"),
+            amount=float(data.get("amount", 0.0)),
+            currency=data.get("currency", "UAH"),
+            chat_id=data.get("chat_id"),  # Save chat_id
+            tenant_id=db.tenant_id
+        )
+        session.add(new_draft)
+        session.flush() # Чтобы получить ID
+
+        # Фідбек боту об отриманні (Присвоєння ID)
+        if new_draft.chat_id:
+            self._add_feedback(session, "draft_received", {
+                "draft_id": new_draft.id,
+                "chat_id": new_draft.chat_id,
+                "name": new_draft.raw_name
+            })
+        return 1, linked_chat_id
@@ -0,0 +1,26 @@
+import re
+from typing import Tuple
+
+# Тенант - одне домогосподарство: десктоп, його ключ шифрування та прив'язаний чат.
+# Налаштування тенанта зберігаються в system_settings з суфіксом "@<tenant_id>"
+# (наприклад, "linked_chat_id@home-2"). Тенант за замовчуванням ("") суфікса не має,
+# тому база однокористувацької версії є коректною базою з одним тенантом.
+
+DEFAULT_TENANT = ""
+TENANT_SEPARATOR = "@"
+_TENANT_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+def validate_tenant_id(tenant_id: str) -> str:
+    """Перевіряє ідентифікатор тенанта (латиниця, цифри, '_' і '-', до 64 символів)."""
+    if tenant_id != DEFAULT_TENANT and not _TENANT_ID_RE.fullmatch(tenant_id):
+        raise ValueError(f"Невалідний ідентифікатор тенанта: {tenant_id!r}")
+    return tenant_id
+
+def tenant_setting_key(key: str, tenant_id: str = DEFAULT_TENANT) -> str:
+    """Повертає ключ system_settings для налаштування тенанта."""
+    return f"{key}{TENANT_SEPARATOR}{tenant_id}" if tenant_id else key
+
+def split_setting_key(setting_key: str) -> Tuple[str, str]:
+    """Розбирає ключ system_settings на (назва налаштування, тенант)."""
+    key, _, tenant_id = setting_key.partition(TENANT_SEPARATOR)
+    return key, tenant_id
@@ -1,42 +1,66 @@
 import os
 import json
+import re
+import threading
+import time
 import uuid
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, joinedload
+from sqlalchemy import create_engine, event, text, and_, or_, false, delete, insert, update, func, select, tuple_, cast, String
+from sqlalchemy.orm import sessionmaker
 from cryptography.fernet import Fernet
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from src.core.config import Config
+from src.core.dto import SubscriptionRow, PaymentHistoryRow, DraftRow, ChangeSet
+from src.core.search_text import fold, fold_optional
+from src.core.security import KeyProvider
+from src.core.snapshot import build_snapshot, dump_snapshot
+from src.core.tenants import tenant_setting_key, validate_tenant_id
+from src.database.migrations import run_migrations
+from src.database.sqlite_tuning import apply_pragmas, register_functions, retry_on_busy
 from src.core.models import (Base, SystemSettings, Currency, Category, 
-                               Subscription, Draft, DraftStatus, SyncQueue, SyncDirection, PaymentHistory, SubscriptionState)
-from typing import List, Optional
+                               Subscription, Draft, DraftStatus, SyncQueue, SyncDirection, PaymentHistory, SubscriptionState,
+                               SyncDeadLetter, SubscriptionSnapshot, ChangeLog)
+from typing import List, Optional, Set, Tuple
 
 class DBManager:
     """Менеджер для роботи з базою даних SQLite."""
     
-    def __init__(self, db_path: str = str(Config.DB_PATH)):
+    def __init__(self, db_path: str = str(Config.DB_PATH), tenant_id: str = Config.TENANT_ID):
         self.db_path = db_path
-        self.engine = create_engine(f"sqlite:///{db_path}", echo=False)
+        self.tenant_id = validate_tenant_id(tenant_id)
+        self.engine = create_engine(
+            f"sqlite:///{db_path}",
+            echo=False,
+            connect_args={"timeout": Config.SQLITE_BUSY_TIMEOUT_MS / 1000}
+        )
+        # Профіль PRAGMA (WAL, busy_timeout, кеш...) для кожного з'єднання пулу
+        event.listen(self.engine, "connect", apply_pragmas)
+        event.listen(self.engine, "connect", register_functions)
         self.Session = sessionmaker(bind=self.engine)
+        self._last_checkpoint = time.monotonic()
         
         # Ініціалізація БД
         self._initialize_db()
 
+        # Кешований шифр для SyncQueue (спільний для всіх продюсерів/споживачів процесу)
+        self.keys = KeyProvider(self.Session, self.setting_key("enc_key"))
+        self._tenant_keys = {self.tenant_id: self.keys}
+        self._tenant_keys_lock = threading.Lock()
+
     def _initialize_db(self):
         """Створення таблиць та початкове заповнення даних."""
-        # Увімкнення foreign keys для SQLite
-        with self.engine.connect() as conn:
-            conn.execute(text("PRAGMA foreign_keys = ON"))
-        
         # Створення всіх таблиць на основі SQLAlchemy моделей
         Base.metadata.create_all(self.engine)
-        
+
+        # Оновлення схеми існуючої бази на місці (індекси, нові колонки)
+        run_migrations(self.engine)
+
         # Перевірка та початкове заповнення (Seeding)
         with self.Session() as session:
             # 1. Генерація AES ключа, якщо його немає
-            if not session.query(SystemSettings).filter_by(setting_key="enc_key").first():
+            if not session.query(SystemSettings).filter_by(setting_key=self.setting_key("enc_key")).first():
                 new_key = Fernet.generate_key().decode()
-                session.add(SystemSettings(setting_key="enc_key", setting_value=new_key))
-                session.add(SystemSettings(setting_key="pairing_status", setting_value="False"))
+                session.add(SystemSettings(setting_key=self.setting_key("enc_key"), setting_value=new_key))
+                session.add(SystemSettings(setting_key=self.setting_key("pairing_status"), setting_value="False"))
             
             # 2. Додавання базової валюти UAH та інших
             if not session.query(Currency).filter_by(code="UAH").first():
@@ -48,23 +72,116 @@ class DBManager:
             if not session.query(Currency).filter_by(code="EUR").first():
                 session.add(Currency(code="EUR", manual_rate=45.5, is_base=False))
             
-            # 3. Додавання базових категорій
-            if not session.query(Category).first():
+            # 3. Додавання базових категорій (у кожного тенанта свій довідник)
+            if not session.query(Category).filter_by(tenant_id=self.tenant_id).first():
                 default_categories = [
-                    Category(name="Кіно та ТВ", icon_id="movie"),
-                    Category(name="Музика", icon_id="music"),
-                    Category(name="Робота / Софт", icon_id="work"),
-                    Category(name="Ігри", icon_id="games"),
-                    Category(name="Інше", icon_id="other")
+                    Category(name="Кіно та ТВ", icon_id="movie", tenant_id=self.tenant_id),
+                    Category(name="Музика", icon_id="music", tenant_id=self.tenant_id),
+                    Category(name="Робота / Софт", icon_id="work", tenant_id=self.tenant_id),
+                    Category(name="Ігри", icon_id="games", tenant_id=self.tenant_id),
+                    Category(name="Інше", icon_id="other", tenant_id=self.tenant_id)
                 ]
                 session.add_all(default_categories)
             
             session.commit()
 
+        # Знімок для бота в базах, створених до його появи
+        with self.Session() as session:
+            if not session.get(SubscriptionSnapshot, self.tenant_id):
+                self._publish_snapshot(session)
+                session.commit()
+
     def get_session(self):
         """Повертає нову сесію БД."""
         return self.Session()
 
+    # --- Tenants ---
+
+    def setting_key(self, key: str) -> str:
+        """Ключ system_settings для налаштування тенанта цього екземпляра."""
+        return tenant_setting_key(key, self.tenant_id)
+
+    def keys_for(self, tenant_id: str) -> KeyProvider:
+        """Кешований постачальник шифру для довільного тенанта (бот обслуговує всіх)."""
+        provider = self._tenant_keys.get(tenant_id)
+        if provider is None:
+            with self._tenant_keys_lock:
+                provider = self._tenant_keys.get(tenant_id)
+                if provider is None:
+                    provider = KeyProvider(self.Session, tenant_setting_key("enc_key", tenant_id))
+                    self._tenant_keys[tenant_id] = provider
+        return provider
+
+    def invalidate_keys(self, tenant_ids) -> None:
+        """
+        Скидає кешовані шифри тенантів, чий enc_key змінився в іншому процесі,
+        щоб наступне шифрування вже не використовувало старий ключ.
+        """
+        for tenant_id in tenant_ids:
+            provider = self._tenant_keys.get(tenant_id)
+            if provider is not None:
+                provider.invalidate()
+
+    # --- Maintenance ---
+
+    def checkpoint_wal(self, mode: str = "PASSIVE"):
+        """Переносить сторінки з WAL-файлу в основну БД, не блокуючи читачів (PASSIVE)."""
+        with self.engine.connect() as conn:
+            conn.execute(text(f"PRAGMA wal_checkpoint({mode})"))
+        self._last_checkpoint = time.monotonic()
+
+    def maybe_checkpoint(self):
+        """
+        Виконує checkpoint, якщо з попереднього минуло SQLITE_CHECKPOINT_INTERVAL_SEC
+        (заодно обрізає журнал змін - з тією ж періодичністю).
+        """
+        if time.monotonic() - self._last_checkpoint < Config.SQLITE_CHECKPOINT_INTERVAL_SEC:
+            return
+        try:
+            self.prune_change_log()
+            self.checkpoint_wal()
+        except Exception as e:
+            print(f"[SQLite] WAL checkpoint failed: {e}")
+            self._last_checkpoint = time.monotonic()
+
+    # --- Change Log ---
+
+    def get_revision(self) -> int:
+        """Поточна глобальна ревізія даних (0 для порожнього журналу)."""
+        with self.get_session() as session:
+            return session.query(func.max(ChangeLog.id)).scalar() or 0
+
+    def get_changes(self, since: int) -> ChangeSet:
+        """
+        Що змінилось після ревізії `since`. Якщо нічого - один пошук по первинному ключу
+        і порожній результат, тож перевірку дешево робити на кожне перемикання вкладки.
+        """
+        with self.get_session() as session:
+            rows = session.execute(
+                select(ChangeLog.id, ChangeLog.table_name, ChangeLog.row_id)
+                .where(ChangeLog.id > since)
+                .order_by(ChangeLog.id)
+            ).all()
+            if not rows:
+                return ChangeSet(since, {}, False)
+
+            tables = {}
+            for _, table_name, row_id in rows:
+                tables.setdefault(table_name, set()).add(row_id)
+            # Ревізії йдуть без пропусків (AUTOINCREMENT, відкат не витрачає номер),
+            # тож пропуск одразу після `since` означає, що ці записи вже обрізано
+            return ChangeSet(rows[-1][0], tables, truncated=rows[0][0] > since + 1)
+
+    @retry_on_busy
+    def prune_change_log(self, keep: int = None) -> int:
+        """Залишає лише `keep` останніх записів журналу змін. Повертає кількість видалених."""
+        keep = Config.CHANGE_LOG_KEEP_ROWS if keep is None else keep
+        with self.get_session() as session:
+            revision = session.query(func.max(ChangeLog.id)).scalar() or 0
+            result = session.execute(delete(ChangeLog).where(ChangeLog.id <= revision - keep))
+            session.commit()
+            return result.rowcount
+
     # --- Currency Methods ---
 
     def get_currency_rate(self, code: str) -> float:
@@ -80,82 +197,324 @@ class DBManager:
 
     # --- Sync/Bot Feedback Methods ---
 
-    def add_sync_event(self, event_type: str, data: dict):
-        """Створює запис у черзі синхронізації (відповідь боту)."""
+    @retry_on_busy
+    def add_sync_event(self, event_type: str, data: dict, coalesce_key: Optional[str] = None):
+        """
+        Створює запис у черзі синхронізації (відповідь боту).
+        :param coalesce_key: Якщо задано, очікуюча подія з тим самим ключем замінюється новою.
+        """
+        with self.get_session() as session:
+            self.enqueue_to_bot(session, event_type, data, coalesce_key)
+            session.commit()
+
+    def enqueue_to_bot(self, session, event_type: str, data: dict, coalesce_key: Optional[str] = None,
+                       trim: bool = True) -> SyncQueue:
+        """
+        Додає подію TO_BOT тенанта цього екземпляра у межах переданої сесії (без COMMIT).
+        Поки бот офлайн, черга не росте безмежно: подія з тим самим coalesce_key
+        замінює попередню, expires_at береться з SYNC_EVENT_TTL_SEC, а понад
+        SYNC_TO_BOT_MAX_PENDING (на тенанта) найстаріші записи видаляються.
+        :param trim: False для пакетних операцій - вони обрізають чергу один раз наприкінці.
+        """
         payload_data = {"event": event_type, "data": data}
-        payload_json = json.dumps(payload_data, ensure_ascii=False)
-        
+
+        if not self.keys.get():
+            print("[Security Error] Encryption key not found. Cannot encrypt sync event.")
+            # Fallback to unencrypted or raise error based on desired security level
+            columns = {"payload": json.dumps(payload_data, ensure_ascii=False)} # Store unencrypted
+        else:
+            columns = self.keys.encrypt_message(payload_data) # payload / payload_blob залежно від формату
+
+        now = datetime.utcnow()
+        if coalesce_key:
+            # Новий запис (а не оновлення на місці): якщо бот уже доставляє старий, його ack не зачепить новий
+            session.execute(delete(SyncQueue).where(
+                SyncQueue.direction == SyncDirection.TO_BOT,
+                SyncQueue.tenant_id == self.tenant_id,
+                SyncQueue.coalesce_key == coalesce_key
+            ))
+
+        ttl = Config.SYNC_EVENT_TTL_SEC.get(event_type)
+        sync_item = SyncQueue(
+            uuid=str(uuid.uuid4()),
+            tenant_id=self.tenant_id,
+            direction=SyncDirection.TO_BOT,
+            timestamp=now,
+            coalesce_key=coalesce_key,
+            expires_at=now + timedelta(seconds=ttl) if ttl else None,
+            **columns
+        )
+        session.add(sync_item)
+        session.flush()
+
+        if trim:
+            self._trim_to_bot_backlog(session)
+        return sync_item
+
+    def _trim_to_bot_backlog(self, session) -> int:
+        """Видаляє найстаріші записи TO_BOT тенанта понад SYNC_TO_BOT_MAX_PENDING."""
+        limit = Config.SYNC_TO_BOT_MAX_PENDING
+        if limit <= 0:
+            return 0
+
+        own_backlog = and_(SyncQueue.direction == SyncDirection.TO_BOT, SyncQueue.tenant_id == self.tenant_id)
+        pending = session.query(func.count(SyncQueue.uuid)).filter(own_backlog).scalar()
+        if pending <= limit:
+            return 0
+
+        oldest = (
+            select(SyncQueue.uuid)
+            .where(own_backlog)
+            .order_by(SyncQueue.timestamp)
+            .limit(pending - limit)
+        )
+        result = session.execute(delete(SyncQueue).where(SyncQueue.uuid.in_(oldest)))
+        print(f"[SyncQueue] Backlog limit {limit} reached, dropped {result.rowcount} oldest TO_BOT events.")
+        return result.rowcount
+
+    @retry_on_busy
+    def purge_expired_sync_events(self) -> int:
+        """Видаляє події TO_BOT, час життя яких минув (бот був офлайн занадто довго)."""
+        with self.get_session() as session:
+            result = session.execute(delete(SyncQueue).where(
+                SyncQueue.direction == SyncDirection.TO_BOT,
+                SyncQueue.expires_at.is_not(None),
+                SyncQueue.expires_at <= datetime.utcnow()
+            ))
+            session.commit()
+            return result.rowcount
+
+    # --- Sync Retry / Dead Letter ---
+
+    @staticmethod
+    def sync_ready_condition(now: datetime):
+        """Умова вибірки з черги: запис не очікує на наступну спробу (backoff) і не прострочений."""
+        return and_(
+            or_(SyncQueue.next_attempt_at.is_(None), SyncQueue.next_attempt_at <= now),
+            or_(SyncQueue.expires_at.is_(None), SyncQueue.expires_at > now)
+        )
+
+    @staticmethod
+    def apply_sync_failure(session, msg: SyncQueue, error: str, permanent: bool = False) -> bool:
+        """
+        Фіксує невдалу спробу обробки запису черги в межах переданої сесії.
+        Запис відкладається з експоненційною затримкою, а після SYNC_MAX_ATTEMPTS
+        (або одразу при permanent=True) переноситься до sync_dead_letter.
+        Повертає True, якщо запис перенесено до dead letter.
+        """
+        msg.attempts = (msg.attempts or 0) + 1
+        msg.last_error = str(error)[:1000]
+
+        if permanent or msg.attempts >= Config.SYNC_MAX_ATTEMPTS:
+            session.add(SyncDeadLetter(
+                uuid=msg.uuid,
+                tenant_id=msg.tenant_id,
+                payload=msg.payload,
+                payload_blob=msg.payload_blob,
+                direction=msg.direction,
+                timestamp=msg.timestamp,
+                attempts=msg.attempts,
+                last_error=msg.last_error
+            ))
+            session.delete(msg)
+            return True
+
+        delay = min(Config.SYNC_RETRY_BASE_SEC * 2 ** (msg.attempts - 1), Config.SYNC_RETRY_MAX_SEC)
+        msg.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        return False
+
+    @retry_on_busy
+    def record_sync_failures(self, failures: List[Tuple[str, str, bool]]) -> int:
+        """
+        Фіксує невдалі спроби для кількох записів однією транзакцією.
+        :param failures: Список (uuid, текст помилки, permanent).
+        :return: Кількість записів, перенесених до dead letter.
+        """
+        dead = 0
+        with self.get_session() as session:
+            for msg_uuid, error, permanent in failures:
+                msg = session.get(SyncQueue, msg_uuid)
+                if msg and self.apply_sync_failure(session, msg, error, permanent):
+                    dead += 1
+            session.commit()
+        return dead
+
+    def get_dead_letters(self) -> List[SyncDeadLetter]:
+        with self.get_session() as session:
+            return (
+                session.query(SyncDeadLetter)
+                .filter_by(tenant_id=self.tenant_id)
+                .order_by(SyncDeadLetter.failed_at.desc())
+                .all()
+            )
+
+    @retry_on_busy
+    def replay_dead_letters(self, uuids: List[str]) -> int:
+        """Повертає записи з dead letter у чергу з обнуленим лічильником спроб."""
         with self.get_session() as session:
-            enc_key_setting = session.query(SystemSettings).filter_by(setting_key="enc_key").first()
-            if not enc_key_setting:
-                print("[Security Error] Encryption key not found. Cannot encrypt sync event.")
-                # Fallback to unencrypted or raise error based on desired security level
-                encrypted_payload = payload_json.encode('utf-8') # Store unencrypted but encoded
-            else:
-                fernet = Fernet(enc_key_setting.setting_value.encode('utf-8'))
-                encrypted_payload = fernet.encrypt(payload_json.encode('utf-8'))
-
-            sync_item = SyncQueue(
-                uuid=str(uuid.uuid4()),
-                payload=encrypted_payload.decode('utf-8'), # Store as string
-                direction=SyncDirection.TO_BOT
+            letters = (
+                session.query(SyncDeadLetter)
+                .filter(SyncDeadLetter.uuid.in_(uuids), SyncDeadLetter.tenant_id == self.tenant_id)
+                .all()
             )
-            session.add(sync_item)
+            for letter in letters:
+                session.add(SyncQueue(
+                    uuid=letter.uuid,
+                    tenant_id=letter.tenant_id,
+                    payload=letter.payload,
+                    payload_blob=letter.payload_blob,
+                    direction=letter.direction,
+                    timestamp=letter.timestamp # Зберігаємо місце в FIFO-порядку
+                ))
+                session.delete(letter)
+            session.commit()
+            return len(letters)
+
+    @retry_on_busy
+    def delete_dead_letters(self, uuids: List[str]) -> int:
+        with self.get_session() as session:
+            result = session.execute(delete(SyncDeadLetter).where(
+                SyncDeadLetter.uuid.in_(uuids), SyncDeadLetter.tenant_id == self.tenant_id
+            ))
+            session.commit()
+            return result.rowcount
+
+    # --- Bot Snapshot ---
+
+    def _publish_snapshot(self, session):
+        """
+        Перебудовує знімок підписок тенанта в межах переданої сесії (COMMIT робить викликач),
+        тож бот бачить нові дані рівно тоді, коли фіксується сама зміна підписок.
+        """
+        session.flush()
+        subscriptions = self._subscription_rows(session)
+        revision = (session.query(func.max(SubscriptionSnapshot.revision)).scalar() or 0) + 1
+        session.merge(SubscriptionSnapshot(
+            tenant_id=self.tenant_id,
+            revision=revision,
+            payload=dump_snapshot(build_snapshot(subscriptions)),
+            published_at=datetime.utcnow()
+        ))
+
+    @retry_on_busy
+    def publish_snapshot(self):
+        with self.get_session() as session:
+            self._publish_snapshot(session)
             session.commit()
 
     # --- Subscription CRUD ---
+    # Підписки, категорії, історія та чернетки належать тенанту: кожен запит і кожна зміна
+    # обмежені self.tenant_id, тож id рядка іншого тенанта поводиться як неіснуючий.
+
+    def _subscription_rows(self, session) -> List[SubscriptionRow]:
+        stmt = (
+            select(
+                Subscription.id, Subscription.name, Subscription.cost_uah,
+                Subscription.category_id, Category.name,
+                Subscription.period, Subscription.last_payment, Subscription.next_payment,
+                Subscription.payment_type, Subscription.state, Subscription.is_reminder_sent
+            )
+            .outerjoin(Category, Category.id == Subscription.category_id)
+            .where(Subscription.tenant_id == self.tenant_id)
+        )
+        return list(map(SubscriptionRow._make, session.execute(stmt)))
 
-    def get_all_subscriptions(self) -> List[Subscription]:
+    def get_all_subscriptions(self) -> List[SubscriptionRow]:
+        """Підписки для читання (легкі кортежі, не ORM-об'єкти)."""
         with self.get_session() as session:
-            return session.query(Subscription).options(joinedload(Subscription.category)).all()
+            return self._subscription_rows(session)
 
+    @retry_on_busy
     def add_subscription(self, subscription: Subscription) -> None:
         with self.get_session() as session:
+            subscription.tenant_id = self.tenant_id
             session.add(subscription)
+            self._publish_snapshot(session)
             session.commit()
 
+    @retry_on_busy
     def update_subscription(self, sub_id: int, new_data: dict) -> None:
+        if "name" in new_data:
+            # Пакетний UPDATE оминає значення за замовчуванням, тож згорнуту назву для FTS пишемо явно
+            new_data = {**new_data, "search_name": fold_optional(new_data["name"])}
         with self.get_session() as session:
-            session.query(Subscription).filter_by(id=sub_id).update(new_data)
+            session.query(Subscription).filter_by(id=sub_id, tenant_id=self.tenant_id).update(new_data)
+            self._publish_snapshot(session)
             session.commit()
 
+    @retry_on_busy
     def delete_subscription(self, sub_id: int) -> None:
         with self.get_session() as session:
-            sub = session.query(Subscription).filter_by(id=sub_id).first()
+            sub = session.query(Subscription).filter_by(id=sub_id, tenant_id=self.tenant_id).first()
             if sub:
                 session.delete(sub)
+                self._publish_snapshot(session)
                 session.commit()
+
+    @retry_on_busy
+    def delete_subscriptions(self, sub_ids: List[int]) -> int:
+        """
+        Видаляє кілька підписок однією транзакцією разом з подіями
+        subscription_deleted для бота. Історія платежів лишається: записи
+        зберігають sub_id, а назва в історії стає порожньою (outer join).
+        Повертає кількість видалених.
+        """
+        with self.get_session() as session:
+            subscriptions = session.execute(
+                select(Subscription.id, Subscription.name)
+                .where(Subscription.id.in_(sub_ids), Subscription.tenant_id == self.tenant_id)
+            ).all()
+            if not subscriptions:
+                return 0
+            ids = [sub_id for sub_id, _ in subscriptions]
+
+            session.execute(delete(Subscription).where(Subscription.id.in_(ids)))
+            for sub_id, name in subscriptions:
+                self.enqueue_to_bot(session, "subscription_deleted", {"name": name},
+                                    coalesce_key=f"subscription_deleted:{sub_id}", trim=False)
+            self._trim_to_bot_backlog(session)
+            self._publish_snapshot(session)
+            session.commit()
+            return len(ids)
     
     # --- Category Methods ---
 
     def get_all_categories(self) -> List[Category]:
         with self.get_session() as session:
-            return session.query(Category).all()
+            return session.query(Category).filter_by(tenant_id=self.tenant_id).all()
 
     # --- Draft Methods ---
 
-    def get_pending_drafts(self) -> List[Draft]:
+    def get_pending_drafts(self) -> List[DraftRow]:
         with self.get_session() as session:
-            return session.query(Draft).filter_by(status=DraftStatus.NEW).all()
+            stmt = (
+                select(Draft.id, Draft.raw_name, Draft.amount, Draft.currency, Draft.created_at, Draft.chat_id)
+                .where(Draft.status == DraftStatus.NEW, Draft.tenant_id == self.tenant_id)
+            )
+            return list(map(DraftRow._make, session.execute(stmt)))
 
     def get_draft_by_id(self, draft_id: int) -> Optional[Draft]:
         with self.get_session() as session:
-            return session.query(Draft).filter_by(id=draft_id).first()
+            return session.query(Draft).filter_by(id=draft_id, tenant_id=self.tenant_id).first()
 
+    @retry_on_busy
     def approve_draft(self, draft_id: int, subscription: Subscription) -> Optional[int]:
         with self.get_session() as session:
-            draft = session.query(Draft).filter_by(id=draft_id).first()
+            draft = session.query(Draft).filter_by(id=draft_id, tenant_id=self.tenant_id).first()
             if draft:
+                subscription.tenant_id = self.tenant_id
                 session.add(subscription)
                 draft.status = DraftStatus.PROCESSED
                 chat_id = draft.chat_id
+                self._publish_snapshot(session)
                 session.commit()
                 return chat_id
             return None
 
+    @retry_on_busy
     def reject_draft(self, draft_id: int) -> Optional[int]:
         with self.get_session() as session:
-            draft = session.query(Draft).filter_by(id=draft_id).first()
+            draft = session.query(Draft).filter_by(id=draft_id, tenant_id=self.tenant_id).first()
             if draft:
                 draft.status = DraftStatus.PROCESSED # Or maybe a REJECTED status
                 chat_id = draft.chat_id
@@ -163,18 +522,185 @@ class DBManager:
                 return chat_id
             return None
 
+    @retry_on_busy
+    def approve_drafts(self, approvals: List[Tuple[int, Subscription]]) -> int:
+        """
+        Створює підписки з кількох чернеток однією транзакцією: чернетки
+        позначаються обробленими, автори отримують subscription_approved.
+        Вже оброблені чернетки пропускаються. Повертає кількість схвалених.
+        """
+        with self.get_session() as session:
+            drafts = {
+                draft.id: draft for draft in session.execute(
+                    select(Draft.id, Draft.raw_name, Draft.chat_id)
+                    .where(Draft.id.in_([draft_id for draft_id, _ in approvals]), Draft.status == DraftStatus.NEW,
+                           Draft.tenant_id == self.tenant_id)
+                )
+            }
+            approved = [(drafts[draft_id], subscription) for draft_id, subscription in approvals if draft_id in drafts]
+            if not approved:
+                return 0
+
+            for _, subscription in approved:
+                subscription.tenant_id = self.tenant_id
+            session.add_all([subscription for _, subscription in approved])
+            session.execute(
+                update(Draft).where(Draft.id.in_([draft.id for draft, _ in approved])).values(status=DraftStatus.PROCESSED)
+            )
+            for draft, subscription in approved:
+                self.enqueue_to_bot(session, "subscription_approved", {
+                    "original_draft": draft.raw_name,
+                    "new_name": subscription.name,
+                    "cost_uah": subscription.cost_uah,
+                    "chat_id": draft.chat_id
+                }, trim=False)
+            self._trim_to_bot_backlog(session)
+            self._publish_snapshot(session)
+            session.commit()
+            return len(approved)
+
+    @retry_on_busy
+    def reject_drafts(self, draft_ids: List[int]) -> int:
+        """Відхиляє кілька чернеток однією транзакцією з подіями draft_rejected. Повертає кількість відхилених."""
+        with self.get_session() as session:
+            drafts = session.execute(
+                select(Draft.id, Draft.chat_id)
+                .where(Draft.id.in_(draft_ids), Draft.status == DraftStatus.NEW, Draft.tenant_id == self.tenant_id)
+            ).all()
+            if not drafts:
+                return 0
+
+            session.execute(
+                update(Draft).where(Draft.id.in_([draft_id for draft_id, _ in drafts])).values(status=DraftStatus.PROCESSED)
+            )
+            for draft_id, chat_id in drafts:
+                self.enqueue_to_bot(session, "draft_rejected", {"draft_id": draft_id, "chat_id": chat_id}, trim=False)
+            self._trim_to_bot_backlog(session)
+            session.commit()
+            return len(drafts)
+
+    # --- Full-Text Search ---
+
+    _SEARCH_WORD_RE = re.compile(r"\w+")
+
+    @classmethod
+    def fts_match_expression(cls, query: str) -> Optional[str]:
+        """
+        Перетворює введений текст на запит FTS5 MATCH: кожне слово - префікс ("нетф" -> "нетф"*),
+        усі слова обов'язкові. Лапки екранують синтаксис FTS5. None, якщо слів немає.
+        """
+        words = cls._SEARCH_WORD_RE.findall(fold(query))
+        return " ".join(f'"{word}"*' for word in words) or None
+
+    @staticmethod
+    def _fts_rowids(table: str, match: str):
+        """Підзапит rowid рядків FTS-таблиці (subscriptions_fts / drafts_fts), що відповідають запиту."""
+        return select(text("rowid")).select_from(text(table)).where(text(f"{table} MATCH :match").bindparams(match=match))
+
+    def search_subscription_ids(self, query: str) -> Optional[Set[int]]:
+        """id підписок тенанта, у назві, категорії чи періоді яких є слова з префіксами запиту. None - запит без слів."""
+        match = self.fts_match_expression(query)
+        if match is None:
+            return None
+        stmt = select(Subscription.id).where(
+            Subscription.id.in_(self._fts_rowids("subscriptions_fts", match)), Subscription.tenant_id == self.tenant_id
+        )
+        with self.get_session() as session:
+            return set(session.scalars(stmt))
+
+    def search_draft_ids(self, query: str) -> Optional[Set[int]]:
+        """id чернеток тенанта, назва яких відповідає запиту (як search_subscription_ids)."""
+        match = self.fts_match_expression(query)
+        if match is None:
+            return None
+        stmt = select(Draft.id).where(Draft.id.in_(self._fts_rowids("drafts_fts", match)), Draft.tenant_id == self.tenant_id)
+        with self.get_session() as session:
+            return set(session.scalars(stmt))
+
     # --- Payment History Methods ---
 
-    def get_payment_history(self) -> List["PaymentHistory"]:
-        """Повертає всю історію платежів, завантажуючи пов'язані підписки."""
+    def get_payment_history(self) -> List[PaymentHistoryRow]:
+        """Повертає всю історію платежів (нові першими) разом з назвами підписок."""
         with self.get_session() as session:
-            # Eagerly load the 'subscription' relationship to avoid lazy loading issues
-            return session.query(PaymentHistory).options(joinedload(PaymentHistory.subscription)).order_by(PaymentHistory.pay_date.desc()).all()
+            stmt = (
+                select(PaymentHistory.id, PaymentHistory.sub_id, Subscription.name,
+                       PaymentHistory.final_sum, PaymentHistory.pay_date)
+                .outerjoin(Subscription, Subscription.id == PaymentHistory.sub_id)
+                .where(PaymentHistory.tenant_id == self.tenant_id)
+                .order_by(PaymentHistory.pay_date.desc())
+            )
+            return list(map(PaymentHistoryRow._make, session.execute(stmt)))
+
+    # Колонки сортування історії -> SQL-вираз; завжди доповнюється id для стабільного порядку та keyset
+    HISTORY_SORT_KEYS = ("id", "subscription_name", "final_sum", "pay_date")
+
+    @staticmethod
+    def _history_sort_expression(sort_key: str):
+        if sort_key == "id":
+            return PaymentHistory.id
+        if sort_key == "subscription_name":
+            return func.coalesce(func.casefold(Subscription.name), "")
+        if sort_key == "final_sum":
+            return PaymentHistory.final_sum
+        return PaymentHistory.pay_date
 
+    @staticmethod
+    def payment_history_cursor(row: PaymentHistoryRow, sort_key: str = "pay_date") -> tuple:
+        """Позиція рядка для keyset-пагінації (значення ключа сортування, id)."""
+        if sort_key == "subscription_name":
+            return ((row.subscription_name or "").casefold(), row.id)
+        return (getattr(row, sort_key), row.id)
+
+    def get_payment_history_page(self, limit: int, sort_key: str = "pay_date", descending: bool = True,
+                                 after: Optional[tuple] = None, search: str = "") -> List[PaymentHistoryRow]:
+        """
+        Одна сторінка історії платежів, відсортована та відфільтрована в SQL.
+        `after` - курсор останнього рядка попередньої сторінки (payment_history_cursor):
+        сторінка починається одразу після нього, без OFFSET, тож глибина прокрутки не впливає на швидкість.
+        `search` шукає назву підписки за префіксами слів (FTS5, без урахування регістру й діакритики),
+        а запит з цифрами - ще й підрядок у номері, сумі та даті, як їх показує таблиця.
+        """
+        sort_expression = self._history_sort_expression(sort_key)
+        stmt = (
+            select(PaymentHistory.id, PaymentHistory.sub_id, Subscription.name,
+                   PaymentHistory.final_sum, PaymentHistory.pay_date)
+            .outerjoin(Subscription, Subscription.id == PaymentHistory.sub_id)
+            .where(PaymentHistory.tenant_id == self.tenant_id)
+        )
+
+        if search:
+            conditions = []
+            match = self.fts_match_expression(search)
+            if match:
+                # Назва підписки - через FTS-індекс, далі по ix_payment_history_sub_id
+                conditions.append(PaymentHistory.sub_id.in_(self._fts_rowids("subscriptions_fts", match)))
+            if any(char.isdigit() for char in search):
+                # Номер, сума та дата є лише в самій історії - підрядок, як їх показує таблиця
+                escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                pattern = f"%{escaped}%"
+                conditions += [
+                    cast(PaymentHistory.id, String).like(pattern, escape="\\"),
+                    func.printf("%.2f", PaymentHistory.final_sum).like(pattern, escape="\\"),
+                    func.strftime("%d.%m.%Y %H:%M", PaymentHistory.pay_date).like(pattern, escape="\\"),
+                ]
+            stmt = stmt.where(or_(*conditions) if conditions else false())
+
+        key = tuple_(sort_expression, PaymentHistory.id)
+        if after is not None:
+            stmt = stmt.where(key < tuple_(*after) if descending else key > tuple_(*after))
+        if descending:
+            stmt = stmt.order_by(sort_expression.desc(), PaymentHistory.id.desc())
+        else:
+            stmt = stmt.order_by(sort_expression.asc(), PaymentHistory.id.asc())
+
+        with self.get_session() as session:
+            return list(map(PaymentHistoryRow._make, session.execute(stmt.limit(limit))))
+
+    @retry_on_busy
     def mark_subscription_paid(self, sub_id: int, last_payment: date, next_payment: date, amount_paid: float):
         """Відзначає підписку як сплачену, оновлює дати та додає запис в історію."""
         with self.get_session() as session:
-            subscription = session.query(Subscription).filter_by(id=sub_id).first()
+            subscription = session.query(Subscription).filter_by(id=sub_id, tenant_id=self.tenant_id).first()
             if subscription:
                 subscription.last_payment = last_payment
                 subscription.next_payment = next_payment
@@ -183,11 +709,45 @@ class DBManager:
                 
                 payment_record = PaymentHistory(
                     sub_id=sub_id,
+                    tenant_id=self.tenant_id,
                     final_sum=amount_paid,
                     pay_date=datetime.utcnow() # Use UTC now for consistency
                 )
                 session.add(payment_record)
+                self._publish_snapshot(session)
                 session.commit()
 
+    @retry_on_busy
+    def mark_subscriptions_paid(self, payments: List[Tuple[int, date, date, float]]) -> int:
+        """
+        Відзначає сплаченими кілька підписок однією транзакцією (звірка наприкінці місяця).
+        :param payments: (sub_id, last_payment, next_payment, amount_paid) для кожної підписки.
+        Повертає кількість оновлених підписок.
+        """
+        with self.get_session() as session:
+            existing = set(session.scalars(
+                select(Subscription.id).where(
+                    Subscription.id.in_([payment[0] for payment in payments]), Subscription.tenant_id == self.tenant_id
+                )
+            ))
+            payments = [payment for payment in payments if payment[0] in existing]
+            if not payments:
+                return 0
+
+            pay_date = datetime.utcnow()
+            # Пакетний UPDATE за первинним ключем і один INSERT ... VALUES для історії
+            session.execute(update(Subscription), [
+                {"id": sub_id, "last_payment": last_payment, "next_payment": next_payment,
+                 "state": SubscriptionState.ACTIVE, "is_reminder_sent": False}
+                for sub_id, last_payment, next_payment, _ in payments
+            ])
+            session.execute(insert(PaymentHistory), [
+                {"sub_id": sub_id, "tenant_id": self.tenant_id, "final_sum": amount_paid, "pay_date": pay_date}
+                for sub_id, _, _, amount_paid in payments
+            ])
+            self._publish_snapshot(session)
+            session.commit()
+            return len(payments)
+
 # Глобальний екземпляр для зручності
 db = DBManager()
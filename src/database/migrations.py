@@ -0,0 +1,191 @@
+from typing import Callable, List, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from src.core.search_text import fold_optional
+
+# Версія схеми зберігається в заголовку файлу SQLite (PRAGMA user_version).
+# Нові бази отримують актуальну схему через Base.metadata.create_all, а існуючі
+# оновлюються на місці кроками нижче. Кожен крок ідемпотентний, тому його
+# безпечно виконувати і для щойно створеної бази.
+
+def _v1_query_indexes(conn: Connection):
+    """Індекси під гарячі запити: черга, нагадування, історія, чернетки."""
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sync_queue_direction_timestamp ON sync_queue (direction, timestamp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_subscriptions_next_payment ON subscriptions (next_payment)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_payment_history_pay_date_id ON payment_history (pay_date, id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_payment_history_sub_id ON payment_history (sub_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_drafts_status_created_at ON drafts (status, created_at)"))
+
+def _add_column_if_missing(conn: Connection, table: str, column: str, ddl: str):
+    """ALTER TABLE ADD COLUMN лише якщо колонки ще немає (SQLite не має IF NOT EXISTS для колонок)."""
+    columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+def _v2_sync_retry_columns(conn: Connection):
+    """Лічильник спроб, час наступної спроби та остання помилка для записів черги."""
+    _add_column_if_missing(conn, "sync_queue", "attempts", "INTEGER NOT NULL DEFAULT 0")
+    _add_column_if_missing(conn, "sync_queue", "next_attempt_at", "DATETIME")
+    _add_column_if_missing(conn, "sync_queue", "last_error", "TEXT")
+
+def _v3_sync_payload_blob(conn: Connection):
+    """BLOB-колонка для компактного бінарного формату payload (v2) у черзі та dead letter."""
+    _add_column_if_missing(conn, "sync_queue", "payload_blob", "BLOB")
+    _add_column_if_missing(conn, "sync_dead_letter", "payload_blob", "BLOB")
+
+def _v4_sync_coalescing(conn: Connection):
+    """Ключ об'єднання та час життя подій черги."""
+    _add_column_if_missing(conn, "sync_queue", "coalesce_key", "VARCHAR(128)")
+    _add_column_if_missing(conn, "sync_queue", "expires_at", "DATETIME")
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sync_queue_coalesce_key ON sync_queue (coalesce_key)"))
+
+def _v5_settings_revision(conn: Connection):
+    """Лічильник змін system_settings, який оновлюють тригери (для кешу налаштувань бота)."""
+    conn.execute(text("CREATE TABLE IF NOT EXISTS settings_revision (id INTEGER PRIMARY KEY, revision INTEGER NOT NULL DEFAULT 0)"))
+    conn.execute(text("INSERT OR IGNORE INTO settings_revision (id, revision) VALUES (1, 0)"))
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS trg_system_settings_{operation.lower()}_revision "
+            f"AFTER {operation} ON system_settings "
+            "BEGIN UPDATE settings_revision SET revision = revision + 1 WHERE id = 1; END"
+        ))
+
+def _v6_tenants(conn: Connection):
+    """Тенанти: колонка tenant_id для черги, dead letter і чернеток (існуючі записи - тенант за замовчуванням)."""
+    for table in ("sync_queue", "sync_dead_letter", "drafts"):
+        _add_column_if_missing(conn, table, "tenant_id", "VARCHAR(64) NOT NULL DEFAULT ''")
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sync_queue_direction_tenant_timestamp ON sync_queue (direction, tenant_id, timestamp)"))
+
+# Таблиці, зміни яких потрапляють у change_log
+CHANGE_LOG_TABLES = ("subscriptions", "drafts", "payment_history", "system_settings")
+
+def _v7_change_log(conn: Connection):
+    """Журнал змін (change_log) з глобальною ревізією та тригери на основних таблицях."""
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS change_log ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "table_name VARCHAR(32) NOT NULL, "
+        "row_id INTEGER, "
+        "operation VARCHAR(6) NOT NULL, "
+        "changed_at DATETIME DEFAULT (CURRENT_TIMESTAMP))"
+    ))
+    for table in CHANGE_LOG_TABLES:
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            row = "OLD.rowid" if operation == "DELETE" else "NEW.rowid"
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_change_log "
+                f"AFTER {operation} ON {table} "
+                f"BEGIN INSERT INTO change_log (table_name, row_id, operation) VALUES ('{table}', {row}, '{operation}'); END"
+            ))
+
+# Токенізатор повнотекстового пошуку: регістр і латинська діакритика (é/e) не враховуються.
+# Кириличні знаки (й/и, ї/і) токенізатор не прибирає, тому назви в індекс потрапляють
+# уже згорнутими з колонок search_name (їх пише Python, src/core/search_text.py).
+# Префіксні індекси прискорюють запити "нет"* під час набору
+FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3'"
+
+# Колонки зі згорнутими назвами, з яких тригери наповнюють FTS-індекси
+SEARCH_NAME_COLUMNS = (("subscriptions", "name"), ("categories", "name"), ("drafts", "raw_name"))
+
+def _v8_full_text_search(conn: Connection):
+    """
+    FTS5-індекси для пошуку: subscriptions_fts (назва, категорія, період) і drafts_fts (назва).
+    rowid збігається з id рядка; тригери тримають індекси в синхроні з таблицями.
+    Тригери - лише вбудований SQL, тож базу може змінювати будь-який клієнт (sqlite3 CLI тощо).
+    Згорнуту назву (search_name) пише DBManager; якщо інший клієнт її не заповнив (NULL),
+    індексується сама назва - пошук лишається нечутливим до регістру. Клієнт, що перейменовує
+    рядок в обхід DBManager, має скинути search_name в NULL.
+    """
+    for table, column in SEARCH_NAME_COLUMNS:
+        _add_column_if_missing(conn, table, "search_name", "VARCHAR(255)")
+        # Згортання - функція Python, тому існуючі рядки заповнюються звідси, а не SQL-функцією
+        rows = conn.execute(text(f"SELECT id, {column} FROM {table} WHERE search_name IS NULL")).all()
+        if rows:
+            conn.execute(
+                text(f"UPDATE {table} SET search_name = :search_name WHERE id = :id"),
+                [{"id": row_id, "search_name": fold_optional(value)} for row_id, value in rows]
+            )
+
+    conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS subscriptions_fts USING fts5(name, category, period, {FTS_OPTIONS})"))
+    conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS drafts_fts USING fts5(raw_name, {FTS_OPTIONS})"))
+
+    subscription_values = ("NEW.id, COALESCE(NEW.search_name, NEW.name), "
+                           "(SELECT COALESCE(search_name, name) FROM categories WHERE id = NEW.category_id), NEW.period")
+    triggers = {
+        "trg_subscriptions_insert_fts": "AFTER INSERT ON subscriptions BEGIN "
+            f"INSERT INTO subscriptions_fts (rowid, name, category, period) VALUES ({subscription_values}); END",
+        "trg_subscriptions_update_fts": "AFTER UPDATE OF name, search_name, category_id, period ON subscriptions BEGIN "
+            "DELETE FROM subscriptions_fts WHERE rowid = OLD.id; "
+            f"INSERT INTO subscriptions_fts (rowid, name, category, period) VALUES ({subscription_values}); END",
+        "trg_subscriptions_delete_fts": "AFTER DELETE ON subscriptions BEGIN "
+            "DELETE FROM subscriptions_fts WHERE rowid = OLD.id; END",
+        "trg_categories_update_fts": "AFTER UPDATE OF name, search_name ON categories BEGIN "
+            "UPDATE subscriptions_fts SET category = COALESCE(NEW.search_name, NEW.name) "
+            "WHERE rowid IN (SELECT id FROM subscriptions WHERE category_id = NEW.id); END",
+        "trg_drafts_insert_fts": "AFTER INSERT ON drafts BEGIN "
+            "INSERT INTO drafts_fts (rowid, raw_name) VALUES (NEW.id, COALESCE(NEW.search_name, NEW.raw_name)); END",
+        "trg_drafts_update_fts": "AFTER UPDATE OF raw_name, search_name ON drafts BEGIN "
+            "UPDATE drafts_fts SET raw_name = COALESCE(NEW.search_name, NEW.raw_name) WHERE rowid = NEW.id; END",
+        "trg_drafts_delete_fts": "AFTER DELETE ON drafts BEGIN "
+            "DELETE FROM drafts_fts WHERE rowid = OLD.id; END",
+    }
+    for name, body in triggers.items():
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {body}"))
+
+    # Індексація рядків, що вже є в базі (повторний запуск нічого не дублює)
+    conn.execute(text(
+        "INSERT INTO subscriptions_fts (rowid, name, category, period) "
+        "SELECT s.id, COALESCE(s.search_name, s.name), COALESCE(c.search_name, c.name), s.period "
+        "FROM subscriptions s LEFT JOIN categories c ON c.id = s.category_id "
+        "WHERE s.id NOT IN (SELECT rowid FROM subscriptions_fts)"
+    ))
+    conn.execute(text(
+        "INSERT INTO drafts_fts (rowid, raw_name) SELECT id, COALESCE(search_name, raw_name) FROM drafts "
+        "WHERE id NOT IN (SELECT rowid FROM drafts_fts)"
+    ))
+
+def _v9_tenant_data(conn: Connection):
+    """Тенанти для даних десктопа: tenant_id у subscriptions, categories, payment_history (існуючі - тенант за замовчуванням)."""
+    for table in ("subscriptions", "categories", "payment_history"):
+        _add_column_if_missing(conn, table, "tenant_id", "VARCHAR(64) NOT NULL DEFAULT ''")
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_subscriptions_tenant_next_payment ON subscriptions (tenant_id, next_payment)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_payment_history_tenant_pay_date_id ON payment_history (tenant_id, pay_date, id)"))
+
+# Впорядкований список кроків: (версія, опис, функція оновлення)
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Індекси для sync_queue, subscriptions, payment_history, drafts", _v1_query_indexes),
+    (2, "Повторні спроби для sync_queue (attempts, next_attempt_at, last_error)", _v2_sync_retry_columns),
+    (3, "Бінарний payload для sync_queue та sync_dead_letter (payload_blob)", _v3_sync_payload_blob),
+    (4, "Об'єднання та TTL подій sync_queue (coalesce_key, expires_at)", _v4_sync_coalescing),
+    (5, "Лічильник змін system_settings (settings_revision + тригери)", _v5_settings_revision),
+    (6, "Тенанти: tenant_id для sync_queue, sync_dead_letter, drafts", _v6_tenants),
+    (7, "Журнал змін change_log + тригери (subscriptions, drafts, payment_history, system_settings)", _v7_change_log),
+    (8, "Повнотекстовий пошук FTS5 (subscriptions_fts, drafts_fts + тригери)", _v8_full_text_search),
+    (9, "Тенанти: tenant_id для subscriptions, categories, payment_history", _v9_tenant_data),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn: Connection) -> int:
+    """Повертає поточну версію схеми бази."""
+    return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+def run_migrations(engine: Engine) -> int:
+    """
+    Застосовує всі кроки, новіші за записану версію схеми, у порядку зростання.
+    Після кожного кроку версія фіксується, тому перерваний запуск продовжиться з того ж місця.
+    :return: Версія схеми після оновлення.
+    """
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+
+        for version, description, upgrade in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"[Migrations] Applying v{version}: {description}")
+            upgrade(conn)
+            conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+            conn.commit()
+            current = version
+
+    return current
@@ -0,0 +1,77 @@
+import functools
+import random
+import sqlite3
+import time
+from typing import Any, Callable, Dict
+from sqlalchemy.exc import OperationalError
+from src.core.config import Config
+
+# Налаштування з'єднань SQLite для одночасної роботи двох процесів (десктоп + бот).
+
+def apply_pragmas(dbapi_connection, connection_record, pragmas: Dict[str, Any] = None):
+    """
+    Обробник події `connect` SQLAlchemy: застосовує профіль PRAGMA
+    до кожного нового з'єднання пулу (а не до одного тимчасового).
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in (pragmas or Config.SQLITE_PRAGMAS).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+def register_functions(dbapi_connection, connection_record):
+    """
+    Обробник події `connect`: SQL-функції для пошуку без урахування регістру.
+    Вбудовані lower()/LIKE у SQLite працюють лише з ASCII, а назви підписок - кирилицею.
+    Лише для запитів DBManager: схема (тригери, індекси) на цих функціях не тримається.
+    """
+    dbapi_connection.create_function(
+        "casefold", 1, lambda value: value.casefold() if isinstance(value, str) else value, deterministic=True
+    )
+
+def begin_immediate(session):
+    """
+    Явно відкриває транзакцію SQLite (BEGIN IMMEDIATE) для сесії, в якій ще не було запису.
+    Модуль sqlite3 сам починає транзакцію лише перед першим INSERT/UPDATE/DELETE, тож
+    без цього перший SAVEPOINT (session.begin_nested) стає зовнішньою транзакцією, а його
+    RELEASE фіксує все одразу. IMMEDIATE також бере блокування запису заздалегідь
+    (з очікуванням busy_timeout), а не посеред транзакції.
+    """
+    session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+
+def is_busy_error(error: Exception) -> bool:
+    """Чи є помилка наслідком блокування файлу іншим процесом (SQLITE_BUSY/SQLITE_LOCKED)."""
+    orig = getattr(error, "orig", error)
+    if not isinstance(orig, sqlite3.OperationalError):
+        return False
+    message = str(orig).lower()
+    return "database is locked" in message or "database is busy" in message or "database table is locked" in message
+
+def run_with_busy_retry(func: Callable, *args, retries: int = None, base_delay: float = None, **kwargs):
+    """
+    Виконує `func`, повторюючи виклик при SQLITE_BUSY з експоненційною
+    затримкою та випадковим розкидом (jitter), щоб процеси не конкурували синхронно.
+    Функція має бути безпечною для повтору (одна транзакція, що відкочується при помилці).
+    """
+    retries = Config.SQLITE_BUSY_RETRIES if retries is None else retries
+    base_delay = Config.SQLITE_BUSY_BASE_DELAY_MS / 1000 if base_delay is None else base_delay
+
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as e:
+            if attempt >= retries or not is_busy_error(e):
+                raise
+            delay = base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"[SQLite] Database is busy, retry {attempt + 1}/{retries} in {delay * 1000:.0f} ms")
+            time.sleep(delay)
+            attempt += 1
+
+def retry_on_busy(func: Callable) -> Callable:
+    """Декоратор-обгортка над `run_with_busy_retry`."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_with_busy_retry(func, *args, **kwargs)
+    return wrapper
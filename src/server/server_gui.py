@@ -1,7 +1,9 @@
 import sys
 import os
+import secrets
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                               QHBoxLayout, QPushButton, QTextEdit, QLabel, QLineEdit, QMessageBox)
+                               QHBoxLayout, QPushButton, QTextEdit, QLabel, QLineEdit, QMessageBox,
+                               QComboBox)
 from PySide6.QtCore import QProcess, Qt, QSettings
 from PySide6.QtGui import QIcon
 
@@ -39,6 +41,34 @@ class ServerWindow(QMainWindow):
         self.token_layout.addWidget(self.token_label)
         self.token_layout.addWidget(self.token_input)
         self.token_layout.addWidget(self.toggle_token_btn)
+
+        # Update Mode (Polling / Webhook)
+        self.mode_layout = QHBoxLayout()
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem("Polling", "polling")
+        self.mode_combo.addItem("Webhook", "webhook")
+        self.mode_combo.setCurrentIndex(max(0, self.mode_combo.findData(self.settings.value("bot_mode", "polling"))))
+        self.mode_layout.addWidget(QLabel("Mode:"))
+        self.mode_layout.addWidget(self.mode_combo)
+        self.mode_layout.addStretch()
+
+        # Webhook Settings (shown only in webhook mode)
+        self.webhook_widget = QWidget()
+        self.webhook_layout = QHBoxLayout(self.webhook_widget)
+        self.webhook_layout.setContentsMargins(0, 0, 0, 0)
+        self.webhook_port_input = QLineEdit(str(self.settings.value("webhook_port", "8080")))
+        self.webhook_port_input.setFixedWidth(60)
+        self.webhook_path_input = QLineEdit(str(self.settings.value("webhook_path", "/webhook")))
+        self.webhook_url_input = QLineEdit(str(self.settings.value("webhook_url", "")))
+        self.webhook_url_input.setPlaceholderText("https://example.com (optional)")
+        self.webhook_layout.addWidget(QLabel("Port:"))
+        self.webhook_layout.addWidget(self.webhook_port_input)
+        self.webhook_layout.addWidget(QLabel("Path:"))
+        self.webhook_layout.addWidget(self.webhook_path_input)
+        self.webhook_layout.addWidget(QLabel("Public URL:"))
+        self.webhook_layout.addWidget(self.webhook_url_input)
+        self.mode_combo.currentIndexChanged.connect(self.update_mode_visibility)
+        self.update_mode_visibility()
         
         # Buttons
         self.btn_layout = QHBoxLayout()
@@ -60,6 +90,8 @@ class ServerWindow(QMainWindow):
         
         # Add to layout
         self.layout.addLayout(self.token_layout)
+        self.layout.addLayout(self.mode_layout)
+        self.layout.addWidget(self.webhook_widget)
         self.layout.addLayout(self.btn_layout)
         self.layout.addWidget(QLabel("Server Logs:"))
         self.layout.addWidget(self.log_area)
@@ -79,14 +111,23 @@ class ServerWindow(QMainWindow):
             self.token_input.setEchoMode(QLineEdit.EchoMode.Password)
             self.toggle_token_btn.setStyleSheet("")
 
+    def update_mode_visibility(self):
+        self.webhook_widget.setVisible(self.mode_combo.currentData() == "webhook")
+
     def start_server(self):
         token = self.token_input.text().strip()
         if not token:
             QMessageBox.warning(self, "Error", "Token is required!")
             return
             
+        mode = self.mode_combo.currentData()
+        if mode == "webhook" and not self.webhook_port_input.text().strip().isdigit():
+            QMessageBox.warning(self, "Error", "Webhook port must be a number!")
+            return
+
         # Save token
         self.settings.setValue("bot_token", token)
+        self.settings.setValue("bot_mode", mode)
             
         self.process = QProcess()
         self.process.setProgram(sys.executable)
@@ -101,6 +142,24 @@ class ServerWindow(QMainWindow):
         # Pass DB path explicitly to ensure bot finds it correctly
         db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "sub_manager.sqlite"))
         env.append(f"DB_PATH={db_path}")
+
+        env.append(f"BOT_MODE={mode}")
+        if mode == "webhook":
+            port = self.webhook_port_input.text().strip()
+            path = self.webhook_path_input.text().strip() or "/webhook"
+            if not path.startswith("/"):
+                path = "/" + path
+            public_url = self.webhook_url_input.text().strip()
+            # Secret is generated once and reused, so Telegram's registered webhook stays valid
+            secret = str(self.settings.value("webhook_secret", "")) or secrets.token_urlsafe(32)
+            self.settings.setValue("webhook_port", port)
+            self.settings.setValue("webhook_path", path)
+            self.settings.setValue("webhook_url", public_url)
+            self.settings.setValue("webhook_secret", secret)
+            env.append(f"BOT_WEBHOOK_PORT={port}")
+            env.append(f"BOT_WEBHOOK_PATH={path}")
+            env.append(f"BOT_WEBHOOK_URL={public_url}")
+            env.append(f"BOT_WEBHOOK_SECRET={secret}")
         
         self.process.setEnvironment(env)
         
@@ -113,10 +172,13 @@ class ServerWindow(QMainWindow):
         
         self.log(f"[*] Starting bot process: {script_path}")
         self.log(f"[*] Database path: {db_path}")
+        self.log(f"[*] Mode: {mode}")
         
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
         self.token_input.setEnabled(False)
+        self.mode_combo.setEnabled(False)
+        self.webhook_widget.setEnabled(False)
 
     def stop_server(self):
         if self.process:
@@ -138,6 +200,8 @@ class ServerWindow(QMainWindow):
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         self.token_input.setEnabled(True)
+        self.mode_combo.setEnabled(True)
+        self.webhook_widget.setEnabled(True)
         self.process = None
 
 if __name__ == "__main__":
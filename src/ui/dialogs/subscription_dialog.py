@@ -2,15 +2,16 @@ from PySide6.QtWidgets import (QDialog, QVBoxLayout, QFormLayout, QLineEdit,
                                QDoubleSpinBox, QComboBox, QDateEdit, QPushButton, 
                                QMessageBox, QLabel)
 from PySide6.QtCore import QDate, Signal
+from src.core.dto import SubscriptionRow
 from src.core.models import Subscription, Category, PaymentType, SubscriptionState
 from src.database.db_manager import db
-from typing import Optional
+from typing import Optional, Union
 from dateutil.relativedelta import relativedelta
 
 class SubscriptionDialog(QDialog):
     """Діалогове вікно для додавання або редагування підписки."""
 
-    def __init__(self, subscription: Optional[Subscription] = None, is_draft_approval: bool = False):
+    def __init__(self, subscription: Optional[Union[Subscription, SubscriptionRow]] = None, is_draft_approval: bool = False):
         super().__init__()
         
         self.subscription = subscription
@@ -111,10 +112,8 @@ class SubscriptionDialog(QDialog):
             QMessageBox.warning(self, "Помилка валідації", "Назва не може бути порожньою.")
             return None
 
-        # Створюємо новий об'єкт або використовуємо існуючий
-        sub = self.subscription if self.is_edit_mode else Subscription()
-        if not self.is_edit_mode:
-            sub.state = SubscriptionState.ACTIVE 
+        # Завжди новий ORM-об'єкт: редагована підписка приходить як незмінний SubscriptionRow
+        sub = Subscription(state=getattr(self.subscription, "state", None) or SubscriptionState.ACTIVE)
 
         sub.name = self.name_edit.text().strip()
         sub.cost_uah = self.cost_edit.value()
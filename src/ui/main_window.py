@@ -9,6 +9,8 @@ from src.ui.tabs.history_tab import HistoryTab
 from src.core.currency_updater import update_currency_rates
 from src.core.sync_worker import SyncWorker
 from src.core.reminder_worker import ReminderWorker
+from src.core.change_tracker import ChangeTracker
+from src.database.db_manager import db
 
 class CurrencyUpdaterThread(QThread):
     """Потік для фонового оновлення курсів валют."""
@@ -54,6 +56,13 @@ class MainWindow(QMainWindow):
 
     def setup_tabs(self):
         """Ініціалізація вкладок."""
+        # Таблиці, від яких залежить кожна вкладка; ревізія фіксується до першого завантаження
+        self.trackers = {
+            0: ChangeTracker(db, ("subscriptions", "drafts")),
+            1: ChangeTracker(db, ("subscriptions",)),
+            2: ChangeTracker(db, ("payment_history", "subscriptions")),
+        }
+
         self.tab_management = ManagementTab()
         self.tab_stats = StatsTab()
         self.tab_settings = SettingsTab()
@@ -68,7 +77,11 @@ class MainWindow(QMainWindow):
         self.tabs.currentChanged.connect(self.on_tab_changed)
 
     def on_tab_changed(self, index):
-        """Оновлює дані при перемиканні вкладок."""
+        """Оновлює дані при перемиканні вкладок, якщо з попереднього разу вони змінились."""
+        tracker = self.trackers.get(index)
+        if tracker is None or not tracker.poll():
+            return
+
         if index == 0: # Management
             self.tab_management.refresh_all_data()
         elif index == 1: # Stats
@@ -1,7 +1,8 @@
 from PySide6.QtCore import QAbstractTableModel, Qt, QModelIndex
 from PySide6.QtGui import QBrush, QColor # Добавлен импорт для цветов
 from typing import List, Any
-from src.core.models import Subscription, SubscriptionState, PaymentType
+from src.core.dto import SubscriptionRow
+from src.core.models import SubscriptionState, PaymentType
 from datetime import datetime, date
 
 class SubscriptionTableModel(QAbstractTableModel):
@@ -18,7 +19,7 @@ class SubscriptionTableModel(QAbstractTableModel):
         SubscriptionState.OVERDUE: "Прострочена",
     }
 
-    def __init__(self, data: List[Subscription] = None):
+    def __init__(self, data: List[SubscriptionRow] = None):
         super().__init__()
         self._data = data or []
         self._headers = [
@@ -41,7 +42,7 @@ class SubscriptionTableModel(QAbstractTableModel):
             elif column == 2:
                 return f"{subscription.cost_uah:.2f}"
             elif column == 3:
-                return subscription.category.name if subscription.category else "N/A"
+                return subscription.category_name or "N/A"
             elif column == 4:
                 return subscription.period
             elif column == 5:
@@ -73,7 +74,7 @@ class SubscriptionTableModel(QAbstractTableModel):
             elif column == 2:
                 return subscription.cost_uah
             elif column == 3:
-                return subscription.category.name if subscription.category else ""
+                return subscription.category_name or ""
             elif column == 4:
                 return subscription.period
             elif column == 5:
@@ -98,13 +99,54 @@ class SubscriptionTableModel(QAbstractTableModel):
             return self._headers[section]
         return None
 
-    def get_subscription(self, row: int) -> Subscription:
+    def get_subscription(self, row: int) -> SubscriptionRow:
         if 0 <= row < len(self._data):
             return self._data[row]
         return None
 
-    def refresh_data(self, new_data: List[Subscription]):
-        """Оновлює дані моделі та сповіщає view."""
-        self.beginResetModel()
-        self._data = new_data
-        self.endResetModel()
+    def refresh_data(self, new_data: List[SubscriptionRow]):
+        """
+        Оновлює дані моделі за різницею з поточними (ключ - id підписки).
+
+        Замість скидання моделі надсилаються лише rowsRemoved / dataChanged /
+        rowsInserted для змінених рядків, тож view зберігає виділення та прокрутку,
+        а проксі перефільтровує й пересортовує тільки зачеплені рядки.
+        Нові підписки додаються в кінець (порядок показу задає проксі).
+        """
+        new_by_id = {row.id: row for row in new_data}
+
+        # 1. Видалені: суцільними блоками знизу вгору, щоб індекси вище не зсувались
+        removed = [row_index for row_index, row in enumerate(self._data) if row.id not in new_by_id]
+        for first, last in reversed(self._ranges(removed)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._data[first:last + 1]
+            self.endRemoveRows()
+
+        # 2. Змінені: заміна на місці, dataChanged для суцільних блоків
+        changed = []
+        for row_index, row in enumerate(self._data):
+            new_row = new_by_id.pop(row.id)
+            if new_row != row:
+                self._data[row_index] = new_row
+                changed.append(row_index)
+        last_column = self.columnCount() - 1
+        for first, last in self._ranges(changed):
+            self.dataChanged.emit(self.index(first, 0), self.index(last, last_column))
+
+        # 3. Нові: одним блоком у кінець (у new_by_id залишились лише вони)
+        if new_by_id:
+            first = len(self._data)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_by_id) - 1)
+            self._data.extend(new_by_id.values())
+            self.endInsertRows()
+
+    @staticmethod
+    def _ranges(indexes: List[int]) -> List[tuple]:
+        """Зростаючі індекси -> суцільні діапазони [(first, last), ...]."""
+        ranges = []
+        for index in indexes:
+            if ranges and ranges[-1][1] == index - 1:
+                ranges[-1] = (ranges[-1][0], index)
+            else:
+                ranges.append((index, index))
+        return ranges
@@ -1,18 +1,31 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QTableView, QHeaderView, 
                                QGroupBox, QLineEdit)
-from PySide6.QtCore import QAbstractTableModel, Qt, QModelIndex, QSortFilterProxyModel
+from PySide6.QtCore import QAbstractTableModel, Qt, QModelIndex, QTimer
 from typing import List, Any
-from src.core.models import PaymentHistory, Subscription
+from src.core.dto import PaymentHistoryRow
 from src.database.db_manager import db
-from datetime import datetime
 
 class PaymentHistoryModel(QAbstractTableModel):
-    """Модель для відображення історії платежів у QTableView."""
+    """
+    Модель історії платежів з ледачим довантаженням.
 
-    def __init__(self, data: List[PaymentHistory] = None):
+    Рядки читаються сторінками по PAGE_SIZE через canFetchMore/fetchMore, коли
+    таблицю прокручують донизу; наступна сторінка береться за курсором
+    (ключ сортування, id) останнього рядка, без OFFSET. Сортування (клік по
+    заголовку) і пошук виконуються в SQL, тож відкриття вкладки не залежить
+    від розміру історії.
+    """
+
+    PAGE_SIZE = 200
+
+    def __init__(self):
         super().__init__()
-        self._data = data or []
+        self._data: List[PaymentHistoryRow] = []
         self._headers = ["ID", "Назва підписки", "Сума (UAH)", "Дата оплати"]
+        self._sort_key = "pay_date"
+        self._descending = True
+        self._search = ""
+        self._exhausted = True
 
     def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
         if not index.isValid():
@@ -25,18 +38,16 @@ class PaymentHistoryModel(QAbstractTableModel):
             if column == 0:
                 return str(history_item.id)
             elif column == 1:
-                return history_item.subscription.name if history_item.subscription else "N/A"
+                return history_item.subscription_name or "N/A"
             elif column == 2:
                 return f"{history_item.final_sum:.2f}"
             elif column == 3:
                 return history_item.pay_date.strftime("%d.%m.%Y %H:%M")
         
-        # UserRole for sorting removed as requested to revert to default behavior
-        
         return None
 
     def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
-        return len(self._data)
+        return 0 if parent.isValid() else len(self._data)
 
     def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
         return len(self._headers)
@@ -46,31 +57,46 @@ class PaymentHistoryModel(QAbstractTableModel):
             return self._headers[section]
         return None
 
-    def refresh_data(self, new_data: List[PaymentHistory]):
+    # --- Ледаче довантаження ---
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        after = db.payment_history_cursor(self._data[-1], self._sort_key) if self._data else None
+        rows = db.get_payment_history_page(self.PAGE_SIZE, self._sort_key, self._descending, after, self._search)
+        self._exhausted = len(rows) < self.PAGE_SIZE
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self._data), len(self._data) + len(rows) - 1)
+            self._data.extend(rows)
+            self.endInsertRows()
+
+    # --- Сортування та пошук у SQL ---
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder):
+        self._sort_key = db.HISTORY_SORT_KEYS[column]
+        self._descending = order == Qt.SortOrder.DescendingOrder
+        self.reload()
+
+    def set_search(self, text: str):
+        self._search = text.strip()
+        self.reload()
+
+    def reload(self):
+        """Відкидає завантажені рядки та читає першу сторінку з поточними сортуванням і фільтром."""
         self.beginResetModel()
-        self._data = new_data
+        self._data = []
+        self._exhausted = False
         self.endResetModel()
-
-class HistoryFilterProxyModel(QSortFilterProxyModel):
-    """Кастомний фільтр для пошуку по всіх колонках."""
-    
-    def filterAcceptsRow(self, source_row, source_parent):
-        model = self.sourceModel()
-        regex = self.filterRegularExpression()
-        
-        # Перевіряємо всі колонки
-        for col in range(model.columnCount()):
-            index = model.index(source_row, col, source_parent)
-            data = model.data(index, Qt.ItemDataRole.DisplayRole)
-            
-            if data and regex.match(str(data)).hasMatch():
-                return True
-                
-        return False
+        self.fetchMore()
 
 class HistoryTab(QWidget):
     """Віджет для вкладки 'Історія'."""
 
+    SEARCH_DELAY_MS = 250 # Запит до БД після паузи у введенні, а не на кожну літеру
+
     def __init__(self):
         super().__init__()
         
@@ -83,30 +109,28 @@ class HistoryTab(QWidget):
         
         self.table_view = QTableView()
         self.table_model = PaymentHistoryModel()
-        
-        # Custom Proxy for filtering
-        self.proxy_model = HistoryFilterProxyModel()
-        self.proxy_model.setSourceModel(self.table_model)
-        self.proxy_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        
-        self.table_view.setModel(self.proxy_model)
+        self.table_view.setModel(self.table_model)
         
         # Table view settings
         self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.table_view.setSortingEnabled(True) # Standard Qt sorting (DisplayRole)
+        self.table_view.setSortingEnabled(True) # Клік по заголовку викликає PaymentHistoryModel.sort (SQL)
         
         table_layout.addWidget(self.search_edit)
         table_layout.addWidget(self.table_view)
         main_layout.addWidget(table_group)
         
-        self.search_edit.textChanged.connect(self.proxy_model.setFilterRegularExpression)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(lambda: self.table_model.set_search(self.search_edit.text()))
+        self.search_edit.textChanged.connect(self.search_timer.start)
         
-        self.load_history()
+        # Нові платежі першими; сортування завантажує першу сторінку
+        self.table_view.sortByColumn(3, Qt.SortOrder.DescendingOrder)
 
     def load_history(self):
-        """Завантажує історію з БД та оновлює таблицю."""
-        history = db.get_payment_history()
-        self.table_model.refresh_data(history)
+        """Перечитує історію з БД (лише першу сторінку)."""
+        self.table_model.reload()
 
     def refresh_data(self):
         """Public method to be called when tab is switched."""
@@ -1,4 +1,6 @@
 import re
+from datetime import date
+from dateutil.relativedelta import relativedelta
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableView, QPushButton,
                                QHeaderView, QAbstractItemView, QGroupBox, QListWidget, 
                                QListWidgetItem, QMessageBox, QLineEdit)
@@ -9,20 +11,44 @@ from src.database.db_manager import db
 from src.core.models import Subscription, Draft, PaymentType, PaymentHistory, SubscriptionState
 
 class SubscriptionFilterProxyModel(QSortFilterProxyModel):
-    """Кастомний фільтр для пошуку по всіх колонках, крім ID."""
-    
+    """
+    Фільтр пошуку: назва, категорія та період шукаються в FTS-індексі БД
+    (префікси слів, без урахування регістру й діакритики), тут лише
+    перевіряється id рядка. Запит з цифрами також шукається підрядком
+    у вартості та датах.
+    """
+
+    # Колонки з числами та датами, яких немає в FTS-індексі
+    NUMERIC_COLUMNS = (2, 5, 6)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._matched_ids = None  # None - фільтр вимкнено
+        self._numeric_text = ""
+
+    def set_search(self, text):
+        text = text.strip()
+        self._matched_ids = db.search_subscription_ids(text) if text else None
+        if text and self._matched_ids is None:
+            self._matched_ids = set()  # Запит без слів (лише цифри чи символи)
+        self._numeric_text = text if any(char.isdigit() for char in text) else ""
+        self.invalidateFilter()
+
     def filterAcceptsRow(self, source_row, source_parent):
+        if self._matched_ids is None:
+            return True
+
         model = self.sourceModel()
-        regex = self.filterRegularExpression()
-        
-        # Перевіряємо всі колонки, починаючи з 1 (пропускаємо ID)
-        for col in range(1, model.columnCount()):
-            index = model.index(source_row, col, source_parent)
-            data = model.data(index, Qt.ItemDataRole.DisplayRole)
-            
-            if data and regex.match(str(data)).hasMatch():
-                return True
-                
+        subscription = model.get_subscription(source_row)
+        if subscription and subscription.id in self._matched_ids:
+            return True
+
+        if self._numeric_text:
+            for col in self.NUMERIC_COLUMNS:
+                data = model.data(model.index(source_row, col, source_parent), Qt.ItemDataRole.DisplayRole)
+                if data and self._numeric_text in data:
+                    return True
+
         return False
 
 class ManagementTab(QWidget):
@@ -48,14 +74,14 @@ class ManagementTab(QWidget):
         # Proxy Model для фільтрації
         self.proxy_model = SubscriptionFilterProxyModel()
         self.proxy_model.setSourceModel(self.table_model)
-        self.proxy_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        # self.proxy_model.setFilterKeyColumn(1) - Не потрібно, логіка в класі
         
         self.table_view.setModel(self.proxy_model)
         
         # Налаштування вигляду таблиці
         self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        # Ctrl/Shift-виділення: видалення та оплата кількох підписок однією транзакцією
+        self.table_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.table_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         
         self.add_button = QPushButton("Додати підписку")
@@ -82,6 +108,7 @@ class ManagementTab(QWidget):
         self.search_drafts_edit.setPlaceholderText("Пошук чернетки...")
         
         self.drafts_list = QListWidget()
+        self.drafts_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.approve_button = QPushButton("Створити підписку")
         self.reject_button = QPushButton("Відхилити")
 
@@ -105,7 +132,7 @@ class ManagementTab(QWidget):
         self.approve_button.clicked.connect(self.approve_draft)
         self.reject_button.clicked.connect(self.reject_draft)
         
-        self.search_subs_edit.textChanged.connect(self.proxy_model.setFilterRegularExpression)
+        self.search_subs_edit.textChanged.connect(self.proxy_model.set_search)
         self.search_drafts_edit.textChanged.connect(self.filter_drafts)
         
         # --- Завантаження даних ---
@@ -121,6 +148,8 @@ class ManagementTab(QWidget):
         """Завантажує підписки з БД та оновлює таблицю."""
         subscriptions = db.get_all_subscriptions()
         self.table_model.refresh_data(subscriptions)
+        if self.search_subs_edit.text().strip():
+            self.proxy_model.set_search(self.search_subs_edit.text()) # Нові рядки теж мають пройти пошук
 
     def load_drafts(self):
         """Завантажує чернетки та оновлює список."""
@@ -134,12 +163,17 @@ class ManagementTab(QWidget):
             item = QListWidgetItem(item_text)
             item.setData(Qt.ItemDataRole.UserRole, draft.id)
             self.drafts_list.addItem(item)
+
+        if self.search_drafts_edit.text().strip():
+            self.filter_drafts(self.search_drafts_edit.text())
             
     def filter_drafts(self, text):
-        """Фільтрує список чернеток."""
+        """Фільтрує список чернеток за FTS-індексом назв."""
+        text = text.strip()
+        matched_ids = db.search_draft_ids(text) if text else None
         for i in range(self.drafts_list.count()):
             item = self.drafts_list.item(i)
-            item.setHidden(text.lower() not in item.text().lower())
+            item.setHidden(matched_ids is not None and item.data(Qt.ItemDataRole.UserRole) not in matched_ids)
 
     def add_subscription(self):
         dialog = SubscriptionDialog()
@@ -181,40 +215,52 @@ class ManagementTab(QWidget):
                     db.update_subscription(subscription_to_edit.id, update_dict)
                     self.load_subscriptions()
 
+    def selected_subscriptions(self):
+        """Виділені в таблиці підписки (у порядку відображення)."""
+        selected_rows = sorted(self.table_view.selectionModel().selectedRows(), key=lambda index: index.row())
+        subscriptions = []
+        for proxy_index in selected_rows:
+            # Конвертуємо індекс proxy model в індекс source model
+            source_index = self.proxy_model.mapToSource(proxy_index)
+            subscription = self.table_model.get_subscription(source_index.row())
+            if subscription:
+                subscriptions.append(subscription)
+        return subscriptions
+
+    def selected_draft_ids(self):
+        """id виділених (і не прихованих фільтром) чернеток."""
+        return [item.data(Qt.ItemDataRole.UserRole) for item in self.drafts_list.selectedItems() if not item.isHidden()]
+
     def delete_subscription(self):
-        selected_rows = self.table_view.selectionModel().selectedRows()
-        if not selected_rows:
+        subscriptions = self.selected_subscriptions()
+        if not subscriptions:
             QMessageBox.warning(self, "Помилка", "Будь ласка, оберіть підписку для видалення.")
             return
-            
-        # Отримуємо індекс з proxy model
-        proxy_index = selected_rows[0]
-        # Конвертуємо в індекс source model
-        source_index = self.proxy_model.mapToSource(proxy_index)
-        row_index = source_index.row()
-        
-        subscription_to_delete = self.table_model.get_subscription(row_index)
-        
-        if subscription_to_delete:
-            reply = QMessageBox.question(self, "Підтвердження",
-                                         f"Ви впевнені, що хочете видалити '{subscription_to_delete.name}'?",
-                                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-            if reply == QMessageBox.StandardButton.Yes:
-                db.delete_subscription(subscription_to_delete.id)
-                # Фідбек боту про видалення (без chat_id, так как подписка уже на ПК)
-                db.add_sync_event("subscription_deleted", {"name": subscription_to_delete.name})
-                self.load_subscriptions()
+
+        if len(subscriptions) == 1:
+            question = f"Ви впевнені, що хочете видалити '{subscriptions[0].name}'?"
+        else:
+            question = f"Ви впевнені, що хочете видалити {len(subscriptions)} підписок?"
+        reply = QMessageBox.question(self, "Підтвердження", question,
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.Yes:
+            # Одна транзакція разом з фідбеком боту про видалення
+            db.delete_subscriptions([subscription.id for subscription in subscriptions])
+            self.load_subscriptions()
     
     def approve_draft(self):
-        selected_item = self.drafts_list.currentItem()
-        if not selected_item:
+        draft_ids = self.selected_draft_ids()
+        if not draft_ids:
             QMessageBox.warning(self, "Помилка", "Будь ласка, оберіть чернетку для обробки.")
             return
-            
-        draft_id = selected_item.data(Qt.ItemDataRole.UserRole)
-        draft = db.get_draft_by_id(draft_id)
-        
-        if draft:
+
+        # Діалог для кожної чернетки; "Скасувати" пропускає лише її
+        approvals = []
+        for draft_id in draft_ids:
+            draft = db.get_draft_by_id(draft_id)
+            if not draft:
+                continue
+
             # 1. Очистка назви (Regex)
             clean_name = re.sub(r'^(Telegram|Заявка|Bot|Request)[:\s-]*', '', draft.raw_name, flags=re.IGNORECASE).strip()
             
@@ -234,72 +280,68 @@ class ManagementTab(QWidget):
             if dialog.exec():
                 new_sub = dialog.get_data()
                 if new_sub:
-                    sub_name = new_sub.name
-                    sub_cost = new_sub.cost_uah
-                    
-                    chat_id = db.approve_draft(draft_id, new_sub)
-                    
-                    db.add_sync_event("subscription_approved", {
-                        "original_draft": draft.raw_name,
-                        "new_name": sub_name,
-                        "cost_uah": sub_cost,
-                        "chat_id": chat_id
-                    })
-                    self.refresh_all_data()
+                    approvals.append((draft_id, new_sub))
+
+        if approvals:
+            # Підписки, статуси чернеток і фідбек авторам - одним комітом
+            db.approve_drafts(approvals)
+            self.refresh_all_data()
 
     def reject_draft(self):
-        selected_item = self.drafts_list.currentItem()
-        if not selected_item:
+        draft_ids = self.selected_draft_ids()
+        if not draft_ids:
             QMessageBox.warning(self, "Помилка", "Будь ласка, оберіть чернетку для відхилення.")
             return
 
-        draft_id = selected_item.data(Qt.ItemDataRole.UserRole)
-        reply = QMessageBox.question(self, "Підтвердження",
-                                     f"Ви впевнені, що хочете відхилити цю чернетку?",
+        if len(draft_ids) == 1:
+            question = "Ви впевнені, що хочете відхилити цю чернетку?"
+        else:
+            question = f"Ви впевнені, що хочете відхилити {len(draft_ids)} чернеток?"
+        reply = QMessageBox.question(self, "Підтвердження", question,
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         
         if reply == QMessageBox.StandardButton.Yes:
-            chat_id = db.reject_draft(draft_id)
-            db.add_sync_event("draft_rejected", {"draft_id": draft_id, "chat_id": chat_id})
+            db.reject_drafts(draft_ids)
             self.load_drafts()
 
     def mark_as_paid(self):
-        selected_rows = self.table_view.selectionModel().selectedRows()
-        if not selected_rows:
+        subscriptions = self.selected_subscriptions()
+        if not subscriptions:
             QMessageBox.warning(self, "Помилка", "Будь ласка, оберіть підписку для відзначення як сплаченої.")
             return
+
+        total = sum(subscription.cost_uah for subscription in subscriptions)
+        if len(subscriptions) == 1:
+            question = f"Підтвердити оплату для '{subscriptions[0].name}' (Сума: {total:.2f} UAH)?"
+        else:
+            question = f"Підтвердити оплату {len(subscriptions)} підписок (Сума: {total:.2f} UAH)?"
+        reply = QMessageBox.question(self, "Підтвердження платежу", question,
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.Yes:
+            new_last_payment = date.today()
+            payments = [
+                (subscription.id, new_last_payment, self.next_payment_after(new_last_payment, subscription.period),
+                 subscription.cost_uah)
+                for subscription in subscriptions
+            ]
+            db.mark_subscriptions_paid(payments)
+
+            if len(subscriptions) == 1:
+                message = f"Підписка '{subscriptions[0].name}' відзначена як сплачена."
+            else:
+                message = f"Відзначено як сплачені: {len(subscriptions)} підписок."
+            QMessageBox.information(self, "Успіх", message)
+            self.refresh_all_data()
+
+    @staticmethod
+    def next_payment_after(last_payment, period):
+        """Дата наступного платежу для періоду підписки."""
+        delta = None
+        if period == "Місяць":
+            delta = relativedelta(months=1)
+        elif period == "Квартал":
+            delta = relativedelta(months=3)
+        elif period == "Рік":
+            delta = relativedelta(years=1)
         
-        proxy_index = selected_rows[0]
-        source_index = self.proxy_model.mapToSource(proxy_index)
-        row_index = source_index.row()
-        
-        subscription_to_mark = self.table_model.get_subscription(row_index)
-        
-        if subscription_to_mark:
-            reply = QMessageBox.question(self, "Підтвердження платежу",
-                                         f"Підтвердити оплату для '{subscription_to_mark.name}' (Сума: {subscription_to_mark.cost_uah:.2f} UAH)?",
-                                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-            if reply == QMessageBox.StandardButton.Yes:
-                from datetime import date
-                from dateutil.relativedelta import relativedelta
-
-                new_last_payment = date.today()
-                
-                delta = None
-                if subscription_to_mark.period == "Місяць":
-                    delta = relativedelta(months=1)
-                elif subscription_to_mark.period == "Квартал":
-                    delta = relativedelta(months=3)
-                elif subscription_to_mark.period == "Рік":
-                    delta = relativedelta(years=1)
-                
-                new_next_payment = new_last_payment + delta if delta else new_last_payment
-
-                db.mark_subscription_paid(
-                    subscription_to_mark.id, 
-                    new_last_payment, 
-                    new_next_payment, 
-                    subscription_to_mark.cost_uah
-                )
-                QMessageBox.information(self, "Успіх", f"Підписка '{subscription_to_mark.name}' відзначена як сплачена.")
-                self.refresh_all_data()
+        return last_payment + delta if delta else last_payment
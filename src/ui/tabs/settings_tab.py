@@ -1,7 +1,8 @@
 import random
 import string
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QGroupBox, QLabel, 
-                               QPushButton, QHBoxLayout, QMessageBox, QApplication)
+                               QPushButton, QHBoxLayout, QMessageBox, QApplication,
+                               QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
 from PySide6.QtCore import Qt, QTimer, Signal
 from src.database.db_manager import db
 from src.core.models import SystemSettings
@@ -13,6 +14,7 @@ class SettingsTab(QWidget):
         super().__init__()
         self.init_ui()
         self.check_pairing_status()
+        self.load_dead_letters()
 
         # Timer to refresh status periodically
         self.timer = QTimer(self)
@@ -75,16 +77,51 @@ class SettingsTab(QWidget):
         bot_layout.addWidget(self.unlink_btn)
         
         layout.addWidget(bot_group)
+
+        # --- Група "Черга синхронізації" (dead letter) ---
+        queue_group = QGroupBox("Черга синхронізації: необроблені повідомлення")
+        queue_layout = QVBoxLayout(queue_group)
+
+        self.dead_letters_table = QTableWidget(0, 5)
+        self.dead_letters_table.setHorizontalHeaderLabels(["UUID", "Напрямок", "Подія", "Спроб", "Остання помилка"])
+        self.dead_letters_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.dead_letters_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.dead_letters_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+
+        self.refresh_dead_btn = QPushButton("🔄 Оновити")
+        self.refresh_dead_btn.clicked.connect(self.load_dead_letters)
+        self.replay_dead_btn = QPushButton("↩️ Повторити обрані")
+        self.replay_dead_btn.clicked.connect(self.replay_dead_letters)
+        self.delete_dead_btn = QPushButton("🗑 Видалити обрані")
+        self.delete_dead_btn.clicked.connect(self.delete_dead_letters)
+
+        dead_buttons_layout = QHBoxLayout()
+        dead_buttons_layout.addWidget(self.refresh_dead_btn)
+        dead_buttons_layout.addWidget(self.replay_dead_btn)
+        dead_buttons_layout.addWidget(self.delete_dead_btn)
+
+        queue_layout.addWidget(self.dead_letters_table)
+        queue_layout.addLayout(dead_buttons_layout)
+
+        layout.addWidget(queue_group)
         layout.addStretch()
 
     def generate_pairing_code(self):
         """Generates a 6-digit code and saves it to DB."""
-        code = ''.join(random.choices(string.digits, k=6))
-        
         with db.get_session() as session:
-            setting = session.query(SystemSettings).filter_by(setting_key="pairing_code").first()
+            # Бот визначає тенанта за кодом, тому код має бути унікальним серед усіх тенантів
+            while True:
+                code = ''.join(random.choices(string.digits, k=6))
+                taken = session.query(SystemSettings).filter(
+                    SystemSettings.setting_key.like("pairing_code%"),
+                    SystemSettings.setting_value == code
+                ).first()
+                if not taken:
+                    break
+
+            setting = session.query(SystemSettings).filter_by(setting_key=db.setting_key("pairing_code")).first()
             if not setting:
-                session.add(SystemSettings(setting_key="pairing_code", setting_value=code))
+                session.add(SystemSettings(setting_key=db.setting_key("pairing_code"), setting_value=code))
             else:
                 setting.setting_value = code
             session.commit()
@@ -106,7 +143,7 @@ class SettingsTab(QWidget):
     def check_pairing_status(self):
         """Checks if a chat_id is linked."""
         with db.get_session() as session:
-            linked_chat = session.query(SystemSettings).filter_by(setting_key="linked_chat_id").first()
+            linked_chat = session.query(SystemSettings).filter_by(setting_key=db.setting_key("linked_chat_id")).first()
             
             if linked_chat and linked_chat.setting_value:
                 self.status_label.setText(f"Статус: ✅ Підключено (Chat ID: {linked_chat.setting_value})")
@@ -126,9 +163,55 @@ class SettingsTab(QWidget):
         
         if reply == QMessageBox.StandardButton.Yes:
             with db.get_session() as session:
-                session.query(SystemSettings).filter_by(setting_key="linked_chat_id").delete()
+                session.query(SystemSettings).filter_by(setting_key=db.setting_key("linked_chat_id")).delete()
                 session.commit()
             
             self.check_pairing_status()
             self.generate_btn.setText("🔗 Згенерувати код підключення")
 
+    # --- Dead Letter ---
+
+    def load_dead_letters(self):
+        """Завантажує записи, які не вдалося обробити після всіх спроб."""
+        letters = db.get_dead_letters()
+        self.dead_letters_table.setRowCount(len(letters))
+
+        for row, letter in enumerate(letters):
+            # Для перегляду розшифровуємо лише назву події
+            try:
+                event = db.keys.decrypt_message(letter).get("event") or "draft"
+            except Exception:
+                event = "(не розшифровано)"
+
+            uuid_item = QTableWidgetItem(letter.uuid[:8])
+            uuid_item.setData(Qt.ItemDataRole.UserRole, letter.uuid)
+            self.dead_letters_table.setItem(row, 0, uuid_item)
+            self.dead_letters_table.setItem(row, 1, QTableWidgetItem(letter.direction.value))
+            self.dead_letters_table.setItem(row, 2, QTableWidgetItem(event))
+            self.dead_letters_table.setItem(row, 3, QTableWidgetItem(str(letter.attempts)))
+            self.dead_letters_table.setItem(row, 4, QTableWidgetItem(letter.last_error or ""))
+
+    def _selected_dead_letter_uuids(self):
+        rows = self.dead_letters_table.selectionModel().selectedRows()
+        return [self.dead_letters_table.item(index.row(), 0).data(Qt.ItemDataRole.UserRole) for index in rows]
+
+    def replay_dead_letters(self):
+        uuids = self._selected_dead_letter_uuids()
+        if not uuids:
+            QMessageBox.warning(self, "Помилка", "Будь ласка, оберіть повідомлення для повтору.")
+            return
+        count = db.replay_dead_letters(uuids)
+        QMessageBox.information(self, "Успіх", f"Повернуто в чергу: {count}.")
+        self.load_dead_letters()
+
+    def delete_dead_letters(self):
+        uuids = self._selected_dead_letter_uuids()
+        if not uuids:
+            QMessageBox.warning(self, "Помилка", "Будь ласка, оберіть повідомлення для видалення.")
+            return
+        reply = QMessageBox.question(self, "Підтвердження",
+                                     f"Видалити обрані повідомлення ({len(uuids)})?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.Yes:
+            db.delete_dead_letters(uuids)
+            self.load_dead_letters()
@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+# Тести імпортують модулі як `src.*` з кореня проекту
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+# Глобальний `db` створюється при імпорті db_manager: він має жити в тимчасовій базі,
+# а не в src/server/sub_manager.sqlite
+os.environ["DB_NAME"] = os.path.join(tempfile.mkdtemp(prefix="sub_manager_tests_"), "global.sqlite")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+
+@pytest.fixture
+def db(tmp_path):
+    """Окремий DBManager на новій базі для кожного тесту."""
+    from src.database.db_manager import DBManager
+    manager = DBManager(db_path=str(tmp_path / "test.sqlite"))
+    yield manager
+    manager.engine.dispose()
@@ -0,0 +1,67 @@
+"""
+Локальний фейковий Bot API сервер для тестів бота.
+
+Приймає запити у форматі https://api.telegram.org/bot<token>/<method> (aiogram
+з `TelegramAPIServer.from_base(server.url)`), записує надіслані повідомлення
+і може відповідати помилками Telegram за сценарієм для конкретного чату.
+"""
+import itertools
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Tuple
+from aiohttp import web
+
+class FakeBotAPI:
+    def __init__(self):
+        self.sent: List[Tuple[int, str]] = []  # (chat_id, text) у порядку отримання
+        self.calls: List[Tuple[str, dict]] = []  # (метод, параметри) усіх запитів
+        self._failures: Dict[int, Deque[dict]] = defaultdict(deque)
+        self._message_ids = itertools.count(1)
+        self._runner = None
+        self.url = ""
+
+    def fail_next(self, chat_id: int, error_code: int, description: str = "", retry_after: int = None):
+        """Наступний sendMessage у цей чат отримає помилку (429 з retry_after, 403, 400...)."""
+        failure = {"ok": False, "error_code": error_code, "description": description or f"Error {error_code}"}
+        if retry_after is not None:
+            failure["parameters"] = {"retry_after": retry_after}
+        self._failures[chat_id].append(failure)
+
+    def texts(self, chat_id: int) -> List[str]:
+        return [text for sent_chat_id, text in self.sent if sent_chat_id == chat_id]
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls.append((method, params))
+
+        if method.lower() != "sendmessage":
+            return web.json_response({"ok": True, "result": True})
+
+        chat_id = int(params["chat_id"])
+        failures = self._failures.get(chat_id)
+        if failures:
+            failure = failures.popleft()
+            return web.json_response(failure, status=failure["error_code"])
+
+        self.sent.append((chat_id, params["text"]))
+        return web.json_response({"ok": True, "result": {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params["text"],
+        }})
@@ -0,0 +1,56 @@
+import pytest
+from src.bot.add_parser import MAX_NAME_LENGTH, normalize_currency, parse_add_command, parse_amount, validate_name
+
+def test_validate_name_strips_text():
+    assert validate_name("  Netflix  ") == "Netflix"
+
+@pytest.mark.parametrize("value", [None, "", "   \n"])
+def test_validate_name_rejects_missing_text(value):
+    # None - стікер, фото тощо без тексту
+    with pytest.raises(ValueError, match="не вказано назву"):
+        validate_name(value)
+
+def test_validate_name_rejects_too_long():
+    assert validate_name("x" * MAX_NAME_LENGTH) == "x" * MAX_NAME_LENGTH
+    with pytest.raises(ValueError, match=str(MAX_NAME_LENGTH)):
+        validate_name("x" * (MAX_NAME_LENGTH + 1))
+
+@pytest.mark.parametrize("args, expected", [
+    ("Netflix 12.99 USD", ("Netflix", 12.99, "USD")),
+    ("YouTube Premium 99,00 грн", ("YouTube Premium", 99.0, "UAH")),
+    ("Spotify $4.99", ("Spotify", 4.99, "USD")),
+    ("Disney+ 7€", ("Disney+", 7.0, "EUR")),
+    ("Apple Music 5 eur", ("Apple Music", 5.0, "EUR")),
+    ("Netflix", ("Netflix", None, None)),
+    ("Netflix 12.99", ("Netflix", 12.99, None)),
+])
+def test_parse_add_command(args, expected):
+    parsed = parse_add_command(args)
+    assert (parsed.name, parsed.amount, parsed.currency) == expected
+    assert parsed.complete == all(value is not None for value in expected)
+
+@pytest.mark.parametrize("args", [None, "", "   "])
+def test_parse_add_command_without_arguments(args):
+    parsed = parse_add_command(args)
+    assert (parsed.name, parsed.amount, parsed.currency) == (None, None, None)
+
+def test_parse_add_command_keeps_conflicting_currency_in_name():
+    # "$5 EUR": дві різні валюти - "$5" лишається частиною назви
+    parsed = parse_add_command("Gift $5 EUR")
+    assert (parsed.name, parsed.amount, parsed.currency) == ("Gift $5", None, "EUR")
+
+def test_parse_add_command_name_is_only_a_number():
+    assert parse_add_command("1984").name == "1984"
+
+@pytest.mark.parametrize("value, expected", [
+    ("USD", "USD"), (" грн. ", "UAH"), ("₴", "UAH"), ("Євро", "EUR"), ("GBP", None), ("", None),
+])
+def test_normalize_currency(value, expected):
+    assert normalize_currency(value) == expected
+
+@pytest.mark.parametrize("value, expected", [
+    ("12.99", 12.99), ("12,99", 12.99), ("1 299,5", 1299.5), ("9.999", 10.0),
+    ("0", None), ("-5", None), ("abc", None), ("inf", None), ("nan", None),
+])
+def test_parse_amount(value, expected):
+    assert parse_amount(value) == expected
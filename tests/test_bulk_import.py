@@ -0,0 +1,81 @@
+import io
+import json
+import pytest
+from src.bot.bulk_import import (MAX_REPORTED_ERRORS, ImportFileError, chunked, detect_format,
+                                 iter_json_records, parse_import, validate_record)
+
+def stream(text: str) -> io.BytesIO:
+    return io.BytesIO(text.encode("utf-8"))
+
+@pytest.mark.parametrize("file_name, mime_type, expected", [
+    ("subs.CSV", None, "csv"), (None, "text/csv", "csv"), ("subs.json", None, "json"),
+    ("subs.jsonl", None, "json"), ("subs.xlsx", "application/vnd.ms-excel", None),
+])
+def test_detect_format(file_name, mime_type, expected):
+    assert detect_format(file_name, mime_type) == expected
+
+def test_validate_record_normalizes_fields():
+    assert validate_record({" Назва ": " Netflix ", "Cost": "12,99", "Валюта": "$"}) == \
+        {"raw_name": "Netflix", "amount": 12.99, "currency": "USD"}
+    assert validate_record({"name": "Spotify", "amount": 5})["currency"] == "UAH"  # Валюта за замовчуванням
+
+@pytest.mark.parametrize("record, reason", [
+    ([1, 2], "очікується об'єкт"),
+    ({"amount": 5}, "не вказано назву"),
+    ({"name": "Netflix"}, "не вказано вартість"),
+    ({"name": "Netflix", "amount": "-1"}, "некоректна вартість"),
+    ({"name": "Netflix", "amount": 5, "currency": "GBP"}, "непідтримувана валюта"),
+])
+def test_validate_record_rejects(record, reason):
+    with pytest.raises(ValueError, match=reason):
+        validate_record(record)
+
+def test_csv_with_semicolons_and_bom():
+    data = "\ufeffname;amount;currency\nNetflix;12,99;USD\n;;\nBroken;x;UAH\nYouTube;99;грн\n"
+    result = parse_import(stream(data), "csv", max_rows=100)
+    assert [row["raw_name"] for row in result.rows] == ["Netflix", "YouTube"]
+    assert result.errors == [(4, "некоректна вартість: 'x'")]  # Номер рядка файлу; порожній рядок пропущено
+    assert not result.truncated
+
+def test_csv_without_header():
+    with pytest.raises(ImportFileError):
+        parse_import(stream("\n"), "csv", max_rows=100)
+
+def test_json_array_and_lines_give_the_same_rows():
+    items = [{"name": "Netflix", "amount": 12.99, "currency": "USD"}, {"name": "Spotify", "amount": "4,99"}]
+    as_array = parse_import(stream(json.dumps(items, ensure_ascii=False)), "json", max_rows=100)
+    as_lines = parse_import(stream("\n".join(json.dumps(item) for item in items)), "json", max_rows=100)
+    assert as_array.rows == as_lines.rows == [
+        {"raw_name": "Netflix", "amount": 12.99, "currency": "USD"},
+        {"raw_name": "Spotify", "amount": 4.99, "currency": "UAH"},
+    ]
+
+def test_json_is_decoded_incrementally():
+    items = [{"name": f"Підписка {index}", "amount": index + 1} for index in range(50)]
+    records = list(iter_json_records(stream(json.dumps(items, ensure_ascii=False)), chunk_size=7))
+    assert [number for number, _ in records] == list(range(1, 51))
+    assert records[-1][1] == items[-1]
+
+@pytest.mark.parametrize("data, reason", [
+    ('[{"name": "Netflix", "amount": 1}', "не закрито"),
+    ('{"name": "Netflix", "amount": ', "некоректний JSON"),
+    ('"just a string"', "масив об'єктів"),
+])
+def test_json_broken_files(data, reason):
+    with pytest.raises(ImportFileError, match=reason):
+        parse_import(stream(data), "json", max_rows=100)
+
+def test_json_not_utf8():
+    with pytest.raises(ImportFileError, match="UTF-8"):
+        parse_import(io.BytesIO('[{"name": "Ї"}]'.encode("cp1251")), "json", max_rows=100)
+
+def test_max_rows_and_error_report_limits():
+    items = [{"name": "", "amount": 1}] * (MAX_REPORTED_ERRORS + 5) + [{"name": "Ok", "amount": 1}] * 3
+    result = parse_import(stream(json.dumps(items)), "json", max_rows=2)
+    assert len(result.rows) == 2 and result.truncated
+    assert result.error_count == MAX_REPORTED_ERRORS + 5
+    assert len(result.errors) == MAX_REPORTED_ERRORS
+
+def test_chunked():
+    assert chunked(list(range(5)), 2) == [[0, 1], [2, 3], [4]]
+    assert chunked([], 2) == []
@@ -0,0 +1,137 @@
+from datetime import date
+import pytest
+from sqlalchemy import func, select
+from src.core.models import (Draft, DraftStatus, PaymentHistory, Subscription, SubscriptionSnapshot, SubscriptionState,
+                             SyncDirection, SyncQueue)
+from src.database.db_manager import DBManager
+
+@pytest.fixture
+def other(db):
+    """Інший тенант у тій самій базі: його рядки для `db` не існують."""
+    manager = DBManager(db_path=db.db_path, tenant_id="other")
+    yield manager
+    manager.engine.dispose()
+
+def add_subscription(manager: DBManager, name: str) -> int:
+    subscription = Subscription(
+        name=name, cost_uah=100.0, category_id=manager.get_all_categories()[0].id, period="Місяць",
+        last_payment=date(2026, 1, 1), next_payment=date(2026, 2, 1), state=SubscriptionState.OVERDUE
+    )
+    manager.add_subscription(subscription)
+    return next(row.id for row in manager.get_all_subscriptions() if row.name == name)
+
+def add_draft(manager: DBManager, raw_name: str, chat_id: int = 1) -> int:
+    with manager.get_session() as session:
+        draft = Draft(raw_name=raw_name, amount=5.0, currency="USD", chat_id=chat_id, tenant_id=manager.tenant_id)
+        session.add(draft)
+        session.commit()
+        return draft.id
+
+def snapshot_revision(manager: DBManager) -> int:
+    with manager.get_session() as session:
+        return session.get(SubscriptionSnapshot, manager.tenant_id).revision
+
+def latest_revision(manager: DBManager) -> int:
+    """Ревізії знімків глобальні: кожна публікація будь-якого тенанта бере наступний номер."""
+    with manager.get_session() as session:
+        return session.query(func.max(SubscriptionSnapshot.revision)).scalar()
+
+def queued(manager: DBManager) -> list:
+    """(подія, дані) черги до бота цього тенанта у порядку постановки."""
+    with manager.get_session() as session:
+        rows = session.scalars(
+            select(SyncQueue).where(SyncQueue.direction == SyncDirection.TO_BOT, SyncQueue.tenant_id == manager.tenant_id)
+            .order_by(SyncQueue.timestamp)
+        ).all()
+        return [(message["event"], message["data"]) for message in map(manager.keys.decrypt_message, rows)]
+
+def draft_statuses(manager: DBManager) -> dict:
+    with manager.get_session() as session:
+        return dict(session.execute(select(Draft.id, Draft.status)).all())
+
+def new_subscription(name: str, category_id: int) -> Subscription:
+    return Subscription(name=name, cost_uah=50.0, category_id=category_id, period="Місяць",
+                        last_payment=date(2026, 3, 1), next_payment=date(2026, 4, 1))
+
+def test_mark_subscriptions_paid(db, other):
+    first, second = add_subscription(db, "Netflix"), add_subscription(db, "Spotify")
+    foreign = add_subscription(other, "YouTube")
+    revision = latest_revision(db)
+
+    paid = db.mark_subscriptions_paid([
+        (first, date(2026, 2, 1), date(2026, 3, 1), 100.0),
+        (second, date(2026, 2, 2), date(2026, 3, 2), 50.0),
+        (foreign, date(2026, 2, 3), date(2026, 3, 3), 10.0),
+    ])
+    assert paid == 2
+    rows = {row.id: row for row in db.get_all_subscriptions()}
+    assert rows[first].next_payment == date(2026, 3, 1) and rows[second].last_payment == date(2026, 2, 2)
+    assert {row.state for row in rows.values()} == {SubscriptionState.ACTIVE}
+    assert sorted((row.sub_id, row.final_sum) for row in db.get_payment_history()) == [(first, 100.0), (second, 50.0)]
+    assert snapshot_revision(db) == latest_revision(db) == revision + 1  # Один знімок на весь виклик
+
+    # Чужа підписка не змінилась і не потрапила в історію жодного тенанта
+    assert other.get_all_subscriptions()[0].state == SubscriptionState.OVERDUE
+    assert other.get_payment_history() == []
+    with db.get_session() as session:
+        assert session.query(PaymentHistory).count() == 2
+    assert db.mark_subscriptions_paid([(foreign, date(2026, 2, 3), date(2026, 3, 3), 10.0)]) == 0
+
+def test_delete_subscriptions(db, other):
+    first, second, kept = (add_subscription(db, name) for name in ("Netflix", "Spotify", "Megogo"))
+    foreign = add_subscription(other, "YouTube")
+    db.mark_subscriptions_paid([(first, date(2026, 2, 1), date(2026, 3, 1), 100.0)])
+    revision = latest_revision(db)
+
+    assert db.delete_subscriptions([first, second, foreign]) == 2
+    assert [row.id for row in db.get_all_subscriptions()] == [kept]
+    assert [row.name for row in other.get_all_subscriptions()] == ["YouTube"]
+    assert snapshot_revision(db) == latest_revision(db) == revision + 1
+    assert queued(db) == [("subscription_deleted", {"name": "Netflix"}), ("subscription_deleted", {"name": "Spotify"})]
+    assert queued(other) == []
+    # Історія лишається, а назва видаленої підписки стає порожньою
+    assert [(row.sub_id, row.subscription_name) for row in db.get_payment_history()] == [(first, None)]
+
+def test_approve_drafts(db, other):
+    category_id = db.get_all_categories()[0].id
+    first, second = add_draft(db, "Нетфлікс", chat_id=10), add_draft(db, "Спотіфай", chat_id=20)
+    processed = add_draft(db, "Оброблена")
+    db.reject_drafts([processed])
+    foreign = add_draft(other, "Чужа")
+    revision = latest_revision(db)
+
+    approved = db.approve_drafts([
+        (first, new_subscription("Netflix", category_id)),
+        (second, new_subscription("Spotify", category_id)),
+        (processed, new_subscription("Processed", category_id)),
+        (foreign, new_subscription("Foreign", category_id)),
+    ])
+    assert approved == 2
+    assert sorted(row.name for row in db.get_all_subscriptions()) == ["Netflix", "Spotify"]
+    assert other.get_all_subscriptions() == []
+    statuses = draft_statuses(db)
+    assert statuses[first] == statuses[second] == DraftStatus.PROCESSED
+    assert statuses[foreign] == DraftStatus.NEW
+    assert snapshot_revision(db) == latest_revision(db) == revision + 1
+    assert queued(db)[-2:] == [
+        ("subscription_approved", {"original_draft": "Нетфлікс", "new_name": "Netflix", "cost_uah": 50.0, "chat_id": 10}),
+        ("subscription_approved", {"original_draft": "Спотіфай", "new_name": "Spotify", "cost_uah": 50.0, "chat_id": 20}),
+    ]
+    assert queued(other) == []
+
+def test_reject_drafts(db, other):
+    first, second = add_draft(db, "Нетфлікс", chat_id=10), add_draft(db, "Спотіфай", chat_id=20)
+    foreign = add_draft(other, "Чужа")
+    revision = latest_revision(db)
+
+    assert db.reject_drafts([first, second, foreign]) == 2
+    assert db.reject_drafts([first]) == 0  # Вже оброблена
+    statuses = draft_statuses(db)
+    assert statuses[first] == statuses[second] == DraftStatus.PROCESSED
+    assert statuses[foreign] == DraftStatus.NEW
+    assert queued(db) == [
+        ("draft_rejected", {"draft_id": first, "chat_id": 10}),
+        ("draft_rejected", {"draft_id": second, "chat_id": 20}),
+    ]
+    assert queued(other) == []
+    assert latest_revision(db) == revision  # Підписки не змінювались - знімок не публікується
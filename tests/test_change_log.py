@@ -0,0 +1,55 @@
+from datetime import date
+from src.core.change_tracker import ChangeTracker
+from src.core.models import Subscription
+
+def add_subscription(db, name: str) -> int:
+    db.add_subscription(Subscription(
+        name=name, cost_uah=100.0, category_id=db.get_all_categories()[0].id, period="Місяць",
+        last_payment=date(2026, 1, 1), next_payment=date(2026, 2, 1)
+    ))
+    return next(row.id for row in db.get_all_subscriptions() if row.name == name)
+
+def test_get_changes_lists_changed_rows_per_table(db):
+    revision = db.get_revision()
+    assert db.get_changes(revision) == (revision, {}, False)
+
+    sub_id = add_subscription(db, "Netflix")
+    db.mark_subscription_paid(sub_id, date(2026, 2, 1), date(2026, 3, 1), 100.0)
+    changes = db.get_changes(revision)
+    assert changes.revision == db.get_revision() > revision
+    assert changes.tables["subscriptions"] == {sub_id}
+    assert len(changes.tables["payment_history"]) == 1
+    assert not changes.truncated
+    assert db.get_changes(changes.revision).tables == {}
+
+def test_pruned_log_reports_truncation(db):
+    start = db.get_revision()
+    for name in ("Netflix", "Spotify", "Megogo"):
+        add_subscription(db, name)
+    latest = db.get_revision()
+
+    assert db.prune_change_log(keep=2) == latest - 2
+    assert db.prune_change_log(keep=2) == 0
+    assert db.get_changes(start).truncated  # Частину змін після `start` уже не видно
+    assert not db.get_changes(latest - 2).truncated
+    assert db.get_changes(latest) == (latest, {}, False)
+
+def test_change_tracker_polls_only_its_tables(db):
+    subscriptions = ChangeTracker(db, ("subscriptions",))
+    history = ChangeTracker(db, ("payment_history",))
+    assert not subscriptions.poll() and not history.poll()
+
+    sub_id = add_subscription(db, "Netflix")
+    assert subscriptions.poll() and not history.poll()
+    assert not subscriptions.poll()  # Ревізія запам'ятовується між викликами
+
+    db.mark_subscription_paid(sub_id, date(2026, 2, 1), date(2026, 3, 1), 100.0)
+    assert history.poll()
+
+    db.update_subscription(sub_id, {"name": "Netflix HD"})
+    add_subscription(db, "Spotify")
+    db.prune_change_log(keep=1)
+    # Журнал обрізано: історію ніхто не змінював, але пропущених записів уже не перевірити
+    assert history.poll()
+    assert subscriptions.poll()
+    assert not history.poll()
@@ -0,0 +1,10 @@
+from src.bot.feedback import render_feedback
+
+def test_user_values_are_escaped():
+    text = render_feedback("subscription_approved", {
+        "original_draft": "<b>Кіно & ТБ</b>", "new_name": "A<i>", "cost_uah": 10.0
+    })
+    assert "&lt;b&gt;Кіно &amp; ТБ&lt;/b&gt;" in text and "A&lt;i&gt;" in text
+    assert "<b>" in text  # Власна розмітка повідомлення лишається
+    for event in ("draft_received", "payment_reminder"):
+        assert "&lt;script&gt;" in render_feedback(event, {"name": "<script>", "draft_id": 1})
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from src.bot import fsm_storage
+from src.bot.async_db import AsyncDB
+from src.bot.fsm_storage import SQLiteStorage
+from src.core.models import BotFSMState
+
+class Clock:
+    """Керований time.monotonic для перевірки TTL без очікування."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def adb(db):
+    adb = AsyncDB(db)
+    yield adb
+    adb.shutdown()
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fsm_storage.time, "monotonic", clock)
+    return clock
+
+def key(chat_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=chat_id, user_id=chat_id)
+
+def stored_keys(db) -> list:
+    with db.get_session() as session:
+        return [row.storage_key for row in session.query(BotFSMState)]
+
+def count_loads(adb, monkeypatch) -> list:
+    loads = []
+    fsm_load = adb.fsm_load
+
+    async def counting_load(storage_key):
+        loads.append(storage_key)
+        return await fsm_load(storage_key)
+
+    monkeypatch.setattr(adb, "fsm_load", counting_load)
+    return loads
+
+def test_no_state_is_cached_in_bounded_lru(adb, monkeypatch):
+    loads = count_loads(adb, monkeypatch)
+    storage = SQLiteStorage(adb, cache_size=2)
+
+    async def scenario():
+        for chat_id in (1, 1, 2, 1, 3, 1, 2):
+            assert await storage.get_state(key(chat_id)) is None
+
+    asyncio.run(scenario())
+    # 1 лишається свіжим; 2 витіснено третім чатом і прочитано знову
+    assert [storage_key.split(":")[1] for storage_key in loads] == ["1", "2", "3", "2"]
+    assert len(storage._cache) == 2
+
+def test_conversation_expires_after_ttl(db, adb, clock):
+    storage = SQLiteStorage(adb, ttl=60, purge_interval=3600)
+
+    async def scenario():
+        await storage.set_state(key(1), "AddSub:amount")
+        await storage.set_data(key(1), {"name": "Netflix"})
+        clock.now += 30
+        assert await storage.get_state(key(1)) == "AddSub:amount"
+        clock.now += 31
+        with db.get_session() as session:  # Для таблиці час теж минув
+            session.get(BotFSMState, storage._key(key(1))).updated_at -= timedelta(seconds=61)
+            session.commit()
+        assert await storage.get_state(key(1)) is None  # Кешований запис застарів
+        assert await storage.get_data(key(1)) == {}
+
+    asyncio.run(scenario())
+
+def test_stale_rows_are_ignored_and_purged(db, adb, clock):
+    async def scenario():
+        storage = SQLiteStorage(adb, ttl=60, purge_interval=3600)
+        await storage.set_state(key(1), "AddSub:amount")
+        await storage.set_state(key(2), "AddSub:name")
+        with db.get_session() as session:
+            session.get(BotFSMState, storage._key(key(1))).updated_at = datetime.utcnow() - timedelta(seconds=120)
+            session.commit()
+
+        restarted = SQLiteStorage(adb, ttl=60, purge_interval=3600)  # Новий процес: кеш порожній
+        assert await restarted.get_state(key(1)) is None
+        assert await restarted.get_state(key(2)) == "AddSub:name"
+        await restarted.set_data(key(3), {"name": "Spotify"})  # Перший запис запускає очищення
+        return restarted
+
+    restarted = asyncio.run(scenario())
+    assert sorted(stored_keys(db)) == sorted(restarted._key(key(chat_id)) for chat_id in (2, 3))
+
+def test_finished_conversation_is_deleted(db, adb):
+    storage = SQLiteStorage(adb)
+
+    async def scenario():
+        await storage.set_state(key(1), "AddSub:amount")
+        await storage.set_data(key(1), {"name": "Netflix"})
+        assert stored_keys(db) == [storage._key(key(1))]
+        await storage.set_data(key(1), {})
+        await storage.set_state(key(1), None)  # state.clear()
+        assert stored_keys(db) == []
+        assert await storage.get_state(key(1)) is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,106 @@
+import sqlite3
+from datetime import date
+from sqlalchemy import text
+from src.core.models import Subscription, SyncQueue
+from src.core.security import SecurityManager
+from src.database.db_manager import DBManager
+from src.database.migrations import LATEST_VERSION, MIGRATIONS, run_migrations
+
+# Схема до першої міграції (PRAGMA user_version = 0), як її створював create_all початкової версії
+BASELINE_SCHEMA = """
+CREATE TABLE categories (id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, icon_id VARCHAR(50) NOT NULL, PRIMARY KEY (id));
+CREATE TABLE currencies (id INTEGER NOT NULL, code VARCHAR(3) NOT NULL, manual_rate FLOAT NOT NULL,
+    is_base BOOLEAN NOT NULL, PRIMARY KEY (id), UNIQUE (code));
+CREATE TABLE drafts (id INTEGER NOT NULL, raw_name VARCHAR(255) NOT NULL, amount FLOAT NOT NULL,
+    currency VARCHAR(3) NOT NULL, created_at DATETIME NOT NULL, status VARCHAR(9) NOT NULL, chat_id INTEGER, PRIMARY KEY (id));
+CREATE TABLE sync_queue (uuid VARCHAR(36) NOT NULL, payload TEXT NOT NULL, direction VARCHAR(8) NOT NULL,
+    timestamp DATETIME NOT NULL, PRIMARY KEY (uuid));
+CREATE TABLE system_settings (setting_key VARCHAR(100) NOT NULL, setting_value TEXT NOT NULL, PRIMARY KEY (setting_key));
+CREATE TABLE subscriptions (id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, cost_uah FLOAT NOT NULL,
+    category_id INTEGER NOT NULL, period VARCHAR(50) NOT NULL, last_payment DATE NOT NULL, next_payment DATE NOT NULL,
+    payment_type VARCHAR(6) NOT NULL, state VARCHAR(11) NOT NULL, is_reminder_sent BOOLEAN NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(category_id) REFERENCES categories (id));
+CREATE TABLE payment_history (id INTEGER NOT NULL, sub_id INTEGER NOT NULL, final_sum FLOAT NOT NULL,
+    pay_date DATETIME NOT NULL, PRIMARY KEY (id), FOREIGN KEY(sub_id) REFERENCES subscriptions (id));
+"""
+
+def create_baseline_db(path: str, key: str, legacy_token: str):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO categories (id, name, icon_id) VALUES (1, 'Їжа', 'other')")
+    conn.execute(
+        "INSERT INTO subscriptions VALUES (1, 'Мої фільми', 199, 1, 'Місяць', '2026-01-01', '2026-02-01', "
+        "'AUTO', 'ACTIVE', 0)"
+    )
+    conn.execute("INSERT INTO payment_history VALUES (1, 1, 199, '2026-01-01 10:00:00')")
+    conn.execute("INSERT INTO drafts VALUES (1, 'Йога', 10, 'USD', '2026-01-02 10:00:00', 'NEW', 42)")
+    conn.execute("INSERT INTO system_settings VALUES ('enc_key', ?)", (key,))
+    conn.execute("INSERT INTO sync_queue VALUES ('legacy-1', ?, 'TO_BOT', '2026-01-03 10:00:00')", (legacy_token,))
+    conn.commit()
+    conn.close()
+
+def columns(manager: DBManager, table: str) -> set:
+    with manager.engine.connect() as conn:
+        return {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+
+def schema_names(manager: DBManager, kind: str) -> set:
+    with manager.engine.connect() as conn:
+        return set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = :kind"), {"kind": kind}).scalars())
+
+def test_upgrade_from_baseline_schema(tmp_path):
+    key = SecurityManager.generate_new_key()
+    legacy_event = {"event": "payment_reminder", "data": {"name": "Мої фільми"}}
+    path = str(tmp_path / "baseline.sqlite")
+    create_baseline_db(path, key, SecurityManager(key).encrypt_data(legacy_event))
+
+    manager = DBManager(db_path=path)
+    try:
+        with manager.engine.connect() as conn:
+            assert conn.execute(text("PRAGMA user_version")).scalar() == LATEST_VERSION
+
+        assert {"attempts", "next_attempt_at", "last_error", "payload_blob", "coalesce_key",
+                "expires_at", "tenant_id"} <= columns(manager, "sync_queue")
+        for table in ("subscriptions", "categories", "payment_history", "drafts"):
+            assert "tenant_id" in columns(manager, table)
+        assert {"sync_dead_letter", "settings_revision", "change_log", "subscriptions_fts", "drafts_fts"} <= \
+            schema_names(manager, "table")
+        assert {"trg_subscriptions_insert_fts", "trg_drafts_insert_fts", "trg_system_settings_update_revision",
+                "trg_subscriptions_update_change_log"} <= schema_names(manager, "trigger")
+        assert {"ix_sync_queue_direction_tenant_timestamp", "ix_payment_history_tenant_pay_date_id"} <= \
+            schema_names(manager, "index")
+
+        # Старі дані належать тенанту за замовчуванням і потрапили в нові індекси
+        assert [row.name for row in manager.get_all_subscriptions()] == ["Мої фільми"]
+        assert [row.name for row in manager.get_all_categories()] == ["Їжа"]  # Базові категорії не додаються
+        assert [row.sub_id for row in manager.get_payment_history()] == [1]
+        assert manager.search_subscription_ids("мої філ") == {1}
+        assert manager.search_subscription_ids("іжа") == {1}
+        assert manager.search_draft_ids("иога") == {1}
+
+        with manager.get_session() as session:
+            legacy = session.get(SyncQueue, "legacy-1")
+            assert legacy.payload_blob is None and legacy.attempts == 0
+            assert manager.keys.decrypt_message(legacy) == legacy_event
+    finally:
+        manager.engine.dispose()
+
+def test_migrations_are_idempotent(db):
+    db.add_subscription(Subscription(
+        name="Netflix", cost_uah=100.0, category_id=db.get_all_categories()[0].id, period="Місяць",
+        last_payment=date(2026, 1, 1), next_payment=date(2026, 2, 1)
+    ))
+    with db.engine.connect() as conn:
+        fts_rows = conn.execute(text("SELECT count(*) FROM subscriptions_fts")).scalar()
+        # Перерваний запуск: кроки після записаної версії виконуються повторно
+        conn.execute(text("PRAGMA user_version = 3"))
+        conn.commit()
+    assert run_migrations(db.engine) == LATEST_VERSION
+
+    with db.engine.connect() as conn:
+        for _, _, upgrade in MIGRATIONS:
+            upgrade(conn)
+        conn.commit()
+        assert conn.execute(text("SELECT count(*) FROM subscriptions_fts")).scalar() == fts_rows == 1
+
+def test_migration_versions_are_sequential():
+    assert [version for version, _, _ in MIGRATIONS] == list(range(1, LATEST_VERSION + 1))
@@ -0,0 +1,130 @@
+import asyncio
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from src.bot.outbound import OutboundSender
+from tests.fake_bot_api import FakeBotAPI
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not reached in time")
+        await asyncio.sleep(0.01)
+
+class Harness:
+    """OutboundSender, що надсилає через справжній aiogram Bot у FakeBotAPI."""
+
+    def __init__(self, **sender_options):
+        self.api = FakeBotAPI()
+        self.delivered, self.failed = [], []
+        self.sender_options = dict(global_rate=1000, per_chat_rate=1000, per_chat_burst=100, **sender_options)
+        self.on_delivered = self._record_delivered
+
+    async def _record_delivered(self, acks):
+        self.delivered.extend(acks)
+
+    async def _record_failed(self, failures):
+        self.failed.extend(failures)
+
+    async def __aenter__(self):
+        await self.api.start()
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.api.url))
+        self.bot = Bot(token="42:TEST", session=session)
+        self.sender = OutboundSender(
+            send=lambda chat_id, text: self.bot.send_message(chat_id, text),
+            on_delivered=lambda acks: self.on_delivered(acks),
+            on_failed=self._record_failed,
+            **self.sender_options
+        )
+        self.sender.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.sender.stop()
+        await self.bot.session.close()
+        await self.api.stop()
+
+def test_messages_are_delivered_in_chat_order_and_acked():
+    async def scenario():
+        async with Harness() as h:
+            for i in range(5):
+                h.sender.submit(1, f"a{i}", ack_id=f"a{i}")
+            for i in range(3):
+                h.sender.submit(2, f"b{i}", ack_id=f"b{i}")
+            h.sender.submit(2, "no ack")
+            await wait_for(lambda: len(h.delivered) == 8)
+
+            assert h.api.texts(1) == [f"a{i}" for i in range(5)]
+            assert h.api.texts(2) == ["b0", "b1", "b2", "no ack"]
+            assert sorted(h.delivered) == sorted([f"a{i}" for i in range(5)] + [f"b{i}" for i in range(3)])
+            assert h.sender.inflight == set()
+
+    asyncio.run(scenario())
+
+def test_rejected_message_is_reported_and_does_not_block_chat():
+    async def scenario():
+        async with Harness() as h:
+            h.api.fail_next(3, 403, "Forbidden: bot was blocked by the user")
+            h.sender.submit(3, "blocked", ack_id="x")
+            h.sender.submit(3, "next", ack_id="y")
+            await wait_for(lambda: h.delivered == ["y"] and h.failed)
+
+            assert [(ack_id, permanent) for ack_id, _, permanent in h.failed] == [("x", True)]
+            assert h.api.texts(3) == ["next"]
+            assert h.sender.inflight == set()
+
+    asyncio.run(scenario())
+
+def test_flood_control_pauses_and_retries():
+    async def scenario():
+        async with Harness() as h:
+            h.api.fail_next(4, 429, "Too Many Requests: retry after 1", retry_after=1)
+            started = asyncio.get_running_loop().time()
+            h.sender.submit(4, "hello", ack_id="z")
+            await wait_for(lambda: h.delivered == ["z"])
+
+            assert h.api.texts(4) == ["hello"]
+            assert asyncio.get_running_loop().time() - started >= 1
+            assert h.failed == []
+
+    asyncio.run(scenario())
+
+def test_failed_ack_flush_is_retried_and_stays_inflight():
+    async def scenario():
+        async with Harness(ack_interval=0.01, ack_retry_delay=0.05) as h:
+            attempts = []
+
+            async def flaky_ack(acks):
+                attempts.append(list(acks))
+                if len(attempts) == 1:
+                    raise RuntimeError("database is locked")
+                h.delivered.extend(acks)
+
+            h.on_delivered = flaky_ack
+            h.sender.submit(5, "m", ack_id="m")
+            await wait_for(lambda: len(attempts) == 1)
+            # Ack not recorded yet: the row must not be handed out again by the next poll
+            assert "m" in h.sender.inflight
+
+            await wait_for(lambda: h.delivered == ["m"])
+            assert attempts == [["m"], ["m"]]
+            assert h.sender.inflight == set()
+            assert h.api.texts(5) == ["m"]
+
+    asyncio.run(scenario())
+
+def test_idle_chat_buckets_are_pruned():
+    async def scenario():
+        async with Harness() as h:
+            h.sender._per_chat_burst = 1
+            for chat_id in range(100, 150):
+                h.sender.submit(chat_id, "hi", ack_id=str(chat_id))
+            await wait_for(lambda: len(h.delivered) == 50)
+            await asyncio.sleep(0.05)  # Buckets refill (1000 tokens/s)
+
+            h.sender.submit(999, "last", ack_id="last")
+            await wait_for(lambda: "last" in h.delivered)
+            assert set(h.sender._chat_buckets) <= {999}
+
+    asyncio.run(scenario())
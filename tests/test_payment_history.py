@@ -0,0 +1,67 @@
+from datetime import date, datetime
+import pytest
+from sqlalchemy import insert
+from src.core.models import PaymentHistory, Subscription
+from src.database.db_manager import DBManager
+
+def add_subscription(db, name: str) -> int:
+    db.add_subscription(Subscription(
+        name=name, cost_uah=100.0, category_id=db.get_all_categories()[0].id, period="Місяць",
+        last_payment=date(2026, 1, 1), next_payment=date(2026, 2, 1)
+    ))
+    return next(row.id for row in db.get_all_subscriptions() if row.name == name)
+
+@pytest.fixture
+def history(db):
+    """Історія з однаковими назвами, датами й сумами та з платежами видалених підписок (назва NULL)."""
+    ids = {name: add_subscription(db, name) for name in ("Netflix", "netflix", "Мої фільми", "Spotify", "Видалена", "Стара")}
+    rows = [
+        (ids["Netflix"], 100.0, datetime(2026, 1, 5, 10, 0)),
+        (ids["netflix"], 100.0, datetime(2026, 1, 5, 10, 0)),
+        (ids["Мої фільми"], 199.0, datetime(2026, 1, 7, 9, 30)),
+        (ids["Spotify"], 99.5, datetime(2026, 2, 1, 8, 0)),
+        (ids["Видалена"], 10.0, datetime(2026, 1, 3, 12, 0)),
+        (ids["Стара"], 10.0, datetime(2026, 1, 5, 10, 0)),
+        (ids["Netflix"], 120.0, datetime(2026, 2, 5, 10, 0)),
+        (ids["Видалена"], 10.0, datetime(2026, 2, 3, 12, 0)),
+    ]
+    with db.get_session() as session:
+        session.execute(insert(PaymentHistory), [
+            {"sub_id": sub_id, "tenant_id": db.tenant_id, "final_sum": final_sum, "pay_date": pay_date}
+            for sub_id, final_sum, pay_date in rows
+        ])
+        session.commit()
+    db.delete_subscriptions([ids["Видалена"], ids["Стара"]])
+    return db
+
+def walk_pages(db, limit: int, sort_key: str, descending: bool, search: str = "") -> list:
+    rows, after = [], None
+    while True:
+        page = db.get_payment_history_page(limit, sort_key, descending, after, search)
+        assert len(page) <= limit
+        rows += page
+        if len(page) < limit:
+            return rows
+        after = DBManager.payment_history_cursor(page[-1], sort_key)
+
+@pytest.mark.parametrize("sort_key", DBManager.HISTORY_SORT_KEYS)
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_follow_the_full_order(history, sort_key, descending):
+    everything = history.get_payment_history()
+    assert sum(row.subscription_name is None for row in everything) == 3
+    # Той самий ключ, що й курсор: NULL-назва згортається в "" і в Python, і в SQL
+    expected = sorted(everything, key=lambda row: DBManager.payment_history_cursor(row, sort_key), reverse=descending)
+    assert history.get_payment_history_page(100, sort_key, descending) == expected
+    for limit in (1, 2, 3):
+        assert walk_pages(history, limit, sort_key, descending) == expected
+
+def test_search_filters_in_sql(history):
+    def names(search: str) -> list:
+        return sorted(row.subscription_name or "" for row in walk_pages(history, 2, "subscription_name", False, search))
+
+    assert names("NETF") == ["Netflix", "Netflix", "netflix"]
+    assert names("мої філ") == ["Мої фільми"]
+    assert names("видал") == []  # Назви видалених підписок уже немає в індексі
+    assert names("99.50") == ["Spotify"]  # Сума, як її показує таблиця
+    assert names("03.02.2026") == [""]  # Дата у форматі таблиці
+    assert names("%") == names("   ") == []
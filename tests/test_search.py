@@ -0,0 +1,61 @@
+import sqlite3
+from datetime import date
+from sqlalchemy import insert
+from src.bot.search_index import words
+from src.core.models import Draft, Subscription
+from src.core.search_text import fold
+
+def add_subscription(db, name: str) -> int:
+    subscription = Subscription(
+        name=name, cost_uah=100.0, category_id=db.get_all_categories()[0].id, period="Місяць",
+        last_payment=date(2026, 1, 1), next_payment=date(2026, 2, 1)
+    )
+    db.add_subscription(subscription)
+    return next(row.id for row in db.get_all_subscriptions() if row.name == name)
+
+def test_fold_ignores_case_and_cyrillic_diacritics():
+    assert fold("Мої ЙОГУРТИ") == "моі иогурти"
+    assert fold("Café Ёлка") == "cafe елка"
+    assert words("Мої-Фільми") == ["моі", "фільми"]  # Бот згортає так само, як FTS десктопа
+
+def test_fts_matches_prefixes_without_case_and_diacritics(db):
+    sub_id = add_subscription(db, "Мої Фільми")
+    add_subscription(db, "Netflix")
+
+    assert db.search_subscription_ids("мої") == {sub_id}
+    assert db.search_subscription_ids("МОЇ філ") == {sub_id}
+    assert db.search_subscription_ids("кіно") >= {sub_id}  # Категорія теж індексується
+    assert db.search_subscription_ids("   ") is None
+
+    db.update_subscription(sub_id, {"name": "Їжа"})
+    assert db.search_subscription_ids("мої") == set()
+    assert db.search_subscription_ids("іжа") == {sub_id}
+
+def test_batch_inserted_drafts_are_folded(db):
+    with db.get_session() as session:
+        session.execute(insert(Draft), [dict(raw_name="Йога клуб", amount=1.0, currency="UAH", chat_id=1)])
+        session.commit()
+    assert len(db.search_draft_ids("иога")) == 1
+
+def test_plain_sqlite_client_can_write_indexed_tables(db):
+    """Тригери FTS - лише вбудований SQL: з'єднання без функцій DBManager пише без помилок."""
+    category_id = db.get_all_categories()[0].id
+    conn = sqlite3.connect(db.db_path)
+    try:
+        conn.execute(
+            "INSERT INTO subscriptions (name, cost_uah, category_id, period, last_payment, next_payment, "
+            "payment_type, state, is_reminder_sent) VALUES ('Spotify', 99, ?, 'Місяць', '2026-01-01', '2026-02-01', "
+            "'AUTO', 'ACTIVE', 0)", (category_id,)
+        )
+        conn.execute(
+            "INSERT INTO drafts (raw_name, amount, currency, created_at, status) "
+            "VALUES ('YouTube', 5, 'USD', '2026-01-01 00:00:00', 'NEW')"
+        )
+        conn.execute("UPDATE subscriptions SET period = 'Рік' WHERE name = 'Spotify'")
+        conn.commit()
+    finally:
+        conn.close()
+
+    # Без search_name індексується сама назва: регістр однаково не враховується
+    assert len(db.search_subscription_ids("spot")) == 1
+    assert len(db.search_draft_ids("youtu")) == 1
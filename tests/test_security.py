@@ -0,0 +1,103 @@
+import base64
+import pytest
+from cryptography.fernet import InvalidToken
+from src.core import security
+from src.core.config import Config
+from src.core.models import SyncQueue, SystemSettings
+from src.core.security import (BLOB_AESGCM, CODEC_JSON, CODEC_MSGPACK, ENVELOPE_VERSION, FLAG_ZLIB, NONCE_SIZE,
+                               SecurityManager, decode_envelope, encode_envelope)
+
+PAYLOAD = {"event": "draft_received", "data": {"name": "Мої фільми", "amount": 12.99, "ids": [1, 2, 3]}}
+
+def test_envelope_round_trip_msgpack():
+    raw = encode_envelope(PAYLOAD)
+    assert raw[0] == ENVELOPE_VERSION and raw[1] & 0x03 == CODEC_MSGPACK
+    assert decode_envelope(raw) == PAYLOAD
+    assert decode_envelope(memoryview(raw)) == PAYLOAD
+
+def test_envelope_round_trip_json_without_msgpack(monkeypatch):
+    monkeypatch.setattr(security, "msgpack", None)
+    raw = encode_envelope(PAYLOAD)
+    assert raw[1] & 0x03 == CODEC_JSON
+    assert decode_envelope(raw) == PAYLOAD
+
+def test_envelope_compresses_large_bodies():
+    small = encode_envelope(PAYLOAD)
+    large_payload = {"event": "draft_batch", "items": [{"raw_name": "Netflix", "amount": 1.0}] * 200}
+    large = encode_envelope(large_payload)
+    assert not small[1] & FLAG_ZLIB
+    assert large[1] & FLAG_ZLIB
+    assert decode_envelope(large) == large_payload
+
+def test_envelope_rejects_unknown_formats(monkeypatch):
+    with pytest.raises(ValueError, match="формат конверта"):
+        decode_envelope(b"\x09\x00{}")
+    with pytest.raises(ValueError, match="формат конверта"):
+        decode_envelope(b"")
+    with pytest.raises(ValueError, match="кодек"):
+        decode_envelope(bytes((ENVELOPE_VERSION, 0x03)) + b"{}")
+    raw = encode_envelope(PAYLOAD)
+    monkeypatch.setattr(security, "msgpack", None)
+    with pytest.raises(ValueError, match="msgpack"):
+        decode_envelope(raw)
+
+def test_security_manager_formats():
+    manager = SecurityManager(SecurityManager.generate_new_key())
+    assert manager.decrypt_data(manager.encrypt_data(PAYLOAD)) == PAYLOAD
+    blob = manager.encrypt_payload(PAYLOAD)
+    assert isinstance(blob, bytes)
+    assert manager.decrypt_payload(blob) == PAYLOAD
+
+    other = SecurityManager(SecurityManager.generate_new_key())
+    with pytest.raises(InvalidToken):
+        other.decrypt_payload(blob)
+
+def test_blob_is_aead_over_raw_bytes():
+    manager = SecurityManager(SecurityManager.generate_new_key())
+    blob = manager.encrypt_payload(PAYLOAD)
+    envelope = encode_envelope(PAYLOAD)
+    assert blob[0] == BLOB_AESGCM
+    assert len(blob) == 1 + NONCE_SIZE + len(envelope) + 16  # Лише nonce і тег поверх конверта
+    assert manager.encrypt_payload(PAYLOAD) != blob  # Новий nonce для кожного запису
+
+    tampered = bytearray(blob)
+    tampered[-1] ^= 1
+    with pytest.raises(InvalidToken):
+        manager.decrypt_payload(bytes(tampered))
+    with pytest.raises(ValueError, match="формат"):
+        manager.decrypt_payload(b"\x07" + blob[1:])
+
+def test_blob_written_as_raw_fernet_token_is_still_readable():
+    manager = SecurityManager(SecurityManager.generate_new_key())
+    legacy_blob = base64.urlsafe_b64decode(manager.fernet.encrypt(encode_envelope(PAYLOAD)))
+    assert manager.decrypt_payload(legacy_blob) == PAYLOAD
+
+def test_security_manager_rejects_bad_key():
+    with pytest.raises(ValueError, match="Невалідний ключ"):
+        SecurityManager("not-a-key")
+
+@pytest.mark.parametrize("payload_format, column", [("v2", "payload_blob"), ("legacy", "payload")])
+def test_key_provider_message_round_trip(db, monkeypatch, payload_format, column):
+    monkeypatch.setattr(Config, "SYNC_PAYLOAD_FORMAT", payload_format)
+    columns = db.keys.encrypt_message(PAYLOAD)
+    assert columns[column]
+    message = SyncQueue(**columns)
+    assert db.keys.decrypt_message(message) == PAYLOAD
+
+def test_key_provider_reads_both_formats_regardless_of_setting(db, monkeypatch):
+    monkeypatch.setattr(Config, "SYNC_PAYLOAD_FORMAT", "legacy")
+    legacy = SyncQueue(**db.keys.encrypt_message(PAYLOAD))
+    monkeypatch.setattr(Config, "SYNC_PAYLOAD_FORMAT", "v2")
+    assert db.keys.decrypt_message(legacy) == PAYLOAD
+
+def test_key_provider_picks_up_rotated_key(db):
+    new_key = SecurityManager.generate_new_key()
+    message = SyncQueue(payload="", payload_blob=SecurityManager(new_key).encrypt_payload(PAYLOAD))
+    assert db.keys.get() is not None
+    with db.get_session() as session:
+        setting = session.query(SystemSettings).filter_by(setting_key=db.setting_key("enc_key")).one()
+        setting.setting_value = new_key
+        session.commit()
+    # Невдале розшифрування перечитує ключ; незмінний ключ кеш не скидає
+    assert db.keys.decrypt_message(message) == PAYLOAD
+    assert db.keys.refresh() is False
@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+from src.bot.async_db import AsyncDB
+from src.bot.settings_cache import SettingsCache
+from src.core.models import SystemSettings
+from src.core.security import SecurityManager
+from src.core.sync_notifier import DataVersionWatcher
+
+@pytest.fixture
+def cache(db):
+    adb = AsyncDB(db)
+    # Спостерігач не запускається: оновлення викликаються явно
+    settings = SettingsCache(adb, DataVersionWatcher(db.db_path))
+    asyncio.run(settings.load())
+    yield settings
+    adb.shutdown()
+
+def set_setting(db, key: str, value: str):
+    with db.get_session() as session:
+        session.merge(SystemSettings(setting_key=db.setting_key(key), setting_value=value))
+        session.commit()
+
+def test_rotated_key_is_used_for_new_events(db, cache):
+    old_key = db.keys.get()
+    new_key = SecurityManager.generate_new_key()
+    set_setting(db, "enc_key", new_key)
+    assert db.keys.get() is old_key  # Кеш ще не знає про зміну
+
+    assert asyncio.run(cache.refresh_if_changed())
+    blob = db.keys.encrypt_message({"event": "ping"})["payload_blob"]
+    assert SecurityManager(new_key).decrypt_payload(blob) == {"event": "ping"}
+
+def test_reloads_only_when_revision_moves(db, cache, monkeypatch):
+    loads = []
+    load_settings = cache.adb.load_settings
+
+    async def counting_load():
+        loads.append(1)
+        return await load_settings()
+
+    monkeypatch.setattr(cache.adb, "load_settings", counting_load)
+    assert not asyncio.run(cache.refresh_if_changed())
+    db.add_sync_event("payment_reminder", {})  # Зміна інших таблиць не рухає ревізію налаштувань
+    assert not asyncio.run(cache.refresh_if_changed())
+    assert loads == []
+
+    set_setting(db, "linked_chat_id", "42")
+    set_setting(db, "pairing_code", "ABC123")
+    assert asyncio.run(cache.refresh_if_changed())
+    assert not asyncio.run(cache.refresh_if_changed())
+    assert loads == [1]  # Дві зміни - одне перечитування
+    assert cache.tenant_for_chat(42) == db.tenant_id and cache.linked_chat_id() == 42
+    assert cache.tenant_for_code("ABC123") == db.tenant_id and cache.tenant_for_code("OTHER") is None
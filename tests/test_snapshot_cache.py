@@ -0,0 +1,59 @@
+import asyncio
+from datetime import date
+import pytest
+from src.bot import snapshot_cache
+from src.bot.async_db import AsyncDB
+from src.bot.snapshot_cache import SnapshotCache, render_next
+from src.core.dto import SubscriptionRow
+from src.core.models import Subscription, SubscriptionState
+from src.core.snapshot import build_snapshot
+from src.core.sync_notifier import DataVersionWatcher
+
+@pytest.fixture
+def cache(db):
+    adb = AsyncDB(db)
+    snapshots = SnapshotCache(adb, DataVersionWatcher(db.db_path))
+    yield snapshots
+    adb.shutdown()
+
+def add_subscription(db, name: str, cost_uah: float, next_payment: date, period: str = "Місяць",
+                     state: SubscriptionState = SubscriptionState.ACTIVE):
+    db.add_subscription(Subscription(
+        name=name, cost_uah=cost_uah, category_id=db.get_all_categories()[0].id, period=period,
+        last_payment=date(2026, 1, 1), next_payment=next_payment, state=state
+    ))
+
+def test_replies_are_rendered_once_per_revision(db, cache, monkeypatch):
+    add_subscription(db, "<Netflix>", 100.0, date(2026, 2, 1))
+    add_subscription(db, "Spotify", 1200.0, date(2026, 3, 1), period="Рік")
+    add_subscription(db, "Megogo", 50.0, date(2026, 2, 15), state=SubscriptionState.OVERDUE)
+    asyncio.run(cache.load())
+    renders = []
+    render_list = snapshot_cache.render_list
+    monkeypatch.setattr(snapshot_cache, "render_list", lambda snapshot: renders.append(1) or render_list(snapshot))
+
+    text = cache.reply(db.tenant_id, "list")
+    assert text.index("&lt;Netflix&gt;") < text.index("Megogo") < text.index("Spotify")  # За датою платежу
+    assert cache.reply(db.tenant_id, "list") is text and renders == [1]
+    assert "Активних підписок: <b>2</b> з 3" in cache.reply(db.tenant_id, "total")
+    assert "На місяць: <b>200.00 UAH</b>" in cache.reply(db.tenant_id, "total")
+    assert cache.reply("other", "list") is None
+
+    assert not asyncio.run(cache.refresh_if_changed())
+    add_subscription(db, "YouTube", 10.0, date(2026, 1, 20))
+    assert asyncio.run(cache.refresh_if_changed())
+    assert "YouTube" in cache.reply(db.tenant_id, "list") and renders == [1, 1]  # Нова ревізія - новий текст
+    assert [item["name"] for item in cache.search(db.tenant_id, "you")] == ["YouTube"]
+
+def test_render_next_groups_the_nearest_date():
+    rows = [
+        (1, "Netflix", 100.0, 1, "Кіно", "Місяць", date(2026, 1, 1), date(2026, 2, 1), "AUTO", "Active", False),
+        (2, "Spotify", 50.0, 1, "Кіно", "Місяць", date(2026, 1, 1), date(2026, 2, 1), "AUTO", "Active", False),
+        (3, "Megogo", 70.0, 1, "Кіно", "Місяць", date(2026, 1, 1), date(2026, 1, 10), "AUTO", "Active", False),
+    ]
+    snapshot = build_snapshot(map(SubscriptionRow._make, rows))
+
+    text = render_next(snapshot, date(2026, 1, 15))  # Минулий платіж Megogo пропускається
+    assert "01.02.2026" in text and "Netflix" in text and "Spotify" in text and "Megogo" not in text
+    assert "<b>Разом:</b> 150.00 UAH" in text
+    assert render_next(snapshot, date(2026, 3, 1)) == "✅ Найближчих платежів немає."
@@ -0,0 +1,61 @@
+import sqlite3
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from src.core.config import Config
+from src.database import sqlite_tuning
+from src.database.db_manager import DBManager
+
+@pytest.fixture
+def locked(tmp_path, monkeypatch):
+    """DBManager без очікування busy_timeout і стороннє з'єднання, що тримає блокування запису."""
+    monkeypatch.setitem(Config.SQLITE_PRAGMAS, "busy_timeout", 0)
+    manager = DBManager(db_path=str(tmp_path / "locked.sqlite"))
+    other = sqlite3.connect(manager.db_path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    yield manager, other
+    other.close()
+    manager.engine.dispose()
+
+def test_busy_retry_backs_off_then_gives_up(locked, monkeypatch):
+    manager, _ = locked
+    delays = []
+    monkeypatch.setattr(sqlite_tuning.time, "sleep", delays.append)
+
+    with pytest.raises(OperationalError, match="locked"):
+        manager.add_sync_event("payment_reminder", {})
+    assert len(delays) == Config.SQLITE_BUSY_RETRIES
+    base = Config.SQLITE_BUSY_BASE_DELAY_MS / 1000
+    for attempt, delay in enumerate(delays):
+        assert base * 2 ** attempt * 0.5 <= delay <= base * 2 ** attempt * 1.5  # Експонента з розкидом
+
+def test_busy_retry_succeeds_once_lock_is_released(locked, monkeypatch):
+    manager, other = locked
+    delays = []
+
+    def sleep(delay):
+        delays.append(delay)
+        if len(delays) == 2:
+            other.execute("COMMIT")
+
+    monkeypatch.setattr(sqlite_tuning.time, "sleep", sleep)
+    manager.add_sync_event("payment_reminder", {})
+    assert len(delays) == 2
+
+def test_busy_retry_does_not_retry_other_errors():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise OperationalError("SELECT", {}, sqlite3.OperationalError("no such table: missing"))
+
+    with pytest.raises(OperationalError):
+        sqlite_tuning.run_with_busy_retry(broken, retries=3, base_delay=0)
+    assert calls == [1]
+
+def test_pragmas_are_applied_to_every_pooled_connection(db):
+    expected = {"busy_timeout": Config.SQLITE_BUSY_TIMEOUT_MS, "journal_mode": "wal", "synchronous": 1, "temp_store": 2}
+    with db.engine.connect() as first, db.engine.connect() as second:
+        assert first.connection.dbapi_connection is not second.connection.dbapi_connection
+        for conn in (first, second):
+            assert {name: conn.execute(text(f"PRAGMA {name}")).scalar() for name in expected} == expected
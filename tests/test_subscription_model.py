@@ -0,0 +1,38 @@
+from datetime import date
+import pytest
+from PySide6.QtCore import QCoreApplication
+from src.core.dto import SubscriptionRow
+from src.core.models import PaymentType, SubscriptionState
+from src.ui.models.subscription_model import SubscriptionTableModel
+
+@pytest.fixture(scope="module", autouse=True)
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+def row(sub_id: int, name: str, cost_uah: float = 100.0) -> SubscriptionRow:
+    return SubscriptionRow(sub_id, name, cost_uah, 1, "Кіно", "Місяць", date(2026, 1, 1), date(2026, 2, 1),
+                           PaymentType.AUTO, SubscriptionState.ACTIVE, False)
+
+def test_refresh_emits_only_row_level_signals():
+    model = SubscriptionTableModel([row(1, "A"), row(2, "B"), row(3, "C"), row(4, "D"), row(5, "E")])
+    signals = []
+    model.modelReset.connect(lambda: signals.append(("reset",)))
+    model.rowsRemoved.connect(lambda parent, first, last: signals.append(("removed", first, last)))
+    model.dataChanged.connect(lambda top, bottom, roles: signals.append(
+        ("changed", top.row(), bottom.row(), top.column(), bottom.column())))
+    model.rowsInserted.connect(lambda parent, first, last: signals.append(("inserted", first, last)))
+
+    # Видалено 2, 3 і 5; змінено 4; додано 6 і 7; 1 без змін
+    model.refresh_data([row(7, "G"), row(1, "A"), row(4, "D", 200.0), row(6, "F")])
+    assert signals == [
+        ("removed", 4, 4),  # Знизу вгору, суцільними блоками
+        ("removed", 1, 2),
+        ("changed", 1, 1, 0, model.columnCount() - 1),
+        ("inserted", 2, 3),
+    ]
+    assert [model.get_subscription(index).id for index in range(model.rowCount())] == [1, 4, 7, 6]
+    assert model.get_subscription(1).cost_uah == 200.0
+
+    signals.clear()
+    model.refresh_data([row(6, "F"), row(1, "A"), row(4, "D", 200.0), row(7, "G")])
+    assert signals == []  # Ті самі дані в іншому порядку - жодного сигналу
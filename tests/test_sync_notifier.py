@@ -0,0 +1,52 @@
+import asyncio
+import sqlite3
+import pytest
+from src.core.sync_notifier import AdaptiveBackoff, DataVersionWatcher
+
+@pytest.fixture
+def watched(tmp_path):
+    path = str(tmp_path / "watched.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+    conn.commit()
+    watcher = DataVersionWatcher(path, interval=0.01)
+    watcher.start()
+    yield watcher, conn
+    watcher.stop()
+    conn.close()
+
+def commit_from_other_connection(conn):
+    conn.execute("INSERT INTO items DEFAULT VALUES")
+    conn.commit()
+
+def test_watcher_wakes_up_on_commit_from_another_connection(watched):
+    watcher, conn = watched
+    calls = []
+    watcher.add_listener(lambda: calls.append(1))
+    # Перша перевірка лише запам'ятовує версію; без змін очікування спливає
+    assert not watcher.wait(watcher.generation, timeout=0.1)
+
+    generation = watcher.generation
+    commit_from_other_connection(conn)
+    assert watcher.wait(generation, timeout=2)
+    assert calls
+
+def test_wait_async_wakes_up(watched):
+    watcher, conn = watched
+
+    async def scenario():
+        generation = watcher.generation
+        assert not await watcher.wait_async(generation, timeout=0.1)
+        waiter = asyncio.create_task(watcher.wait_async(generation, timeout=2))
+        await asyncio.sleep(0.05)
+        commit_from_other_connection(conn)
+        return await waiter
+
+    assert asyncio.run(scenario())
+    assert not watcher._listeners  # Слухач wait_async прибирається після пробудження
+
+def test_adaptive_backoff():
+    backoff = AdaptiveBackoff(0.1, 0.5)
+    assert [backoff.next() for _ in range(5)] == [0.1, 0.2, 0.4, 0.5, 0.5]
+    backoff.reset()
+    assert backoff.next() == 0.1
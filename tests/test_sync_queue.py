@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from src.core.config import Config
+from src.core.models import SyncDeadLetter, SyncDirection, SyncQueue
+
+def enqueue(db, event_type: str, data: dict, coalesce_key: str = None) -> str:
+    with db.get_session() as session:
+        item = db.enqueue_to_bot(session, event_type, data, coalesce_key=coalesce_key)
+        session.commit()
+        return item.uuid
+
+def queued_events(db):
+    with db.get_session() as session:
+        rows = session.scalars(
+            select(SyncQueue).where(SyncQueue.direction == SyncDirection.TO_BOT).order_by(SyncQueue.timestamp)
+        ).all()
+        return [db.keys.decrypt_message(row)["data"] for row in rows]
+
+def test_coalesced_event_replaces_previous(db):
+    enqueue(db, "payment_reminder", {"name": "Netflix", "days": 3}, coalesce_key="payment_reminder:1")
+    enqueue(db, "payment_reminder", {"name": "Spotify", "days": 3}, coalesce_key="payment_reminder:2")
+    enqueue(db, "payment_reminder", {"name": "Netflix", "days": 1}, coalesce_key="payment_reminder:1")
+    assert queued_events(db) == [{"name": "Spotify", "days": 3}, {"name": "Netflix", "days": 1}]
+
+def test_ttl_per_event_type(db):
+    reminder = enqueue(db, "payment_reminder", {})
+    other = enqueue(db, "some_untimed_event", {})
+    with db.get_session() as session:
+        reminder_row, other_row = session.get(SyncQueue, reminder), session.get(SyncQueue, other)
+        ttl = reminder_row.expires_at - reminder_row.timestamp
+        assert ttl == timedelta(seconds=Config.SYNC_EVENT_TTL_SEC["payment_reminder"])
+        assert other_row.expires_at is None
+
+def test_expired_events_are_skipped_and_purged(db):
+    fresh = enqueue(db, "payment_reminder", {"name": "fresh"})
+    expired = enqueue(db, "payment_reminder", {"name": "expired"})
+    with db.get_session() as session:
+        session.get(SyncQueue, expired).expires_at = datetime.utcnow() - timedelta(seconds=1)
+        session.commit()
+        ready = session.scalars(select(SyncQueue.uuid).where(db.sync_ready_condition(datetime.utcnow()))).all()
+    assert ready == [fresh]
+
+    assert db.purge_expired_sync_events() == 1
+    assert queued_events(db) == [{"name": "fresh"}]
+
+def test_backlog_is_trimmed_to_newest(db, monkeypatch):
+    monkeypatch.setattr(Config, "SYNC_TO_BOT_MAX_PENDING", 3)
+    for index in range(5):
+        enqueue(db, "draft_received", {"index": index})
+    assert queued_events(db) == [{"index": 2}, {"index": 3}, {"index": 4}]
+
+def test_failures_back_off_then_dead_letter(db, monkeypatch):
+    monkeypatch.setattr(Config, "SYNC_MAX_ATTEMPTS", 2)
+    first, second = enqueue(db, "draft_received", {}), enqueue(db, "draft_received", {})
+
+    assert db.record_sync_failures([(first, "timeout", False)]) == 0
+    with db.get_session() as session:
+        row = session.get(SyncQueue, first)
+        assert row.attempts == 1 and row.last_error == "timeout"
+        assert row.next_attempt_at > datetime.utcnow()
+        ready = session.scalars(select(SyncQueue.uuid).where(db.sync_ready_condition(datetime.utcnow()))).all()
+    assert ready == [second]  # Відкладений запис не блокує наступні
+
+    # Друга невдача (ліміт спроб) і permanent-помилка - одразу в dead letter
+    assert db.record_sync_failures([(first, "timeout", False), (second, "chat not found", True)]) == 2
+    with db.get_session() as session:
+        assert session.query(SyncQueue).count() == 0
+        dead = {row.uuid: row for row in session.query(SyncDeadLetter)}
+    assert dead[first].attempts == 2 and dead[second].last_error == "chat not found"
+    assert db.keys.decrypt_message(dead[second]) == {"event": "draft_received", "data": {}}
@@ -0,0 +1,112 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import delete
+from src.core.change_tracker import ChangeTracker
+from src.core.config import Config
+from src.core.models import Draft, SyncDeadLetter, SyncDirection, SyncQueue, SystemSettings
+from src.database.db_manager import db
+from src.core.sync_worker import SyncWorker
+
+CHAT_ID = 7
+
+@pytest.fixture
+def worker():
+    # SyncWorker працює з глобальним `db` (тимчасова база з conftest)
+    with db.get_session() as session:
+        for model in (SyncQueue, SyncDeadLetter, Draft):
+            session.execute(delete(model))
+        key = db.setting_key("linked_chat_id")
+        session.execute(delete(SystemSettings).where(SystemSettings.setting_key == key))
+        session.add(SystemSettings(setting_key=key, setting_value=str(CHAT_ID)))
+        session.commit()
+    return SyncWorker()
+
+def enqueue(*payloads):
+    """Кладе зашифровані повідомлення від бота в чергу, у заданому порядку."""
+    started = datetime.utcnow()
+    with db.get_session() as session:
+        for index, payload in enumerate(payloads):
+            session.add(SyncQueue(
+                uuid=str(uuid.uuid4()),
+                tenant_id=db.tenant_id,
+                direction=SyncDirection.FROM_BOT,
+                timestamp=started + timedelta(milliseconds=index),
+                **db.keys.encrypt_message(payload)
+            ))
+        session.commit()
+
+def counts():
+    with db.get_session() as session:
+        return (
+            session.query(SyncQueue).filter_by(direction=SyncDirection.FROM_BOT).count(),
+            session.query(Draft).count(),
+            session.query(SyncDeadLetter).count(),
+        )
+
+def test_poison_row_does_not_block_healthy_rows(worker):
+    enqueue(
+        {"raw_name": None, "amount": 1, "currency": "USD", "chat_id": CHAT_ID},  # NOT NULL raw_name
+        {"raw_name": "Netflix", "amount": 12.99, "currency": "USD", "chat_id": CHAT_ID},
+        {"raw_name": "Spotify", "amount": 5, "currency": "EUR", "chat_id": CHAT_ID},
+    )
+
+    assert worker.process_queue() == 3
+    queued, drafts, dead = counts()
+    assert (queued, drafts, dead) == (1, 2, 0)  # Поганий запис відкладено, решта оброблена
+
+    with db.get_session() as session:
+        poison = session.query(SyncQueue).filter_by(direction=SyncDirection.FROM_BOT).one()
+        assert poison.attempts == 1
+        assert "raw_name" in poison.last_error
+        # Фідбек draft_received лише для успішних чернеток
+        assert session.query(SyncQueue).filter_by(direction=SyncDirection.TO_BOT).count() == 2
+
+def test_poison_row_is_dead_lettered_after_max_attempts(worker):
+    enqueue({"raw_name": None, "amount": 1, "currency": "USD", "chat_id": CHAT_ID})
+
+    for _ in range(Config.SYNC_MAX_ATTEMPTS):
+        with db.get_session() as session:
+            # Не чекаємо backoff: запис готовий до повтору одразу
+            for msg in session.query(SyncQueue).filter_by(direction=SyncDirection.FROM_BOT):
+                msg.next_attempt_at = None
+            session.commit()
+        worker.process_queue()
+
+    assert counts() == (0, 0, 1)
+
+def test_undecryptable_row_is_deferred(worker):
+    enqueue({"raw_name": "Netflix", "amount": 1, "currency": "USD", "chat_id": CHAT_ID})
+    with db.get_session() as session:
+        session.add(SyncQueue(uuid=str(uuid.uuid4()), tenant_id=db.tenant_id, direction=SyncDirection.FROM_BOT,
+                              timestamp=datetime.utcnow() - timedelta(seconds=1), payload="not a token"))
+        session.commit()
+
+    assert worker.process_queue() == 2
+    assert counts() == (1, 1, 0)
+
+def test_rolled_back_row_leaves_no_trace_in_change_log(worker, monkeypatch):
+    add_feedback = worker._add_feedback
+
+    def failing_feedback(session, event, data, coalesce_key=None):
+        # Збій уже після INSERT чернетки: тригер журналу спрацював у тій самій точці збереження
+        if data.get("name") == "Poison":
+            raise RuntimeError("feedback failed")
+        add_feedback(session, event, data, coalesce_key)
+
+    monkeypatch.setattr(worker, "_add_feedback", failing_feedback)
+    tracker = ChangeTracker(db, ("drafts",))
+    revision = tracker.revision
+    enqueue(
+        {"raw_name": "Poison", "amount": 1, "currency": "USD", "chat_id": CHAT_ID},
+        {"raw_name": "Netflix", "amount": 12.99, "currency": "USD", "chat_id": CHAT_ID},
+    )
+
+    assert worker.process_queue() == 2
+    with db.get_session() as session:
+        draft_ids = {draft.id for draft in session.query(Draft)}
+    assert len(draft_ids) == 1
+    changes = db.get_changes(revision)
+    assert changes.tables == {"drafts": draft_ids}
+    assert not changes.truncated  # Відкат не лишив пропуску в ревізіях
+    assert tracker.poll() and not tracker.poll()
@@ -0,0 +1,127 @@
+import time
+from datetime import date
+import pytest
+from src.core.config import Config
+from src.bot.attempt_limiter import AttemptLimiter
+from src.core.models import Draft, DraftStatus, Subscription, SubscriptionSnapshot, SyncQueue
+from src.core.security import KeyProvider
+from src.core.tenants import tenant_setting_key
+from src.database.db_manager import DBManager
+
+@pytest.fixture
+def tenants(tmp_path):
+    """Два тенанти (десктопи) над одним файлом бази."""
+    path = str(tmp_path / "shared.sqlite")
+    first, second = DBManager(db_path=path, tenant_id="alpha"), DBManager(db_path=path, tenant_id="beta")
+    yield first, second
+    first.engine.dispose()
+    second.engine.dispose()
+
+def add_subscription(manager: DBManager, name: str) -> int:
+    category_id = manager.get_all_categories()[0].id
+    subscription = Subscription(
+        name=name, cost_uah=100.0, category_id=category_id, period="Місяць",
+        last_payment=date(2026, 1, 1), next_payment=date(2026, 2, 1)
+    )
+    manager.add_subscription(subscription)
+    return next(row.id for row in manager.get_all_subscriptions() if row.name == name)
+
+def add_draft(manager: DBManager, raw_name: str) -> int:
+    with manager.get_session() as session:
+        draft = Draft(raw_name=raw_name, amount=5.0, currency="USD", chat_id=1, tenant_id=manager.tenant_id)
+        session.add(draft)
+        session.commit()
+        return draft.id
+
+def test_each_tenant_gets_its_own_categories(tenants):
+    alpha, beta = tenants
+    alpha_ids = {category.id for category in alpha.get_all_categories()}
+    beta_ids = {category.id for category in beta.get_all_categories()}
+    assert len(alpha_ids) == len(beta_ids) == 5
+    assert not alpha_ids & beta_ids
+
+def test_subscriptions_and_snapshot_are_per_tenant(tenants):
+    alpha, beta = tenants
+    alpha_id = add_subscription(alpha, "Netflix")
+    add_subscription(beta, "Spotify")
+
+    assert [row.name for row in alpha.get_all_subscriptions()] == ["Netflix"]
+    assert [row.name for row in beta.get_all_subscriptions()] == ["Spotify"]
+    with alpha.get_session() as session:
+        payloads = {snapshot.tenant_id: snapshot.payload for snapshot in session.query(SubscriptionSnapshot)}
+    assert "Netflix" in payloads["alpha"] and "Spotify" not in payloads["alpha"]
+    assert "Spotify" in payloads["beta"] and "Netflix" not in payloads["beta"]
+
+    # id чужої підписки поводиться як неіснуючий
+    beta.update_subscription(alpha_id, {"name": "Hacked"})
+    assert beta.delete_subscriptions([alpha_id]) == 0
+    beta.mark_subscription_paid(alpha_id, date(2026, 2, 1), date(2026, 3, 1), 100.0)
+    assert [row.name for row in alpha.get_all_subscriptions()] == ["Netflix"]
+    assert beta.get_payment_history() == []
+
+def test_search_and_history_are_per_tenant(tenants):
+    alpha, beta = tenants
+    alpha_id = add_subscription(alpha, "YouTube Premium")
+    beta_id = add_subscription(beta, "YouTube Music")
+
+    assert alpha.search_subscription_ids("youtube") == {alpha_id}
+    assert beta.search_subscription_ids("youtube") == {beta_id}
+
+    alpha.mark_subscription_paid(alpha_id, date(2026, 2, 1), date(2026, 3, 1), 100.0)
+    assert [row.sub_id for row in alpha.get_payment_history()] == [alpha_id]
+    assert beta.get_payment_history() == []
+
+def test_drafts_are_per_tenant(tenants):
+    alpha, beta = tenants
+    alpha_draft = add_draft(alpha, "Disney+")
+    add_draft(beta, "HBO Max")
+
+    assert beta.get_draft_by_id(alpha_draft) is None
+    assert alpha.search_draft_ids("disney") == {alpha_draft}
+    assert beta.search_draft_ids("disney") == set()
+    assert beta.reject_drafts([alpha_draft]) == 0
+    with alpha.get_session() as session:
+        assert session.get(Draft, alpha_draft).status == DraftStatus.NEW
+
+def test_attempt_limiter_blocks_until_window_passes():
+    now = [0.0]
+    limiter = AttemptLimiter(max_attempts=3, window_sec=60, clock=lambda: now[0])
+
+    assert [limiter.allow(1) for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow(2)  # Інші чати не зачеплені
+    assert limiter.retry_after(1) == 60
+
+    now[0] = 61.0
+    assert limiter.allow(1)
+    assert len(limiter) == 1  # Чат 2 з порожнім вікном забутий
+
+def test_key_of_a_tenant_added_later_is_picked_up(tenants, tmp_path):
+    alpha, _ = tenants
+    # Бот звертається до ключа тенанта раніше, ніж його десктоп уперше запустився
+    provider = KeyProvider(alpha.Session, tenant_setting_key("enc_key", "gamma"), missing_retry_sec=0.05)
+    patient = KeyProvider(alpha.Session, tenant_setting_key("enc_key", "gamma"), missing_retry_sec=3600)
+    assert provider.get() is None and patient.get() is None
+
+    gamma = DBManager(db_path=alpha.db_path, tenant_id="gamma")
+    try:
+        assert patient.get() is None  # Відсутній ключ перечитується не частіше за інтервал
+        time.sleep(0.06)
+        assert provider.get() is not None
+        assert provider.decrypt_message(SyncQueue(**gamma.keys.encrypt_message({"event": "ping"}))) == {"event": "ping"}
+    finally:
+        gamma.engine.dispose()
+
+def test_dead_letters_are_per_tenant(tenants, monkeypatch):
+    alpha, beta = tenants
+    monkeypatch.setattr(Config, "SYNC_MAX_ATTEMPTS", 1)
+    with alpha.get_session() as session:
+        item = alpha.enqueue_to_bot(session, "draft_received", {})
+        session.commit()
+        letter = item.uuid
+    alpha.record_sync_failures([(letter, "chat not found", True)])
+
+    assert beta.get_dead_letters() == []
+    assert beta.replay_dead_letters([letter]) == 0
+    assert beta.delete_dead_letters([letter]) == 0
+    assert [row.uuid for row in alpha.get_dead_letters()] == [letter]
+    assert alpha.replay_dead_letters([letter]) == 1
@@ -0,0 +1,119 @@
+import asyncio
+import copy
+import json
+import os
+import aiohttp
+import pytest
+from aiohttp import web
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters import Command
+from src.bot.webhook import SECRET_HEADER, UpdateFeeder, create_webhook_app
+
+SECRET = "test-secret"
+PATH = "/webhook"
+
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "update_ping.json"), encoding="utf-8") as f:
+    RECORDED_UPDATE = json.load(f)
+
+def update_from(chat_id: int, text: str, update_id: int) -> dict:
+    """Записане оновлення з іншим чатом і текстом."""
+    update = copy.deepcopy(RECORDED_UPDATE)
+    update["update_id"] = update_id
+    update["message"]["chat"]["id"] = update["message"]["from"]["id"] = chat_id
+    update["message"]["text"] = text
+    return update
+
+class Listener:
+    """Локальний webhook-сервер з диспетчером, що записує оброблені оновлення."""
+
+    def __init__(self, max_pending: int = 1000):
+        self.handled = []
+        self.release_slow = asyncio.Event()
+        router = Router()
+
+        @router.message(Command("ping"))
+        async def ping(message):
+            self.handled.append((message.chat.id, message.text))
+
+        @router.message(F.text == "slow")
+        async def slow(message):
+            await self.release_slow.wait()
+            self.handled.append((message.chat.id, message.text))
+
+        self.dp = Dispatcher()
+        self.dp.include_router(router)
+        self.bot = Bot(token="42:TEST")
+        self.feeder = UpdateFeeder(self.dp, self.bot, max_pending=max_pending)
+
+    async def __aenter__(self):
+        app = create_webhook_app(self.dp, self.bot, PATH, SECRET, self.feeder)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}{PATH}"
+        self.http = aiohttp.ClientSession()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release_slow.set()
+        await self.http.close()
+        await self.runner.cleanup()
+        await self.bot.session.close()
+
+    async def post(self, update, secret=SECRET, wait=True) -> int:
+        headers = {SECRET_HEADER: secret} if secret is not None else {}
+        async with self.http.post(self.url + ("?wait=1" if wait else ""), json=update, headers=headers) as response:
+            return response.status
+
+def test_recorded_update_with_secret_is_handled():
+    async def scenario():
+        async with Listener() as listener:
+            assert await listener.post(RECORDED_UPDATE) == 200
+            assert listener.handled == [(111, "/ping")]
+
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize("secret", [None, "", "wrong-secret"])
+def test_update_without_valid_secret_is_rejected(secret):
+    async def scenario():
+        async with Listener() as listener:
+            assert await listener.post(RECORDED_UPDATE, secret=secret) == 401
+            await asyncio.sleep(0.05)
+            assert listener.handled == []
+
+    asyncio.run(scenario())
+
+def test_slow_chat_does_not_delay_other_chats():
+    async def scenario():
+        async with Listener() as listener:
+            assert await listener.post(update_from(222, "slow", 1), wait=False) == 200
+            assert await listener.post(update_from(222, "/ping", 2), wait=False) == 200
+            # Інший чат обробляється, поки 222 чекає на повільний обробник
+            assert await asyncio.wait_for(listener.post(update_from(333, "/ping", 3)), timeout=2) == 200
+            assert listener.handled == [(333, "/ping")]
+
+            listener.release_slow.set()
+            while len(listener.handled) < 3:
+                await asyncio.sleep(0.01)
+            # Порядок у межах чату збережено
+            assert listener.handled[1:] == [(222, "slow"), (222, "/ping")]
+
+    asyncio.run(scenario())
+
+def test_full_feeder_answers_503():
+    async def scenario():
+        async with Listener(max_pending=1) as listener:
+            assert await listener.post(update_from(222, "slow", 1), wait=False) == 200
+            assert await listener.post(update_from(333, "/ping", 2)) == 503
+
+            listener.release_slow.set()
+            while listener.feeder.pending:
+                await asyncio.sleep(0.01)
+            assert await listener.post(update_from(333, "/ping", 3)) == 200
+
+    asyncio.run(scenario())
+
+def test_webhook_requires_secret():
+    with pytest.raises(ValueError):
+        create_webhook_app(Dispatcher(), Bot(token="42:TEST"), PATH, "")